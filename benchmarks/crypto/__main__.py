@@ -0,0 +1,163 @@
+"""
+Crypto micro-benchmark suite.
+
+Sweeps KDF iterations, payload size and worker count for server side password encryption and user password hashing,
+reports ops/sec, p50/p99 latency and scaling efficiency across workers and writes the results as JSON.
+
+    python -m benchmarks.crypto --output benchmark_results/crypto.json
+"""
+import argparse
+import dataclasses
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+from benchmarks.crypto.cases import CASES, CASE_FIXED_ALGOS, prepare_case_args, run_case_once
+
+EXECUTOR_TYPE_THREAD = 'thread'
+EXECUTOR_TYPE_PROCESS = 'process'
+
+
+@dataclasses.dataclass
+class BenchmarkResult:
+    case: str
+    algo: str
+    iterations: int
+    payload_size: int
+    executor_type: str
+    workers: int
+    operations: int
+    total_seconds: float
+    ops_per_sec: float
+    p50_latency_ms: float
+    p99_latency_ms: float
+    scaling_efficiency: Optional[float] = None
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[int(percent) - 1]
+
+
+def _create_executor(executor_type: str, workers: int) -> Executor:
+    if executor_type == EXECUTOR_TYPE_PROCESS:
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def run_benchmark(case_name: str, algo: str, iterations: int, payload_size: int, executor_type: str,
+                  workers: int, operations: int) -> BenchmarkResult:
+    args = prepare_case_args(case_name=case_name, iterations=iterations, payload_size=payload_size, algo=algo)
+    with _create_executor(executor_type=executor_type, workers=workers) as executor:
+        # warm up every worker, process pool workers import the app on first task
+        list(executor.map(run_case_once, [case_name] * workers, [args] * workers))
+
+        started_at = time.perf_counter()
+        latencies = list(executor.map(run_case_once, [case_name] * operations, [args] * operations))
+        total_seconds = time.perf_counter() - started_at
+
+    return BenchmarkResult(
+        case=case_name,
+        algo=algo,
+        iterations=iterations,
+        payload_size=payload_size,
+        executor_type=executor_type,
+        workers=workers,
+        operations=operations,
+        total_seconds=total_seconds,
+        ops_per_sec=operations / total_seconds,
+        p50_latency_ms=_percentile(latencies, 50) * 1000,
+        p99_latency_ms=_percentile(latencies, 99) * 1000,
+    )
+
+
+def _set_scaling_efficiency(results: List[BenchmarkResult]):
+    # efficiency = ops/sec with N workers / (N * ops/sec with 1 worker) for the same parameters
+    single_worker_results = {
+        (result.case, result.algo, result.iterations, result.payload_size, result.executor_type): result
+        for result in results if result.workers == 1
+    }
+    for result in results:
+        key = (result.case, result.algo, result.iterations, result.payload_size, result.executor_type)
+        single_worker_result = single_worker_results.get(key)
+        if single_worker_result:
+            result.scaling_efficiency = result.ops_per_sec / (result.workers * single_worker_result.ops_per_sec)
+
+
+def _get_git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _parse_int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(',') if item]
+
+
+def _parse_str_list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Crypto micro-benchmark suite')
+    parser.add_argument('--cases', type=_parse_str_list, default=list(CASES.keys()),
+                        help=f"Comma separated cases, available: {','.join(CASES.keys())}")
+    parser.add_argument('--algos', type=_parse_str_list, default=['fernet'],
+                        help='Comma separated server side algos for password_encrypt/password_decrypt')
+    parser.add_argument('--iterations', type=_parse_int_list, default=[100_000, 480_000, 600_000])
+    parser.add_argument('--payload-sizes', type=_parse_int_list, default=[32, 1024, 16384])
+    parser.add_argument('--workers', type=_parse_int_list, default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument('--executors', type=_parse_str_list, default=[EXECUTOR_TYPE_THREAD, EXECUTOR_TYPE_PROCESS])
+    parser.add_argument('--operations', type=int, default=20, help='Measured operations per worker')
+    parser.add_argument('--output', type=Path, default=Path('benchmark_results', 'crypto.json'))
+    args = parser.parse_args()
+
+    results: List[BenchmarkResult] = []
+    for case_name in args.cases:
+        algos = [CASE_FIXED_ALGOS[case_name]] if case_name in CASE_FIXED_ALGOS else args.algos
+        for algo in algos:
+            for iterations in args.iterations:
+                for payload_size in args.payload_sizes:
+                    for executor_type in args.executors:
+                        for workers in args.workers:
+                            result = run_benchmark(
+                                case_name=case_name,
+                                algo=algo,
+                                iterations=iterations,
+                                payload_size=payload_size,
+                                executor_type=executor_type,
+                                workers=workers,
+                                operations=args.operations * workers
+                            )
+                            results.append(result)
+                            print(f"{case_name:<20} {algo:<18} iterations={iterations:<8} "
+                                  f"payload={payload_size:<6} {executor_type:<7} workers={workers:<3} "
+                                  f"ops/sec={result.ops_per_sec:9.2f} p50={result.p50_latency_ms:9.2f}ms "
+                                  f"p99={result.p99_latency_ms:9.2f}ms")
+    _set_scaling_efficiency(results)
+
+    report = {
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'git_commit': _get_git_commit(),
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': [dataclasses.asdict(result) for result in results],
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import secrets
+import time
+from typing import Callable, Dict, Tuple
+
+from src.password.cryptography import CryptographyFernet, get_server_side_cipher, SERVER_SIDE_ALGO_FERNET
+from src.user.repositories import UserRepository
+
+ADDITIONAL_PEPPER = 'benchmark-user-secret'
+
+
+def _derive_key(iterations: int, payload: bytes, algo: str, token: bytes):
+    CryptographyFernet._derive_key(ADDITIONAL_PEPPER.encode(), secrets.token_bytes(32), iterations)
+
+
+def _password_encrypt(iterations: int, payload: bytes, algo: str, token: bytes):
+    get_server_side_cipher(algo).password_encrypt(
+        message=payload,
+        additional_pepper=ADDITIONAL_PEPPER,
+        iterations=iterations
+    )
+
+
+def _password_decrypt(iterations: int, payload: bytes, algo: str, token: bytes):
+    get_server_side_cipher(algo).password_decrypt(token=token, password_to_decrypt=ADDITIONAL_PEPPER)
+
+
+def _user_password_hash(iterations: int, payload: bytes, algo: str, token: bytes):
+    UserRepository(session=None).create_password_hash(password=payload.decode(), iterations=iterations)
+
+
+CASES: Dict[str, Callable] = {
+    'derive_key': _derive_key,
+    'password_encrypt': _password_encrypt,
+    'password_decrypt': _password_decrypt,
+    'user_password_hash': _user_password_hash,
+}
+
+# cases not depending on the server side algo, reported with own fixed algo
+CASE_FIXED_ALGOS: Dict[str, str] = {
+    'derive_key': SERVER_SIDE_ALGO_FERNET,
+    'user_password_hash': UserRepository.AUTH_HASH_ALGO,
+}
+
+
+def prepare_case_args(case_name: str, iterations: int, payload_size: int, algo: str) -> Tuple:
+    # user password hash takes a text password, the rest of cases take raw bytes
+    if case_name == 'user_password_hash':
+        payload = secrets.token_hex(payload_size // 2 or 1).encode()
+    else:
+        payload = secrets.token_bytes(payload_size)
+
+    token = b''
+    if case_name == 'password_decrypt':
+        token = get_server_side_cipher(algo).password_encrypt(
+            message=payload,
+            additional_pepper=ADDITIONAL_PEPPER,
+            iterations=iterations
+        )
+    return iterations, payload, algo, token
+
+
+def run_case_once(case_name: str, args: Tuple) -> float:
+    """Executed inside the benchmark worker, returns latency of a single operation in seconds"""
+    started_at = time.perf_counter()
+    CASES[case_name](*args)
+    return time.perf_counter() - started_at
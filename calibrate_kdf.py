@@ -0,0 +1,28 @@
+import argparse
+
+from src.common.kdf_calibration import KdfCalibration, kdf_calibration
+
+
+def calibrate_kdf(target_ms: float, min_iterations: int, max_iterations: int):
+    calibration = KdfCalibration(
+        enabled=True,
+        target_ms=target_ms,
+        min_iterations=min_iterations,
+        max_iterations=max_iterations
+    )
+    result = calibration.calibrate()
+
+    print(f"PBKDF2-HMAC-SHA256 throughput: {result.iterations_per_sec:.0f} iterations/sec")
+    print(f"Iterations for {target_ms} ms per operation (floor {min_iterations}), put into .env:")
+    print(f"PASSWORD_SERVER_SIDE_ITERATIONS='{result.server_side_iterations}'")
+    print(f"USER_AUTH_HASH_N_ITERATIONS='{result.user_auth_iterations}'")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure PBKDF2 speed and pick KDF iterations for a latency target')
+    parser.add_argument('--target-ms', required=False, type=float, default=kdf_calibration.target_ms)
+    parser.add_argument('--min-iterations', required=False, type=int, default=kdf_calibration.min_iterations)
+    parser.add_argument('--max-iterations', required=False, type=int, default=kdf_calibration.max_iterations)
+    args = parser.parse_args()
+
+    calibrate_kdf(target_ms=args.target_ms, min_iterations=args.min_iterations, max_iterations=args.max_iterations)
@@ -0,0 +1,36 @@
+"""empty message
+
+Revision ID: a3f1c2d4e5b6
+Revises: 6b652f5ee4e8
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f1c2d4e5b6'
+down_revision: Union[str, None] = '6b652f5ee4e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('pa_password_history', sa.Column('server_side_password_encrypted', sa.LargeBinary(length=8192), nullable=True))
+    op.add_column('pa_password_history', sa.Column('server_side_algo', sa.String(length=30), nullable=True))
+    op.add_column('pa_password_history', sa.Column('server_side_iterations', sa.Integer(), nullable=True))
+    op.alter_column('pa_password_history', 'client_side_password_encrypted',
+               existing_type=sa.LargeBinary(length=8192),
+               nullable=True)
+
+
+def downgrade() -> None:
+    op.alter_column('pa_password_history', 'client_side_password_encrypted',
+               existing_type=sa.LargeBinary(length=8192),
+               nullable=False)
+    op.drop_column('pa_password_history', 'server_side_iterations')
+    op.drop_column('pa_password_history', 'server_side_algo')
+    op.drop_column('pa_password_history', 'server_side_password_encrypted')
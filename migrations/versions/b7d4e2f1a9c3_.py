@@ -0,0 +1,26 @@
+"""empty message
+
+Revision ID: b7d4e2f1a9c3
+Revises: a3f1c2d4e5b6
+Create Date: 2026-10-18 12:03:17.552910
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d4e2f1a9c3'
+down_revision: Union[str, None] = 'a3f1c2d4e5b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('us_user', sa.Column('token_key_version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('us_user', 'token_key_version')
@@ -0,0 +1,38 @@
+"""empty message
+
+Revision ID: c5e8a1b3d7f2
+Revises: b7d4e2f1a9c3
+Create Date: 2026-10-18 13:21:44.907161
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e8a1b3d7f2'
+down_revision: Union[str, None] = 'b7d4e2f1a9c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('us_user_token', sa.Column('token_hash', sa.LargeBinary(length=32), nullable=True))
+    op.execute("UPDATE us_user_token SET token_hash = sha256(convert_to(token, 'UTF8'))")
+    op.alter_column('us_user_token', 'token_hash',
+               existing_type=sa.LargeBinary(length=32),
+               nullable=False)
+    op.create_unique_constraint('us_user_token_token_hash_key', 'us_user_token', ['token_hash'])
+    op.drop_constraint('us_user_token_token_key', 'us_user_token', type_='unique')
+    op.drop_column('us_user_token', 'token')
+
+
+def downgrade() -> None:
+    # raw tokens can not be restored from hashes, users have to log in again
+    op.execute("DELETE FROM us_user_token")
+    op.add_column('us_user_token', sa.Column('token', sa.String(length=512), nullable=False))
+    op.create_unique_constraint('us_user_token_token_key', 'us_user_token', ['token'])
+    op.drop_constraint('us_user_token_token_hash_key', 'us_user_token', type_='unique')
+    op.drop_column('us_user_token', 'token_hash')
@@ -0,0 +1,26 @@
+"""empty message
+
+Revision ID: d2a6f9c4b8e1
+Revises: c5e8a1b3d7f2
+Create Date: 2026-10-18 14:37:09.114850
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a6f9c4b8e1'
+down_revision: Union[str, None] = 'c5e8a1b3d7f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('us_user_token', sa.Column('last_used_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('us_user_token', 'last_used_at')
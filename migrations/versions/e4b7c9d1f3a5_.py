@@ -0,0 +1,41 @@
+"""empty message
+
+Revision ID: e4b7c9d1f3a5
+Revises: d2a6f9c4b8e1
+Create Date: 2026-10-18 16:05:52.381447
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7c9d1f3a5'
+down_revision: Union[str, None] = 'd2a6f9c4b8e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_pa_password_user_id', 'pa_password', 'user_id'),
+    ('ix_pa_password_url_password_id', 'pa_password_url', 'password_id'),
+    ('ix_pa_password_history_password_id', 'pa_password_history', 'password_id'),
+    ('ix_pa_password_group_password_id', 'pa_password_group', 'password_id'),
+    ('ix_us_user_group_user_id', 'us_user_group', 'user_id'),
+    ('ix_us_user_token_user_id', 'us_user_token', 'user_id'),
+    ('ix_us_user_token_expiration_date', 'us_user_token', 'expiration_date'),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY can not run inside a transaction, tables stay writable while indexes are built
+    with op.get_context().autocommit_block():
+        for index_name, table_name, column_name in INDEXES:
+            op.create_index(index_name, table_name, [column_name], unique=False,
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for index_name, table_name, _ in reversed(INDEXES):
+            op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True, if_exists=True)
@@ -1,5 +1,6 @@
 import logging
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
@@ -18,15 +19,41 @@ load_dotenv()
 
 # DB
 from src.common.Database import Database
+from src.common.db_pool import InstrumentedQueuePool, db_pool_metrics, db_pool_settings, listen_pool_events
 from src.user.models import UserModel, UserTokenModel, UserGroupModel
 from src.group.models import GroupModel
 from src.password.models import PasswordModel, PasswordUrlModel, PasswordHistoryModel, PasswordGroupModel
 
-engine = create_engine(os.environ['DB_URI'], connect_args={'connect_timeout': 10})
+engine = create_engine(os.environ['DB_URI'], poolclass=InstrumentedQueuePool, **db_pool_settings.engine_kwargs())
+listen_pool_events(engine, metrics=db_pool_metrics)
 Base = Database
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from src.common.async_db_session import dispose_async_engine
+    from src.common.invalidation_bus import invalidation_bus
+    from src.common.kdf_calibration import kdf_calibration
+    from src.password.crypto_engine import crypto_engine
+    from src.user.token_reaper import expired_token_reaper
+    from src.user.password_hashing import user_password_hash_engine
+    from src.user.token_usage import token_usage_recorder
+    kdf_calibration.calibrate_if_enabled()
+    expired_token_reaper.start()
+    token_usage_recorder.start()
+    invalidation_bus.start()
+    yield
+    invalidation_bus.stop()
+    await token_usage_recorder.stop()
+    await expired_token_reaper.stop()
+    crypto_engine.shutdown()
+    user_password_hash_engine.shutdown()
+    await dispose_async_engine()
+
+
 # FastAPI
 app = FastAPI(
+    lifespan=lifespan,
     docs_url=f'/swagger-ui',
     redoc_url=f'/redoc',
     openapi_url=f'/openapi.json',
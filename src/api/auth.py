@@ -1,49 +1,143 @@
+import dataclasses
+import datetime
 import os
+import uuid
+from typing import Optional
 
-from fastapi import Security, HTTPException
+from fastapi import Security, HTTPException, Depends
 from fastapi.security import APIKeyHeader
 
+from src.common.async_db_session import DB_ASYNC_ENABLED, get_async_session_factory
 from src.common.db_session import Session
-from src.user.services import UserTokenService
+from src.user.services import AsyncUserJwtTokenService, AsyncUserTokenService, UserJwtTokenService, \
+    UserTokenService
+from src.user.token_cache import user_token_cache
+from src.user.token_usage import token_usage_recorder
+from src.user.types import UserStatelessJwtTokenPayload
 
 API_KEY_NAME = 'X-API-KEY'
 MASTER_API_KEY = os.environ['API_AUTH_MASTER_TOKEN']
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 
 
+@dataclasses.dataclass(frozen=True)
+class AuthPrincipal:
+    """Caller of the request, resolved once by the auth dependency"""
+    is_master_key: bool
+    user_id: Optional[uuid.UUID] = None
+    token_id: Optional[uuid.UUID] = None
+
+
 def _is_token_valid_with_main_token(api_key) -> bool:
     if api_key == MASTER_API_KEY:
         return True
     return False
 
 
-def _is_user_token_valid(api_key) -> bool:
+def _get_stateless_principal(session, api_key) -> Optional[AuthPrincipal]:
+    payload = UserJwtTokenService(session=session).decode_stateless(jwt_token=api_key)
+    return _principal_from_stateless_payload(api_key=api_key, payload=payload)
+
+
+def _principal_from_stateless_payload(api_key, payload: Optional[UserStatelessJwtTokenPayload]) \
+        -> Optional[AuthPrincipal]:
+    if not payload:
+        return None
+
+    user_id = uuid.UUID(payload.sub)
+    user_token_cache.set(
+        token=api_key,
+        user_id=user_id,
+        token_id=None,
+        expiration_date=datetime.datetime.fromtimestamp(payload.exp, tz=datetime.timezone.utc)
+    )
+    return AuthPrincipal(is_master_key=False, user_id=user_id)
+
+
+def _get_user_principal(api_key) -> Optional[AuthPrincipal]:
+    # token seen recently and not expired yet, no database round trip
+    cached_token = user_token_cache.get(token=api_key)
+    if cached_token:
+        return AuthPrincipal(is_master_key=False, user_id=cached_token.user_id, token_id=cached_token.token_id)
+
     session = Session()
     user_token_service = UserTokenService(session=session)
 
-    is_token_valid = user_token_service.is_token_valid(token=api_key)
+    principal = None
+    if UserJwtTokenService.STATELESS_ENABLED:
+        principal = _get_stateless_principal(session=session, api_key=api_key)
+        if principal:
+            session.close()
+            return principal
+
+    token_entity = user_token_service.find_valid_token(token=api_key)
+    if token_entity:
+        principal = _principal_from_token_entity(api_key=api_key, token_entity=token_entity)
 
     if session.is_active:
         session.close()
 
-    return is_token_valid
+    return principal
+
 
+def _principal_from_token_entity(api_key, token_entity) -> AuthPrincipal:
+    user_token_cache.set(
+        token=api_key,
+        user_id=token_entity.user_id,
+        token_id=token_entity.id,
+        expiration_date=token_entity.expiration_date
+    )
+    return AuthPrincipal(is_master_key=False, user_id=token_entity.user_id, token_id=token_entity.id)
 
-async def validate_api_key(api_key: str = Security(api_key_header)):
+
+async def _get_user_principal_async(api_key) -> Optional[AuthPrincipal]:
+    cached_token = user_token_cache.get(token=api_key)
+    if cached_token:
+        return AuthPrincipal(is_master_key=False, user_id=cached_token.user_id, token_id=cached_token.token_id)
+
+    async with get_async_session_factory()() as session:
+        if UserJwtTokenService.STATELESS_ENABLED:
+            payload = await AsyncUserJwtTokenService(session=session).decode_stateless(jwt_token=api_key)
+            principal = _principal_from_stateless_payload(api_key=api_key, payload=payload)
+            if principal:
+                return principal
+        token_entity = await AsyncUserTokenService(session=session).find_valid_token(token=api_key)
+    if not token_entity:
+        return None
+    return _principal_from_token_entity(api_key=api_key, token_entity=token_entity)
+
+
+async def get_auth_principal(api_key: str = Security(api_key_header)) -> AuthPrincipal:
     if not api_key:
         raise HTTPException(status_code=401, detail='Invalid or missing API Key')
 
-    is_token_valid = _is_token_valid_with_main_token(api_key=api_key)
-    if is_token_valid:
-        return
+    if _is_token_valid_with_main_token(api_key=api_key):
+        return AuthPrincipal(is_master_key=True)
 
-    is_user_token_valid = _is_user_token_valid(api_key=api_key)
-    if is_user_token_valid:
-        return
+    if DB_ASYNC_ENABLED:
+        principal = await _get_user_principal_async(api_key=api_key)
+    else:
+        principal = _get_user_principal(api_key=api_key)
+    if principal:
+        if principal.token_id:
+            # sliding expiration, written to the database by the periodic flush
+            token_usage_recorder.record(token_id=principal.token_id)
+        return principal
 
     raise HTTPException(status_code=401, detail='Invalid or missing API Key')
 
 
-def validate_is_master_key_used(api_key: str):
-    if api_key == MASTER_API_KEY:
+async def get_user_principal(principal: AuthPrincipal = Depends(get_auth_principal)) -> AuthPrincipal:
+    """Principal of a user token, master key is rejected"""
+    if principal.is_master_key:
         raise HTTPException(status_code=400, detail="MASTER_API_KEY usage not allowed here")
+    return principal
+
+
+async def validate_api_key(principal: AuthPrincipal = Depends(get_auth_principal)):
+    return
+
+
+async def validate_master_api_key(api_key: str = Security(api_key_header)):
+    if not _is_token_valid_with_main_token(api_key=api_key):
+        raise HTTPException(status_code=401, detail='Invalid or missing API Key')
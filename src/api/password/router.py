@@ -1,12 +1,14 @@
 import logging
 import uuid
-from typing import Annotated, List
+from typing import List, Union
 
-from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from src.api import auth
-from src.api.auth import validate_is_master_key_used
+from src.api.auth import AuthPrincipal
 from src.api.password.parsers import parse_password_history_to_response_schema, \
     parse_password_history_entities_to_response_schema
 from src.api.password.schema import PasswordListResponseSchema, PasswordCreateResponseSchema, \
@@ -14,30 +16,41 @@ from src.api.password.schema import PasswordListResponseSchema, PasswordCreateRe
     PasswordDeleteResponseSchema, PasswordResponseSchema, PasswordGroupResponseSchema, \
     PasswordHistoryResponseSchema
 from src.common.BaseRepository import NotFoundEntityError
-from src.common.db_session import get_db_session
-from src.common.db_utils import entity_to_dict
+from src.common.async_db_session import DB_ASYNC_ENABLED, get_request_db_session
+from src.common.db_session import Session as DbSession
 from src.password.exceptions import PasswordError
-from src.password.services import PasswordService, PasswordHistoryService
+from src.password.services import AsyncPasswordHistoryService, AsyncPasswordService, PasswordService, \
+    PasswordHistoryService, PasswordUpgradeService
 from src.password.types import PasswordDTO
-from src.user.services import UserService
+from src.password.upgrades import password_upgrade_queue
 
 router = APIRouter(prefix='/password', tags=['Passwords'])
 logger = logging.getLogger()
 
 
-@router.get("/list", dependencies=[Depends(auth.validate_api_key)], response_model=PasswordListResponseSchema)
-async def password_list(request: Request, session: Session = Depends(get_db_session)):
-    passwords_items = []
-    user_service = UserService(session=session)
-    password_service = PasswordService(session=session)
-    token = request.headers['X-API-KEY']
-    validate_is_master_key_used(api_key=token)
+def _upgrade_outdated_passwords():
+    session = DbSession()
+    password_upgrade_service = PasswordUpgradeService(session=session)
+    try:
+        upgraded = password_upgrade_service.upgrade_all_pending()
+        logger.info(f"Upgraded server side encryption of {upgraded} passwords")
+    finally:
+        session.close()
+
 
-    user_id = user_service.find_id_by_token(token=token)
-    passwords_dtos = password_service.get_user_passwords_dtos(user_id=user_id)
+@router.get("/list", response_model=PasswordListResponseSchema)
+async def password_list(background_tasks: BackgroundTasks,
+                        session: Union[Session, AsyncSession] = Depends(get_request_db_session),
+                        principal: AuthPrincipal = Depends(auth.get_user_principal)):
+    passwords_items = []
+    if DB_ASYNC_ENABLED:
+        passwords_dtos = await AsyncPasswordService(session=session).get_user_passwords_dtos(user_id=principal.user_id)
+    else:
+        # sync session and crypto engine calls block, keep them off the event loop
+        password_service = PasswordService(session=session)
+        passwords_dtos = await run_in_threadpool(password_service.get_user_passwords_dtos, user_id=principal.user_id)
     for password_dto in passwords_dtos:
-        password_groups_entities = password_service.get_password_groups(password_id=password_dto.id)
-        password_groups = [PasswordGroupResponseSchema.model_validate(entity_to_dict(group)) for group in password_groups_entities]
+        password_groups = [PasswordGroupResponseSchema(id=group.id, name=group.name) for group in password_dto.groups]
         password_history_items = [parse_password_history_to_response_schema(history) for history in password_dto.history]
 
         password_item = PasswordResponseSchema(
@@ -53,41 +66,39 @@ async def password_list(request: Request, session: Session = Depends(get_db_sess
             groups=password_groups
         )
         passwords_items.append(password_item)
-    return PasswordListResponseSchema(passwords=passwords_items)
 
+    if len(password_upgrade_queue):
+        background_tasks.add_task(_upgrade_outdated_passwords)
+    return PasswordListResponseSchema(passwords=passwords_items)
 
-@router.get("/{password_id}/history", dependencies=[Depends(auth.validate_api_key)],
-            response_model=List[PasswordHistoryResponseSchema])
-async def password_history_list(request: Request, password_id: uuid.UUID, session: Session = Depends(get_db_session)):
-    user_service = UserService(session=session)
-    password_history_service = PasswordHistoryService(session=session)
-    token = request.headers['X-API-KEY']
-    validate_is_master_key_used(api_key=token)
 
-    user_id = user_service.find_id_by_token(token=token)
+@router.get("/{password_id}/history", response_model=List[PasswordHistoryResponseSchema])
+async def password_history_list(password_id: uuid.UUID,
+                                session: Union[Session, AsyncSession] = Depends(get_request_db_session),
+                                principal: AuthPrincipal = Depends(auth.get_user_principal)):
     try:
-        password_history_dtos = password_history_service.get_password_history(
-            password_id=password_id,
-            user_id=user_id
-        )
+        if DB_ASYNC_ENABLED:
+            password_history_dtos = await AsyncPasswordHistoryService(session=session).get_password_history(
+                password_id=password_id,
+                user_id=principal.user_id
+            )
+        else:
+            password_history_dtos = await run_in_threadpool(
+                PasswordHistoryService(session=session).get_password_history,
+                password_id=password_id,
+                user_id=principal.user_id
+            )
     except PasswordError as e:
         logger.warning(str(e))
         raise HTTPException(status_code=400, detail=str(e))
 
     return parse_password_history_entities_to_response_schema(password_history_dtos)
 
-@router.post("/create",
-             dependencies=[Depends(auth.validate_api_key)],
-             response_model=PasswordCreateResponseSchema)
+
+@router.post("/create", response_model=PasswordCreateResponseSchema)
 async def create(request: PasswordCreateRequestSchema,
-                 session: Session = Depends(get_db_session),
-                 x_api_key: Annotated[str | None, Header(include_in_schema=False)] = None):
-    token = x_api_key
-    user_service = UserService(session=session)
-    password_service = PasswordService(session=session)
-    validate_is_master_key_used(api_key=token)
-
-    user_id = user_service.find_id_by_token(token=token)
+                 session: Union[Session, AsyncSession] = Depends(get_request_db_session),
+                 principal: AuthPrincipal = Depends(auth.get_user_principal)):
     password_details: PasswordDTO = PasswordDTO(
         name=request.name,
         login=request.login,
@@ -97,9 +108,12 @@ async def create(request: PasswordCreateRequestSchema,
         note=request.note,
         urls=request.urls,
         groups_ids=request.groups_ids,
-        user_id=user_id
+        user_id=principal.user_id
     )
-    password = password_service.create(password_details)
+    if DB_ASYNC_ENABLED:
+        password = await AsyncPasswordService(session=session).create(password_details)
+    else:
+        password = await run_in_threadpool(PasswordService(session=session).create, password_details)
     password_urls = [url.url for url in password.urls]
     groups_ids = [group.id for group in password.groups]
 
@@ -114,18 +128,10 @@ async def create(request: PasswordCreateRequestSchema,
     )
 
 
-@router.post("/update",
-             dependencies=[Depends(auth.validate_api_key)],
-             response_model=PasswordUpdateResponseSchema)
+@router.post("/update", response_model=PasswordUpdateResponseSchema)
 async def update(request: PasswordUpdateRequestSchema,
-                 session: Session = Depends(get_db_session),
-                 x_api_key: Annotated[str | None, Header(include_in_schema=False)] = None):
-    token = x_api_key
-    user_service = UserService(session=session)
-    password_service = PasswordService(session=session)
-    validate_is_master_key_used(api_key=token)
-
-    user_id = user_service.find_id_by_token(token=token)
+                 session: Union[Session, AsyncSession] = Depends(get_request_db_session),
+                 principal: AuthPrincipal = Depends(auth.get_user_principal)):
     password_details: PasswordDTO = PasswordDTO(
         name=request.name,
         login=request.login,
@@ -135,13 +141,20 @@ async def update(request: PasswordUpdateRequestSchema,
         note=request.note,
         urls=request.urls,
         groups_ids=request.groups_ids,
-        user_id=user_id
+        user_id=principal.user_id
     )
     try:
-        password = password_service.update(
-            entity_id=request.password_id,
-            password_new_details=password_details
-        )
+        if DB_ASYNC_ENABLED:
+            password = await AsyncPasswordService(session=session).update(
+                entity_id=request.password_id,
+                password_new_details=password_details
+            )
+        else:
+            password = await run_in_threadpool(
+                PasswordService(session=session).update,
+                entity_id=request.password_id,
+                password_new_details=password_details
+            )
     except PasswordError as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Error: {str(e)}")
@@ -159,23 +172,22 @@ async def update(request: PasswordUpdateRequestSchema,
     )
 
 
-@router.delete("/delete",
-               dependencies=[Depends(auth.validate_api_key)],
-               response_model=PasswordDeleteResponseSchema)
+@router.delete("/delete", response_model=PasswordDeleteResponseSchema)
 async def delete(password_id: uuid.UUID,
-                 session: Session = Depends(get_db_session),
-                 x_api_key: Annotated[str | None, Header(include_in_schema=False)] = None):
-    token = x_api_key
-    user_service = UserService(session=session)
-    password_service = PasswordService(session=session)
-    validate_is_master_key_used(api_key=token)
-
-    user_id = user_service.find_id_by_token(token=token)
+                 session: Union[Session, AsyncSession] = Depends(get_request_db_session),
+                 principal: AuthPrincipal = Depends(auth.get_user_principal)):
     try:
-        deleted_password_id = password_service.delete(
-            password_id=password_id,
-            user_id=user_id
-        )
+        if DB_ASYNC_ENABLED:
+            deleted_password_id = await AsyncPasswordService(session=session).delete(
+                password_id=password_id,
+                user_id=principal.user_id
+            )
+        else:
+            deleted_password_id = await run_in_threadpool(
+                PasswordService(session=session).delete,
+                password_id=password_id,
+                user_id=principal.user_id
+            )
     except NotFoundEntityError:
         logger.error(f"Not found password with id {password_id}")
         raise HTTPException(status_code=400, detail=f"Not found password with id {password_id}")
@@ -13,7 +13,7 @@ class PasswordHistoryResponseSchema(BaseModel):
     id: uuid.UUID
     name: str
     login: str
-    password_encrypted: str
+    password_encrypted: Optional[str] = None
     client_side_algo: str
     client_side_iterations: int
     note: str
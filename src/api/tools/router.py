@@ -1,9 +1,26 @@
+import dataclasses
 import logging
 
 from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
 
+from src import engine
 from src.api import auth
-from src.api.tools.schema import HealthzSchema
+from src.api.tools.schema import HealthzSchema, CryptoEngineStatsSchema, PasswordEncryptionDiagnosticsSchema, \
+    PasswordEncryptionSettingsSchema, PasswordUpgradeStatsSchema, KdfCalibrationSchema, \
+    DecryptedPasswordCacheStatsSchema, DbPoolStatsSchema
+from src.common.async_db_session import get_async_engine
+from src.common.db_pool import async_db_pool_metrics, db_pool_metrics, db_pool_settings
+from src.common.db_session import get_db_session
+from src.common.kdf_calibration import kdf_calibration, CALIBRATION_SOURCE_ENV
+from src.password.blob import BLOB_V2_VERSION
+from src.password.crypto_engine import crypto_engine
+from src.password.cryptography import get_current_server_side_algo, get_current_server_side_iterations
+from src.password.decrypted_cache import password_decrypted_cache
+from src.password.services import PasswordUpgradeService
+from src.password.upgrades import password_upgrade_queue
+from src.user.password_hashing import user_password_hash_engine
+from src.user.repositories import UserRepository
 
 router = APIRouter(tags=['Tools'])
 logger = logging.getLogger()
@@ -11,4 +28,88 @@ logger = logging.getLogger()
 
 @router.get("/healthz", status_code=200, response_model=HealthzSchema)
 async def healthz():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+
+@router.get("/diagnostics/crypto-engine",
+            dependencies=[Depends(auth.validate_master_api_key)],
+            response_model=CryptoEngineStatsSchema)
+async def crypto_engine_stats():
+    return CryptoEngineStatsSchema(**dataclasses.asdict(crypto_engine.stats()))
+
+
+@router.get("/diagnostics/user-password-hash",
+            dependencies=[Depends(auth.validate_master_api_key)],
+            response_model=CryptoEngineStatsSchema)
+async def user_password_hash_stats():
+    return CryptoEngineStatsSchema(**dataclasses.asdict(user_password_hash_engine.stats()))
+
+
+@router.get("/diagnostics/password-encryption",
+            dependencies=[Depends(auth.validate_master_api_key)],
+            response_model=PasswordEncryptionDiagnosticsSchema)
+async def password_encryption_stats(session: Session = Depends(get_db_session)):
+    password_upgrade_service = PasswordUpgradeService(session=session)
+    current_algo = get_current_server_side_algo()
+    current_iterations = get_current_server_side_iterations()
+
+    passwords = [
+        PasswordEncryptionSettingsSchema(
+            server_side_algo=algo,
+            server_side_iterations=iterations,
+            blob_version=blob_version,
+            count=count,
+            outdated=(
+                algo.lower() != current_algo
+                or iterations < current_iterations
+                or blob_version != BLOB_V2_VERSION
+            )
+        )
+        for algo, iterations, blob_version, count in password_upgrade_service.count_by_server_side_settings()
+    ]
+    return PasswordEncryptionDiagnosticsSchema(
+        current_server_side_algo=current_algo,
+        current_server_side_iterations=current_iterations,
+        passwords=passwords,
+        upgrade=PasswordUpgradeStatsSchema(**dataclasses.asdict(password_upgrade_queue.stats()))
+    )
+
+
+@router.get("/diagnostics/kdf",
+            dependencies=[Depends(auth.validate_master_api_key)],
+            response_model=KdfCalibrationSchema)
+async def kdf_calibration_stats():
+    result = kdf_calibration.result()
+    return KdfCalibrationSchema(
+        enabled=kdf_calibration.enabled,
+        source=result.source if result else CALIBRATION_SOURCE_ENV,
+        target_ms=result.target_ms if result else None,
+        min_iterations=result.min_iterations if result else None,
+        max_iterations=result.max_iterations if result else None,
+        iterations_per_sec=result.iterations_per_sec if result else None,
+        calibrated_at=result.calibrated_at if result else None,
+        server_side_iterations=get_current_server_side_iterations(),
+        user_auth_iterations=UserRepository.get_auth_hash_iterations()
+    )
+
+
+@router.get("/diagnostics/password-cache",
+            dependencies=[Depends(auth.validate_master_api_key)],
+            response_model=DecryptedPasswordCacheStatsSchema)
+async def password_cache_stats():
+    return DecryptedPasswordCacheStatsSchema(**dataclasses.asdict(password_decrypted_cache.stats()))
+
+
+@router.get("/diagnostics/db-pool",
+            dependencies=[Depends(auth.validate_master_api_key)],
+            response_model=DbPoolStatsSchema)
+async def db_pool_stats():
+    return DbPoolStatsSchema(**dataclasses.asdict(db_pool_metrics.stats(pool=engine.pool, settings=db_pool_settings)))
+
+
+@router.get("/diagnostics/db-pool-async",
+            dependencies=[Depends(auth.validate_master_api_key)],
+            response_model=DbPoolStatsSchema)
+async def async_db_pool_stats():
+    pool = get_async_engine().sync_engine.pool
+    return DbPoolStatsSchema(**dataclasses.asdict(async_db_pool_metrics.stats(pool=pool, settings=db_pool_settings)))
@@ -1,5 +1,86 @@
+import datetime
+from typing import List, Optional
+
 from pydantic import BaseModel
 
 
 class HealthzSchema(BaseModel):
     status: str = 'ok'
+
+
+class CryptoEngineStatsSchema(BaseModel):
+    executor_type: str
+    max_workers: int
+    in_flight: int
+    queue_depth: int
+    max_queue_depth: int
+    submitted: int
+    completed: int
+    failed: int
+    avg_latency_ms: float
+    avg_run_ms: float
+    avg_wait_ms: float
+    max_latency_ms: float
+
+
+class PasswordEncryptionSettingsSchema(BaseModel):
+    server_side_algo: str
+    server_side_iterations: int
+    blob_version: int
+    count: int
+    outdated: bool
+
+
+class PasswordUpgradeStatsSchema(BaseModel):
+    pending: int
+    queued: int
+    upgraded: int
+    skipped: int
+    failed: int
+    dropped: int
+
+
+class PasswordEncryptionDiagnosticsSchema(BaseModel):
+    current_server_side_algo: str
+    current_server_side_iterations: int
+    passwords: List[PasswordEncryptionSettingsSchema]
+    upgrade: PasswordUpgradeStatsSchema
+
+
+class KdfCalibrationSchema(BaseModel):
+    enabled: bool
+    source: str
+    target_ms: Optional[float]
+    min_iterations: Optional[int]
+    max_iterations: Optional[int]
+    iterations_per_sec: Optional[float]
+    calibrated_at: Optional[datetime.datetime]
+    server_side_iterations: int
+    user_auth_iterations: int
+
+
+class DecryptedPasswordCacheStatsSchema(BaseModel):
+    enabled: bool
+    entries: int
+    size_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+
+
+class DbPoolStatsSchema(BaseModel):
+    pool_size: int
+    max_overflow: int
+    pool_timeout: float
+    pool_recycle: int
+    pool_pre_ping: bool
+    checked_out: int
+    idle: int
+    overflow: int
+    checkouts: int
+    overflow_connects: int
+    timeouts: int
+    connects: int
+    invalidations: int
+    avg_checkout_time_ms: float
+    max_checkout_time_ms: float
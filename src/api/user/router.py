@@ -1,54 +1,56 @@
 import logging
-from typing import List
+from typing import List, Union
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from src.api import auth
 from src.api.user.schema import LoginResponseSchema, UserResponseSchema, UserUuidResponseSchema, LoginRequestSchema, \
     UserCreateRequestSchema, UserUpdateRequestSchema
 from src.common.BaseRepository import NotFoundEntityError
-from src.common.db_session import get_db_session
+from src.common.async_db_session import DB_ASYNC_ENABLED, get_request_db_session
 from src.user.exceptions import UserLoginPasswordInvalidError
-from src.user.services import UserService, UserTokenService
+from src.user.services import AsyncUserService, UserService
 
 router = APIRouter(prefix='/user', tags=['Users'])
 logger = logging.getLogger()
 
 
 @router.post("/login", response_model=LoginResponseSchema)
-async def login(request: LoginRequestSchema, session: Session = Depends(get_db_session)):
-    user_service = UserService(session=session)
-    user_token_service = UserTokenService(session=session)
-
+async def login(request: LoginRequestSchema,
+                session: Union[Session, AsyncSession] = Depends(get_request_db_session)):
     try:
-        user_logged_jwt_token = user_service.login_user(
-            username=request.username,
-            password_clear=request.password
-        )
+        if DB_ASYNC_ENABLED:
+            user_logged_jwt_token = await AsyncUserService(session=session).login_user_and_create_token(
+                username=request.username,
+                password_clear=request.password
+            )
+        else:
+            user_logged_jwt_token = await UserService(session=session).login_user_and_create_token_async(
+                username=request.username,
+                password_clear=request.password
+            )
     except (NotFoundEntityError, UserLoginPasswordInvalidError):
         msg = "Invalid username or password"
         raise HTTPException(status_code=401, detail=msg)
 
-    user_entity = user_service.find_by_username(username=request.username)
-    entity = user_token_service.create_token(
-        token=user_logged_jwt_token,
-        user_id=user_entity.id
-    )
-
     return LoginResponseSchema(
-        token=entity.token
+        token=user_logged_jwt_token
     )
 
 
 @router.get("/", response_model=List[UserResponseSchema],
             dependencies=[Depends(auth.validate_api_key)])
-async def find_all(session: Session = Depends(get_db_session)):
-    service = UserService(session=session)
+async def find_all(session: Union[Session, AsyncSession] = Depends(get_request_db_session)):
     users_response: List[UserResponseSchema] = []
 
-    entities = service.find_all()
+    if DB_ASYNC_ENABLED:
+        entities = await AsyncUserService(session=session).find_all()
+    else:
+        entities = UserService(session=session).find_all()
     for entity in entities:
         entity_data = UserResponseSchema(
             id=entity.id,
@@ -60,13 +62,12 @@ async def find_all(session: Session = Depends(get_db_session)):
 
 @router.get("/by_username", response_model=UserResponseSchema,
             dependencies=[Depends(auth.validate_api_key)])
-async def find_by_username(username: str, session: Session = Depends(get_db_session)):
-    service = UserService(session=session)
-
+async def find_by_username(username: str, session: Union[Session, AsyncSession] = Depends(get_request_db_session)):
     try:
-        entity = service.find_by_username(
-            username=username,
-        )
+        if DB_ASYNC_ENABLED:
+            entity = await AsyncUserService(session=session).find_by_username(username=username)
+        else:
+            entity = UserService(session=session).find_by_username(username=username)
     except Exception:
         raise HTTPException(status_code=404, detail=f"Not found user with username: '{username}'")
 
@@ -78,14 +79,19 @@ async def find_by_username(username: str, session: Session = Depends(get_db_sess
 
 @router.post("/create", response_model=UserResponseSchema,
              dependencies=[Depends(auth.validate_api_key)])
-async def create(request: UserCreateRequestSchema, session: Session = Depends(get_db_session)):
-    service = UserService(session=session)
-
+async def create(request: UserCreateRequestSchema,
+                 session: Union[Session, AsyncSession] = Depends(get_request_db_session)):
     try:
-        entity = service.create_user(
-            username=request.username,
-            password_clear=request.password
-        )
+        if DB_ASYNC_ENABLED:
+            entity = await AsyncUserService(session=session).create_user(
+                username=request.username,
+                password_clear=request.password
+            )
+        else:
+            entity = await UserService(session=session).create_user_async(
+                username=request.username,
+                password_clear=request.password
+            )
     except Exception as e:
         logger.error(str(e))
         raise HTTPException(status_code=400, detail="User create error")
@@ -98,13 +104,19 @@ async def create(request: UserCreateRequestSchema, session: Session = Depends(ge
 
 @router.post("/update", response_model=UserResponseSchema,
              dependencies=[Depends(auth.validate_api_key)])
-async def update(request: UserUpdateRequestSchema, session: Session = Depends(get_db_session)):
-    service = UserService(session=session)
+async def update(request: UserUpdateRequestSchema,
+                 session: Union[Session, AsyncSession] = Depends(get_request_db_session)):
     try:
-        entity = service.update_user(
-            user_id=request.user_id,
-            password_clear=request.password
-        )
+        if DB_ASYNC_ENABLED:
+            entity = await AsyncUserService(session=session).update_user(
+                user_id=request.user_id,
+                password_clear=request.password
+            )
+        else:
+            entity = await UserService(session=session).update_user_async(
+                user_id=request.user_id,
+                password_clear=request.password
+            )
     except Exception as e:
         logger.error(str(e))
         raise HTTPException(status_code=400, detail="User update error")
@@ -117,14 +129,29 @@ async def update(request: UserUpdateRequestSchema, session: Session = Depends(ge
 
 @router.delete("/delete", response_model=UserUuidResponseSchema,
                dependencies=[Depends(auth.validate_api_key)])
-async def delete(user_id: UUID, session: Session = Depends(get_db_session)):
-    service = UserService(session=session)
+async def delete(user_id: UUID, session: Union[Session, AsyncSession] = Depends(get_request_db_session)):
     try:
-        entity_id = service.delete_user(
-            user_id=user_id,
-        )
+        if DB_ASYNC_ENABLED:
+            entity_id = await AsyncUserService(session=session).delete_user(user_id=user_id)
+        else:
+            entity_id = UserService(session=session).delete_user(user_id=user_id)
     except Exception as e:
         logger.error(str(e))
         raise HTTPException(status_code=400, detail="User delete error")
 
     return UserUuidResponseSchema(id=entity_id)
+
+
+@router.post("/revoke_tokens", response_model=UserUuidResponseSchema,
+             dependencies=[Depends(auth.validate_api_key)])
+async def revoke_tokens(user_id: UUID, session: Union[Session, AsyncSession] = Depends(get_request_db_session)):
+    try:
+        if DB_ASYNC_ENABLED:
+            entity_id = await AsyncUserService(session=session).revoke_user_tokens(user_id=user_id)
+        else:
+            entity_id = await run_in_threadpool(UserService(session=session).revoke_user_tokens, user_id=user_id)
+    except Exception as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=400, detail="User tokens revoke error")
+
+    return UserUuidResponseSchema(id=entity_id)
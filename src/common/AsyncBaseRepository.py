@@ -0,0 +1,26 @@
+import abc
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class AsyncBaseRepository(abc.ABC):
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    @abc.abstractmethod
+    def model_class(self):
+        ...
+
+    async def get_by_id(self, id_: Any):
+        return await self.session.get(self.model_class(), id_)
+
+    async def commit(self):
+        await self.session.commit()
+
+    def save(self, entity):
+        self.session.add(entity)
+
+    def select(self):
+        return select(self.model_class())
@@ -0,0 +1,6 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class AsyncBaseService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
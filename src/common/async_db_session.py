@@ -0,0 +1,59 @@
+import os
+from typing import AsyncIterator, Optional
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from src.common.db_pool import InstrumentedAsyncAdaptedQueuePool, async_db_pool_metrics, db_pool_settings, \
+    listen_pool_events
+from src.common.db_session import get_db_session
+
+DB_ASYNC_ENABLED = os.environ.get('DB_ASYNC_ENABLED', 'false').lower() == 'true'
+ASYNC_DB_DRIVER = 'postgresql+psycopg'
+
+_async_engine: Optional[AsyncEngine] = None
+_async_session_factory: Optional[async_sessionmaker] = None
+
+
+def get_async_db_uri() -> str:
+    """ASYNC_DB_URI or DB_URI with the driver switched to psycopg 3"""
+    if os.environ.get('ASYNC_DB_URI'):
+        return os.environ['ASYNC_DB_URI']
+    return make_url(os.environ['DB_URI']).set(drivername=ASYNC_DB_DRIVER).render_as_string(hide_password=False)
+
+
+def get_async_engine() -> AsyncEngine:
+    # created on first use, the psycopg 3 driver is needed only when the async layer is used
+    global _async_engine
+    if _async_engine is None:
+        engine_kwargs = db_pool_settings.engine_kwargs()
+        # psycopg 3 returns text as bytes on SQL_ASCII databases, always decode it as utf-8
+        engine_kwargs['connect_args'] = dict(engine_kwargs['connect_args'], client_encoding='utf8')
+        _async_engine = create_async_engine(get_async_db_uri(), poolclass=InstrumentedAsyncAdaptedQueuePool,
+                                            **engine_kwargs)
+        listen_pool_events(_async_engine.sync_engine, metrics=async_db_pool_metrics)
+    return _async_engine
+
+
+def get_async_session_factory() -> async_sessionmaker:
+    global _async_session_factory
+    if _async_session_factory is None:
+        _async_session_factory = async_sessionmaker(bind=get_async_engine(), expire_on_commit=False)
+    return _async_session_factory
+
+
+async def get_async_db_session() -> AsyncIterator[AsyncSession]:
+    async with get_async_session_factory()() as session:
+        yield session
+
+
+# handlers ported to the async layer depend on this one, a request opens either a sync or an async session
+get_request_db_session = get_async_db_session if DB_ASYNC_ENABLED else get_db_session
+
+
+async def dispose_async_engine():
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _async_session_factory = None
@@ -0,0 +1,181 @@
+import dataclasses
+import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import Engine, event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+@dataclasses.dataclass
+class DbPoolSettings:
+    pool_size: int
+    max_overflow: int
+    pool_timeout: float
+    pool_recycle: int
+    pool_pre_ping: bool
+    connect_timeout: int
+
+    @classmethod
+    def from_env(cls) -> 'DbPoolSettings':
+        return cls(
+            pool_size=int(os.environ.get('DB_POOL_SIZE', 5)),
+            max_overflow=int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10)),
+            pool_timeout=float(os.environ.get('DB_POOL_TIMEOUT_SECONDS', 30)),
+            pool_recycle=int(os.environ.get('DB_POOL_RECYCLE_SECONDS', 1800)),
+            pool_pre_ping=os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true',
+            connect_timeout=int(os.environ.get('DB_CONNECT_TIMEOUT_SECONDS', 10)),
+        )
+
+    def engine_kwargs(self) -> dict:
+        return dict(
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_timeout=self.pool_timeout,
+            pool_recycle=self.pool_recycle,
+            pool_pre_ping=self.pool_pre_ping,
+            connect_args={'connect_timeout': self.connect_timeout},
+        )
+
+
+@dataclasses.dataclass
+class DbPoolStats:
+    pool_size: int
+    max_overflow: int
+    pool_timeout: float
+    pool_recycle: int
+    pool_pre_ping: bool
+    checked_out: int
+    idle: int
+    overflow: int
+    checkouts: int
+    overflow_connects: int
+    timeouts: int
+    connects: int
+    invalidations: int
+    avg_checkout_time_ms: float
+    max_checkout_time_ms: float
+
+
+class DbPoolMetrics:
+    """Checkout time of an instrumented pool and pool events registered by listen_pool_events"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._checkouts = 0
+            self._overflow_connects = 0
+            self._timeouts = 0
+            self._connects = 0
+            self._invalidations = 0
+            self._timed_checkouts = 0
+            self._total_checkout_time = 0.0
+            self._max_checkout_time = 0.0
+
+    def record_checkout(self):
+        with self._lock:
+            self._checkouts += 1
+
+    def record_checkout_time(self, seconds: float):
+        with self._lock:
+            self._timed_checkouts += 1
+            self._total_checkout_time += seconds
+            self._max_checkout_time = max(self._max_checkout_time, seconds)
+
+    def record_timeout(self, seconds: float):
+        with self._lock:
+            self._timeouts += 1
+            self._max_checkout_time = max(self._max_checkout_time, seconds)
+
+    def record_connect(self, is_overflow: bool):
+        with self._lock:
+            self._connects += 1
+            self._overflow_connects += int(is_overflow)
+
+    def record_invalidation(self):
+        with self._lock:
+            self._invalidations += 1
+
+    def stats(self, pool: QueuePool, settings: DbPoolSettings) -> DbPoolStats:
+        with self._lock:
+            return DbPoolStats(
+                pool_size=settings.pool_size,
+                max_overflow=settings.max_overflow,
+                pool_timeout=settings.pool_timeout,
+                pool_recycle=settings.pool_recycle,
+                pool_pre_ping=settings.pool_pre_ping,
+                checked_out=pool.checkedout(),
+                idle=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+                checkouts=self._checkouts,
+                overflow_connects=self._overflow_connects,
+                timeouts=self._timeouts,
+                connects=self._connects,
+                invalidations=self._invalidations,
+                avg_checkout_time_ms=(
+                    self._total_checkout_time / self._timed_checkouts * 1000 if self._timed_checkouts else 0.0
+                ),
+                max_checkout_time_ms=self._max_checkout_time * 1000,
+            )
+
+
+db_pool_metrics = DbPoolMetrics()
+async_db_pool_metrics = DbPoolMetrics()
+db_pool_settings = DbPoolSettings.from_env()
+
+
+class _CheckoutTimingMixin:
+    """Times QueuePool._do_get and records it in the metrics of the pool class
+
+    The checkout time is the wait for a free connection plus, when the pool opens a new connection, the
+    connect itself. SQLAlchemy has no public event fired before a checkout starts waiting, so the call is
+    timed around QueuePool._do_get, which is internal API. It is checked against SQLAlchemy 2.0.25 (pinned
+    in requirements.txt); re-check the override when upgrading. Checkouts, connects and overflow are
+    recorded by the public pool events in listen_pool_events.
+    """
+    metrics: DbPoolMetrics
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout(seconds=time.perf_counter() - started_at)
+            raise
+        self.metrics.record_checkout_time(seconds=time.perf_counter() - started_at)
+        return connection
+
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    """QueuePool of the sync engine, recorded in db_pool_metrics"""
+    metrics = db_pool_metrics
+
+
+class InstrumentedAsyncAdaptedQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool of the async engine, recorded in async_db_pool_metrics"""
+    metrics = async_db_pool_metrics
+
+
+def listen_pool_events(engine: Engine, metrics: DbPoolMetrics):
+    """Record checkouts, connects and invalidations of the engine pool in metrics
+
+    Listeners are registered on the engine, so they follow the pool when engine.dispose() recreates it. For
+    an AsyncEngine pass its sync_engine. QueuePool increments its overflow before opening a connection past
+    pool_size, so a connect seen with a positive overflow is an overflow connection.
+    """
+
+    @event.listens_for(engine, 'checkout')
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.record_checkout()
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.record_connect(is_overflow=engine.pool.overflow() > 0)
+
+    @event.listens_for(engine, 'invalidate')
+    def _on_invalidate(dbapi_connection, connection_record, exception: Optional[BaseException]):
+        metrics.record_invalidation()
@@ -0,0 +1,144 @@
+import json
+import logging
+import os
+import select
+import threading
+import uuid
+from typing import Callable, Dict, List, Optional
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from sqlalchemy import func
+from sqlalchemy import select as sql_select
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger()
+
+BUS_RECONNECTED_EVENT = 'bus_reconnected'
+
+InvalidationHandler = Callable[[dict], None]
+
+
+class CacheInvalidationBus:
+    """
+    Cache invalidation events between workers over Postgres LISTEN/NOTIFY.
+    Event is applied in the publishing worker at once and sent to the others when the publishing
+    transaction commits. Events missed while the listener reconnects are covered by BUS_RECONNECTED_EVENT,
+    handlers are expected to drop their whole cache on it
+    """
+
+    def __init__(self, enabled: bool, channel: str, db_uri: str, poll_timeout_seconds: float = 1,
+                 reconnect_delay_seconds: float = 5):
+        self.enabled = enabled
+        self.channel = channel
+        self.db_uri = db_uri
+        self.poll_timeout_seconds = poll_timeout_seconds
+        self.reconnect_delay_seconds = reconnect_delay_seconds
+        self.origin_id = str(uuid.uuid4())
+        self._handlers: Dict[str, List[InvalidationHandler]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self.listening = threading.Event()
+
+    def subscribe(self, event: str, handler: InvalidationHandler):
+        self._handlers.setdefault(event, []).append(handler)
+
+    def _dispatch(self, event: str, payload: dict):
+        for handler in self._handlers.get(event, []):
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.error(f"Cache invalidation handler error, event {event}: {str(e)}")
+
+    def _notify_statement(self, event: str, payload: dict):
+        message = json.dumps({'event': event, 'origin_id': self.origin_id, 'payload': payload})
+        return sql_select(func.pg_notify(self.channel, message))
+
+    def publish(self, session, event: str, payload: dict):
+        """Apply event locally and notify other workers, commits the session"""
+        self._dispatch(event=event, payload=payload)
+        if not self.enabled:
+            return
+
+        session.execute(self._notify_statement(event=event, payload=payload))
+        session.commit()
+
+    async def publish_async(self, session, event: str, payload: dict):
+        """Same as publish, on an AsyncSession"""
+        self._dispatch(event=event, payload=payload)
+        if not self.enabled:
+            return
+
+        await session.execute(self._notify_statement(event=event, payload=payload))
+        await session.commit()
+
+    def _handle_notification(self, message: str):
+        try:
+            notification = json.loads(message)
+        except ValueError:
+            logger.error(f"Invalid cache invalidation message: {message}")
+            return
+
+        # already applied when published
+        if notification.get('origin_id') == self.origin_id:
+            return
+        self._dispatch(event=notification['event'], payload=notification.get('payload', {}))
+
+    def _connect(self):
+        url = make_url(self.db_uri)
+        connection = psycopg2.connect(
+            **url.translate_connect_args(username='user', database='dbname'),
+            connect_timeout=10
+        )
+        connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with connection.cursor() as cursor:
+            cursor.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+        return connection
+
+    def _listen(self):
+        connected_before = False
+        while not self._stop_event.is_set():
+            connection = None
+            try:
+                connection = self._connect()
+                if connected_before:
+                    self._dispatch(event=BUS_RECONNECTED_EVENT, payload={})
+                connected_before = True
+                self.listening.set()
+
+                while not self._stop_event.is_set():
+                    if select.select([connection], [], [], self.poll_timeout_seconds) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        self._handle_notification(connection.notifies.pop(0).payload)
+            except Exception as e:
+                logger.error(f"Cache invalidation listener error: {str(e)}")
+                self.listening.clear()
+                self._stop_event.wait(self.reconnect_delay_seconds)
+            finally:
+                if connection is not None:
+                    connection.close()
+        self.listening.clear()
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._listen, name='cache-invalidation-bus', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=self.poll_timeout_seconds + 5)
+        self._thread = None
+
+
+invalidation_bus = CacheInvalidationBus(
+    enabled=os.environ.get('CACHE_INVALIDATION_BUS_ENABLED', 'true').lower() == 'true',
+    channel=os.environ.get('CACHE_INVALIDATION_BUS_CHANNEL', 'password_manager_cache_invalidation'),
+    db_uri=os.environ['DB_URI']
+)
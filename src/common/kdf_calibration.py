@@ -0,0 +1,110 @@
+import dataclasses
+import datetime
+import hashlib
+import logging
+import os
+import secrets
+import time
+from typing import Optional
+
+logger = logging.getLogger()
+
+CALIBRATION_SOURCE_ENV = 'env'
+CALIBRATION_SOURCE_CALIBRATION = 'calibration'
+
+
+@dataclasses.dataclass
+class KdfCalibrationResult:
+    source: str
+    target_ms: Optional[float]
+    min_iterations: Optional[int]
+    max_iterations: Optional[int]
+    iterations_per_sec: Optional[float]
+    server_side_iterations: Optional[int]
+    user_auth_iterations: Optional[int]
+    calibrated_at: Optional[datetime.datetime]
+
+
+def measure_pbkdf2_iterations_per_sec(sample_iterations: int = 100_000, rounds: int = 3) -> float:
+    """
+    Measure PBKDF2-HMAC-SHA256 throughput on this host, same primitive as server side key derivation
+    and user password hash. Best of `rounds` is taken, slower rounds are noise of other processes
+    """
+    password = secrets.token_bytes(32)
+    salt = secrets.token_bytes(32)
+    best_run_time = None
+    for _ in range(rounds):
+        started_at = time.perf_counter()
+        hashlib.pbkdf2_hmac('sha256', password, salt, sample_iterations)
+        run_time = time.perf_counter() - started_at
+        best_run_time = run_time if best_run_time is None else min(best_run_time, run_time)
+    return sample_iterations / best_run_time
+
+
+def calculate_iterations(iterations_per_sec: float, target_ms: float, min_iterations: int,
+                         max_iterations: int, round_to: int = 10_000) -> int:
+    """Iterations filling target latency of a single KDF run, never below the security floor"""
+    iterations = int(iterations_per_sec * target_ms / 1000) // round_to * round_to
+    return min(max(iterations, min_iterations), max(max_iterations, min_iterations))
+
+
+class KdfCalibration:
+    """
+    Iteration counts picked for this host. Until calibration runs, values from env are used
+    """
+
+    def __init__(self, enabled: bool, target_ms: float, min_iterations: int, max_iterations: int):
+        self.enabled = enabled
+        self.target_ms = target_ms
+        self.min_iterations = min_iterations
+        self.max_iterations = max_iterations
+        self._result: Optional[KdfCalibrationResult] = None
+
+    def calibrate(self) -> KdfCalibrationResult:
+        iterations_per_sec = measure_pbkdf2_iterations_per_sec()
+        iterations = calculate_iterations(
+            iterations_per_sec=iterations_per_sec,
+            target_ms=self.target_ms,
+            min_iterations=self.min_iterations,
+            max_iterations=self.max_iterations
+        )
+        self._result = KdfCalibrationResult(
+            source=CALIBRATION_SOURCE_CALIBRATION,
+            target_ms=self.target_ms,
+            min_iterations=self.min_iterations,
+            max_iterations=self.max_iterations,
+            iterations_per_sec=iterations_per_sec,
+            server_side_iterations=iterations,
+            user_auth_iterations=iterations,
+            calibrated_at=datetime.datetime.now(datetime.timezone.utc)
+        )
+        logger.info(f"KDF calibrated to {iterations} iterations, "
+                    f"{iterations_per_sec:.0f} iterations/sec, target {self.target_ms} ms")
+        return self._result
+
+    def calibrate_if_enabled(self) -> Optional[KdfCalibrationResult]:
+        if not self.enabled:
+            return None
+        return self.calibrate()
+
+    def reset(self):
+        self._result = None
+
+    @property
+    def server_side_iterations(self) -> Optional[int]:
+        return self._result.server_side_iterations if self._result else None
+
+    @property
+    def user_auth_iterations(self) -> Optional[int]:
+        return self._result.user_auth_iterations if self._result else None
+
+    def result(self) -> Optional[KdfCalibrationResult]:
+        return self._result
+
+
+kdf_calibration = KdfCalibration(
+    enabled=os.environ.get('KDF_CALIBRATION_ENABLED', 'false').lower() == 'true',
+    target_ms=float(os.environ.get('KDF_CALIBRATION_TARGET_MS', 250)),
+    min_iterations=int(os.environ.get('KDF_CALIBRATION_MIN_ITERATIONS', 600_000)),
+    max_iterations=int(os.environ.get('KDF_CALIBRATION_MAX_ITERATIONS', 5_000_000))
+)
@@ -2,12 +2,15 @@ import os
 import uuid
 from typing import List
 
-from sqlalchemy import and_
+from sqlalchemy import and_, delete
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import selectinload
 
 from src import UserModel, PasswordModel
+from src.common.AsyncBaseRepository import AsyncBaseRepository
 from src.common.BaseRepository import BaseRepository, NotFoundEntityError
 from src.group.models import GroupModel
+from src.user.models import UserGroupModel
 from src.user.repositories import UserRepository
 
 
@@ -100,3 +103,80 @@ class GroupRepository(BaseRepository):
             raise e
 
         return entity_uuid
+
+
+class AsyncGroupRepository(AsyncBaseRepository):
+    def model_class(self):
+        return GroupModel
+
+    async def add_group_with_user(self, name: str, user_id: uuid.UUID) -> GroupModel:
+        """New group and membership of the user, not committed"""
+        entity = GroupModel(
+            name=name
+        )
+        self.save(entity)
+        # membership row has no relationship ordering it after the group and user inserts
+        await self.session.flush()
+        self.save(UserGroupModel(group_id=entity.id, user_id=user_id))
+        return entity
+
+    async def find_groups_by_ids(self, groups_ids: List[uuid.UUID]) -> List[GroupModel]:
+        try:
+            result = await self.session.execute(self.select().where(GroupModel.id.in_(groups_ids)))
+            entities = list(result.scalars().all())
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return entities
+
+    async def find_groups_by_user_id(self, user_id: uuid.UUID) -> List[GroupModel]:
+        try:
+            result = await self.session.execute(
+                self.select().join(GroupModel.users).where(UserModel.id == user_id)
+            )
+            entities = list(result.scalars().all())
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return entities
+
+    async def find_user_default_group(self, user_id: uuid.UUID) -> GroupModel:
+        try:
+            result = await self.session.execute(
+                self.select().join(GroupModel.users).where(
+                    and_(
+                        UserModel.id == user_id,
+                        GroupModel.name == os.environ['USER_DEFAULT_GROUP_NAME']
+                    )
+                )
+            )
+            entity = result.scalar_one()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return entity
+
+    async def find_by_id(self, group_id: uuid.UUID) -> GroupModel:
+        """Group with its users loaded, an AsyncSession can not lazy load them later"""
+        try:
+            result = await self.session.execute(
+                self.select().where(GroupModel.id == group_id).options(selectinload(GroupModel.users))
+            )
+            entity = result.scalar_one()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return entity
+
+    async def delete_by_id(self, group_id: uuid.UUID) -> uuid.UUID:
+        """Not committed"""
+        try:
+            result = await self.session.execute(
+                delete(GroupModel).where(GroupModel.id == group_id).returning(GroupModel.id),
+                execution_options={'synchronize_session': False}
+            )
+            entity_uuid = result.scalar_one()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return entity_uuid
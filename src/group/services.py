@@ -3,12 +3,15 @@ import os
 import uuid
 from typing import Optional, List
 
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.common.AsyncBaseService import AsyncBaseService
 from src.common.BaseService import BaseService
 from src.group.exceptions import GroupDeleteNotAllowedError, GroupUpdateNotAllowedError
 from src.group.models import GroupModel
-from src.group.repositories import GroupRepository
-from src.password.repositories import PasswordGroupRepository
-from src.user.repositories import UserGroupRepository
+from src.group.repositories import AsyncGroupRepository, GroupRepository
+from src.password.repositories import AsyncPasswordGroupRepository, PasswordGroupRepository
+from src.user.repositories import AsyncUserGroupRepository, UserGroupRepository
 
 logger = logging.getLogger()
 
@@ -80,3 +83,64 @@ class GroupService(BaseService):
         group_repo.delete_by_id(group_id=group_id)
         return group_id
 
+
+class AsyncGroupService(AsyncBaseService):
+    async def find_user_groups(self, user_id: uuid.UUID) -> List[GroupModel]:
+        repo = AsyncGroupRepository(session=self.session)
+        groups = await repo.find_groups_by_user_id(user_id=user_id)
+        return groups
+
+    async def create_group_with_user(self, name: str, user_id: uuid.UUID) -> GroupModel:
+        repo = AsyncGroupRepository(session=self.session)
+        try:
+            entity = await repo.add_group_with_user(name=name, user_id=user_id)
+            await repo.commit()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return entity
+
+    async def update(self, group_id: uuid.UUID, new_name: str, user_id: uuid.UUID) -> Optional[GroupModel]:
+        group_repo = AsyncGroupRepository(session=self.session)
+        group_entity = await group_repo.find_by_id(group_id=group_id)
+        group_users_ids = [user.id for user in group_entity.users]
+
+        if user_id not in group_users_ids:
+            raise GroupUpdateNotAllowedError("This group not belong to user")
+
+        group_entity.name = new_name
+        try:
+            await group_repo.commit()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return group_entity
+
+    async def delete(self, group_id: uuid.UUID, user_id: uuid.UUID) -> uuid.UUID:
+        """Same as GroupService.delete, passwords move and group delete in one transaction"""
+        group_repo = AsyncGroupRepository(session=self.session)
+        group_entity = await group_repo.find_by_id(group_id=group_id)
+        if group_entity.name == os.environ['USER_DEFAULT_GROUP_NAME']:
+            raise GroupDeleteNotAllowedError('Cannot delete user default group')
+
+        group_users_ids = [user.id for user in group_entity.users]
+        if user_id not in group_users_ids:
+            raise GroupDeleteNotAllowedError("This group not belong to user")
+
+        # move passwords to default group
+        user_default_group = await group_repo.find_user_default_group(user_id=user_id)
+        await AsyncPasswordGroupRepository(session=self.session).move_password_from_group_to_group(
+            src_group_id=group_id,
+            dst_group_id=user_default_group.id
+        )
+
+        # delete users from many to many user-group db
+        await AsyncUserGroupRepository(session=self.session).delete_user_from_all_groups(user_id=user_id)
+
+        deleted_group_id = await group_repo.delete_by_id(group_id=group_id)
+        try:
+            await group_repo.commit()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return deleted_group_id
@@ -0,0 +1,57 @@
+import dataclasses
+
+from src.password.exceptions import PasswordBlobFormatError
+
+BLOB_V2_VERSION = 2
+
+
+@dataclasses.dataclass
+class PasswordBlob:
+    algo_id: int
+    salt: bytes
+    iterations: int
+    nonce: bytes
+    ciphertext: bytes
+
+
+def is_blob_v2(data: bytes) -> bool:
+    """Legacy blobs are urlsafe base64 text, the version byte of v2 is never a base64 character"""
+    return data[:1] == bytes([BLOB_V2_VERSION])
+
+
+def pack_blob_v2(blob: PasswordBlob) -> bytes:
+    """
+    Raw binary layout:
+    version (1) | algo id (1) | salt length (1) | salt | iterations (4) | nonce length (1) | nonce | ciphertext + tag
+    """
+    return b'%b%b%b%b%b%b' % (
+        bytes([BLOB_V2_VERSION, blob.algo_id, len(blob.salt)]),
+        blob.salt,
+        blob.iterations.to_bytes(4, 'big'),
+        bytes([len(blob.nonce)]),
+        blob.nonce,
+        blob.ciphertext,
+    )
+
+
+def unpack_blob_v2(data: bytes) -> PasswordBlob:
+    if not is_blob_v2(data) or len(data) < 3:
+        raise PasswordBlobFormatError("Not a v2 password blob")
+
+    algo_id, salt_length = data[1], data[2]
+    salt_end = 3 + salt_length
+    nonce_start = salt_end + 5
+    if len(data) < nonce_start:
+        raise PasswordBlobFormatError("Truncated v2 password blob")
+
+    nonce_end = nonce_start + data[salt_end + 4]
+    if len(data) < nonce_end:
+        raise PasswordBlobFormatError("Truncated v2 password blob")
+
+    return PasswordBlob(
+        algo_id=algo_id,
+        salt=data[3:salt_end],
+        iterations=int.from_bytes(data[salt_end:salt_end + 4], 'big'),
+        nonce=data[nonce_start:nonce_end],
+        ciphertext=data[nonce_end:],
+    )
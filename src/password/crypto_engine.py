@@ -0,0 +1,238 @@
+import asyncio
+import dataclasses
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Optional, Tuple, Any, List, Dict
+
+from src.password.cryptography import get_server_side_cipher, SERVER_SIDE_ALGO_FERNET
+
+EXECUTOR_TYPE_THREAD = 'thread'
+EXECUTOR_TYPE_PROCESS = 'process'
+
+
+def _timed_call(fn: Callable, *args) -> Tuple[Any, float]:
+    # executed inside the pool worker, returns the result and pure run time of the task
+    started_at = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started_at
+
+
+def _password_encrypt_task(message: bytes, additional_pepper: str, iterations: int, algo: str) -> bytes:
+    return get_server_side_cipher(algo).password_encrypt(
+        message=message,
+        additional_pepper=additional_pepper,
+        iterations=iterations
+    )
+
+
+def _password_decrypt_task(token: bytes, password_to_decrypt: str, algo: str) -> bytes:
+    return get_server_side_cipher(algo).password_decrypt(
+        token=token,
+        password_to_decrypt=password_to_decrypt
+    )
+
+
+@dataclasses.dataclass
+class CryptoEngineStats:
+    executor_type: str
+    max_workers: int
+    in_flight: int
+    queue_depth: int
+    max_queue_depth: int
+    submitted: int
+    completed: int
+    failed: int
+    avg_latency_ms: float
+    avg_run_ms: float
+    avg_wait_ms: float
+    max_latency_ms: float
+
+
+class CryptoEngine:
+    """
+    Runs CPU heavy crypto operations (KDF + encrypt/decrypt) on a dedicated thread or process pool,
+    so async request handlers can await them instead of blocking the event loop.
+    """
+
+    def __init__(self, executor_type: str = EXECUTOR_TYPE_THREAD, max_workers: Optional[int] = None):
+        if executor_type not in (EXECUTOR_TYPE_THREAD, EXECUTOR_TYPE_PROCESS):
+            raise ValueError(f"Unknown crypto engine executor type: {executor_type}")
+
+        self.executor_type = executor_type
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+        self._in_flight = 0
+        self._max_queue_depth = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_latency = 0.0
+        self._total_run = 0.0
+        self._max_latency = 0.0
+
+    @classmethod
+    def from_env(cls) -> 'CryptoEngine':
+        executor_type = os.environ.get('CRYPTO_ENGINE_EXECUTOR', EXECUTOR_TYPE_THREAD)
+        max_workers = int(os.environ.get('CRYPTO_ENGINE_MAX_WORKERS', 0)) or None
+        return cls(executor_type=executor_type, max_workers=max_workers)
+
+    def _get_executor(self) -> Executor:
+        # executor is created on first use, importing the module never spawns workers
+        with self._lock:
+            if self._executor is None:
+                if self.executor_type == EXECUTOR_TYPE_PROCESS:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='crypto-engine'
+                    )
+            return self._executor
+
+    def _on_task_done(self, submitted_at: float, future: Future):
+        latency = time.perf_counter() - submitted_at
+        with self._lock:
+            self._in_flight -= 1
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+            if future.cancelled() or future.exception():
+                self._failed += 1
+                return
+            self._completed += 1
+            _, run_time = future.result()
+            self._total_run += run_time
+
+    def submit(self, fn: Callable, *args) -> Future:
+        executor = self._get_executor()
+        submitted_at = time.perf_counter()
+        with self._lock:
+            self._submitted += 1
+            self._in_flight += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._in_flight - self.max_workers)
+
+        timed_future = executor.submit(_timed_call, fn, *args)
+        timed_future.add_done_callback(lambda done: self._on_task_done(submitted_at, done))
+
+        # strip the run time measurement, callers get the plain task result
+        result_future = Future()
+
+        def _copy_result(done: Future):
+            if done.cancelled():
+                result_future.cancel()
+            elif done.exception():
+                result_future.set_exception(done.exception())
+            else:
+                result_future.set_result(done.result()[0])
+
+        timed_future.add_done_callback(_copy_result)
+        return result_future
+
+    def run(self, fn: Callable, *args):
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn: Callable, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def password_encrypt(self, message: bytes, additional_pepper: str, iterations: int = 600_000,
+                         algo: str = SERVER_SIDE_ALGO_FERNET) -> bytes:
+        return self.run(_password_encrypt_task, message, additional_pepper, iterations, algo)
+
+    def password_decrypt(self, token: bytes, password_to_decrypt: str, algo: str = SERVER_SIDE_ALGO_FERNET) -> bytes:
+        return self.run(_password_decrypt_task, token, password_to_decrypt, algo)
+
+    async def password_encrypt_async(self, message: bytes, additional_pepper: str, iterations: int = 600_000,
+                                     algo: str = SERVER_SIDE_ALGO_FERNET) -> bytes:
+        return await self.run_async(_password_encrypt_task, message, additional_pepper, iterations, algo)
+
+    async def password_decrypt_async(self, token: bytes, password_to_decrypt: str,
+                                     algo: str = SERVER_SIDE_ALGO_FERNET) -> bytes:
+        return await self.run_async(_password_decrypt_task, token, password_to_decrypt, algo)
+
+    def _run_many(self, fn: Callable, items: List[Tuple], concurrency: Optional[int] = None) -> List:
+        # at most `concurrency` tasks are queued at once, results in the same order as items
+        concurrency = concurrency or self.max_workers
+        results: List = [None] * len(items)
+        pending: Dict[Future, int] = {}
+
+        def _collect(futures):
+            for future in futures:
+                results[pending.pop(future)] = future.result()
+
+        for index, args in enumerate(items):
+            if len(pending) >= concurrency:
+                done, _ = wait(pending.keys(), return_when=FIRST_COMPLETED)
+                _collect(done)
+            pending[self.submit(fn, *args)] = index
+
+        done, _ = wait(pending.keys())
+        _collect(done)
+        return results
+
+    async def _run_many_async(self, fn: Callable, items: List[Tuple], concurrency: Optional[int] = None) -> List:
+        semaphore = asyncio.Semaphore(concurrency or self.max_workers)
+
+        async def _run(args: Tuple):
+            async with semaphore:
+                return await self.run_async(fn, *args)
+
+        results = await asyncio.gather(*[_run(args) for args in items])
+        return list(results)
+
+    def password_decrypt_many(self, items: List[Tuple[bytes, str, str]],
+                              concurrency: Optional[int] = None) -> List[bytes]:
+        """
+        Decrypt many tokens in parallel, at most `concurrency` of them are queued at once.
+        :param items: list of (token, password_to_decrypt, algo)
+        :return: decrypted values in the same order as items
+        """
+        return self._run_many(_password_decrypt_task, items, concurrency)
+
+    async def password_decrypt_many_async(self, items: List[Tuple[bytes, str, str]],
+                                          concurrency: Optional[int] = None) -> List[bytes]:
+        return await self._run_many_async(_password_decrypt_task, items, concurrency)
+
+    def password_encrypt_many(self, items: List[Tuple[bytes, str, int, str]],
+                              concurrency: Optional[int] = None) -> List[bytes]:
+        """
+        Encrypt many messages in parallel, at most `concurrency` of them are queued at once.
+        :param items: list of (message, additional_pepper, iterations, algo)
+        :return: encrypted values in the same order as items
+        """
+        return self._run_many(_password_encrypt_task, items, concurrency)
+
+    def stats(self) -> CryptoEngineStats:
+        with self._lock:
+            finished = self._completed + self._failed
+            avg_latency = self._total_latency / finished if finished else 0.0
+            avg_run = self._total_run / self._completed if self._completed else 0.0
+            return CryptoEngineStats(
+                executor_type=self.executor_type,
+                max_workers=self.max_workers,
+                in_flight=self._in_flight,
+                queue_depth=max(self._in_flight - self.max_workers, 0),
+                max_queue_depth=self._max_queue_depth,
+                submitted=self._submitted,
+                completed=self._completed,
+                failed=self._failed,
+                avg_latency_ms=avg_latency * 1000,
+                avg_run_ms=avg_run * 1000,
+                avg_wait_ms=max(avg_latency - avg_run, 0.0) * 1000,
+                max_latency_ms=self._max_latency * 1000,
+            )
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+crypto_engine = CryptoEngine.from_env()
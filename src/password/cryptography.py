@@ -1,23 +1,80 @@
+import abc
+import hashlib
 import os
 import secrets
 from base64 import urlsafe_b64encode as b64e, urlsafe_b64decode as b64d
+from typing import Dict, Type
 
 from cryptography.fernet import Fernet
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+
+from src.common.kdf_calibration import kdf_calibration
+from src.password.blob import PasswordBlob, is_blob_v2, pack_blob_v2, unpack_blob_v2
+from src.password.exceptions import PasswordAlgoNotSupportedError, PasswordBlobFormatError
+from src.password.key_cache import data_key_cache
+
+SERVER_SIDE_ALGO_FERNET = 'fernet'
+SERVER_SIDE_ALGO_AESGCM = 'aes-256-gcm'
+SERVER_SIDE_ALGO_CHACHA20_POLY1305 = 'chacha20-poly1305'
+SERVER_SIDE_ALGO_ENVELOPE_AESGCM = 'envelope-aesgcm'
+
+SERVER_SIDE_CIPHERS: Dict[str, Type] = {}
+
+
+def _pbkdf2_sha256(password: bytes, salt: bytes, iterations: int) -> bytes:
+    # hashlib releases the GIL while deriving, so the crypto engine thread pool does not stall the event loop
+    return hashlib.pbkdf2_hmac('sha256', password, salt, iterations)
+
+
+def register_server_side_cipher(algo: str, blob_algo_id: int):
+    """
+    Class decorator, makes cipher available for PasswordModel.server_side_algo == algo
+    blob_algo_id is stored in v2 blobs, must never change for already registered cipher
+    """
+    def decorator(cipher_class):
+        SERVER_SIDE_CIPHERS[algo] = cipher_class
+        cipher_class.algo = algo
+        cipher_class.blob_algo_id = blob_algo_id
+        return cipher_class
+    return decorator
+
+
+class BaseServerSideCipher(abc.ABC):
+    algo: str = None
+    blob_algo_id: int = None
+
+    @abc.abstractmethod
+    def _read_legacy_blob(self, token: bytes) -> PasswordBlob:
+        ...
+
+    def _read_blob(self, token: bytes) -> PasswordBlob:
+        if not is_blob_v2(token):
+            return self._read_legacy_blob(token)
+
+        blob = unpack_blob_v2(token)
+        if blob.algo_id != self.blob_algo_id:
+            raise PasswordBlobFormatError(f"Password blob algo id {blob.algo_id} not match {self.algo}")
+        return blob
 
 
 # Source https://stackoverflow.com/a/55147077
-class CryptographyFernet:
+@register_server_side_cipher(SERVER_SIDE_ALGO_FERNET, blob_algo_id=1)
+class CryptographyFernet(BaseServerSideCipher):
     @staticmethod
     def _derive_key(password: bytes, salt: bytes, iterations: int = 600_000) -> bytes:
         """Derive a secret key from a given password and salt"""
-        backend = default_backend()
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(), length=32, salt=salt,
-            iterations=iterations, backend=backend)
-        return b64e(kdf.derive(password))
+        return b64e(_pbkdf2_sha256(password, salt, iterations))
+
+    def _read_legacy_blob(self, token: bytes) -> PasswordBlob:
+        # b64e(salt || iterations || b64d(fernet token))
+        decoded = b64d(token)
+        return PasswordBlob(
+            algo_id=self.blob_algo_id,
+            salt=decoded[:32],
+            iterations=int.from_bytes(decoded[32:36], 'big'),
+            nonce=b'',
+            ciphertext=decoded[36:],
+        )
 
     def password_encrypt(self, message: bytes, additional_pepper: str, iterations: int = 600_000) -> bytes:
         pepper = os.environ['PASSWORD_ENCRYPT_PEPPER']
@@ -26,20 +83,147 @@ class CryptographyFernet:
 
         key = self._derive_key(additional_pepper.encode(), salt, iterations)
         fernet_encrypted = Fernet(key).encrypt(message)
-        return b64e(
-            b'%b%b%b' % (
-                salt,
-                iterations.to_bytes(4, 'big'),
-                b64d(fernet_encrypted),
-            )
+        return pack_blob_v2(PasswordBlob(
+            algo_id=self.blob_algo_id,
+            salt=salt,
+            iterations=iterations,
+            nonce=b'',
+            ciphertext=b64d(fernet_encrypted),
+        ))
+
+    def password_decrypt(self, token: bytes, password_to_decrypt: str) -> bytes:
+        pepper = os.environ['PASSWORD_ENCRYPT_PEPPER']
+        password_to_decrypt = password_to_decrypt + pepper
+
+        blob = self._read_blob(token)
+        key = self._derive_key(password_to_decrypt.encode(), blob.salt, blob.iterations)
+        return Fernet(key).decrypt(b64e(blob.ciphertext))
+
+
+class CryptographyAead(BaseServerSideCipher):
+    """
+    Single pass AEAD, key derived with PBKDF2 from a random per record salt.
+    """
+    AEAD_CLASS = None
+    SALT_BYTES = 32
+    NONCE_BYTES = 12
+
+    @staticmethod
+    def _derive_key(password: bytes, salt: bytes, iterations: int = 600_000) -> bytes:
+        return _pbkdf2_sha256(password, salt, iterations)
+
+    def _read_legacy_blob(self, token: bytes) -> PasswordBlob:
+        # b64e(salt || iterations || nonce || ciphertext with tag)
+        decoded = b64d(token)
+        nonce_start = self.SALT_BYTES + 4
+        return PasswordBlob(
+            algo_id=self.blob_algo_id,
+            salt=decoded[:self.SALT_BYTES],
+            iterations=int.from_bytes(decoded[self.SALT_BYTES:nonce_start], 'big'),
+            nonce=decoded[nonce_start:nonce_start + self.NONCE_BYTES],
+            ciphertext=decoded[nonce_start + self.NONCE_BYTES:],
         )
 
+    def password_encrypt(self, message: bytes, additional_pepper: str, iterations: int = 600_000) -> bytes:
+        pepper = os.environ['PASSWORD_ENCRYPT_PEPPER']
+        salt = secrets.token_bytes(self.SALT_BYTES)
+        nonce = secrets.token_bytes(self.NONCE_BYTES)
+        additional_pepper = additional_pepper + pepper
+
+        key = self._derive_key(additional_pepper.encode(), salt, iterations)
+        return pack_blob_v2(PasswordBlob(
+            algo_id=self.blob_algo_id,
+            salt=salt,
+            iterations=iterations,
+            nonce=nonce,
+            ciphertext=self.AEAD_CLASS(key).encrypt(nonce, message, None),
+        ))
+
     def password_decrypt(self, token: bytes, password_to_decrypt: str) -> bytes:
         pepper = os.environ['PASSWORD_ENCRYPT_PEPPER']
         password_to_decrypt = password_to_decrypt + pepper
 
+        blob = self._read_blob(token)
+        key = self._derive_key(password_to_decrypt.encode(), blob.salt, blob.iterations)
+        return self.AEAD_CLASS(key).decrypt(blob.nonce, blob.ciphertext, None)
+
+
+@register_server_side_cipher(SERVER_SIDE_ALGO_AESGCM, blob_algo_id=2)
+class CryptographyAesGcm(CryptographyAead):
+    AEAD_CLASS = AESGCM
+
+
+@register_server_side_cipher(SERVER_SIDE_ALGO_CHACHA20_POLY1305, blob_algo_id=3)
+class CryptographyChaCha20Poly1305(CryptographyAead):
+    AEAD_CLASS = ChaCha20Poly1305
+
+
+@register_server_side_cipher(SERVER_SIDE_ALGO_ENVELOPE_AESGCM, blob_algo_id=4)
+class CryptographyEnvelopeAesGcm(BaseServerSideCipher):
+    """
+    One data key per user secret, derived once with PBKDF2 and kept in the short living key cache.
+    Every record is encrypted with AES-256-GCM under that key, so only the first operation pays the KDF cost.
+    """
+    NONCE_BYTES = 12
+    DATA_KEY_SALT_PREFIX = b'password-manager-envelope-aesgcm'
+
+    def _get_data_key(self, secret: bytes, iterations: int) -> bytes:
+        # salt is bound to the user secret, same secret and iterations always give the same data key
+        salt = hashlib.sha256(self.DATA_KEY_SALT_PREFIX + secret).digest()
+
+        return data_key_cache.get_or_create(
+            cache_key=(salt, iterations),
+            factory=lambda: _pbkdf2_sha256(secret, salt, iterations)
+        )
+
+    def _read_legacy_blob(self, token: bytes) -> PasswordBlob:
+        # b64e(iterations || nonce || ciphertext with tag)
         decoded = b64d(token)
-        salt, iterations, token = decoded[:32], decoded[32:36], b64e(decoded[36:])
-        iterations = int.from_bytes(iterations, 'big')
-        key = self._derive_key(password_to_decrypt.encode(), salt, iterations)
-        return Fernet(key).decrypt(token)
+        return PasswordBlob(
+            algo_id=self.blob_algo_id,
+            salt=b'',
+            iterations=int.from_bytes(decoded[:4], 'big'),
+            nonce=decoded[4:4 + self.NONCE_BYTES],
+            ciphertext=decoded[4 + self.NONCE_BYTES:],
+        )
+
+    def password_encrypt(self, message: bytes, additional_pepper: str, iterations: int = 600_000) -> bytes:
+        pepper = os.environ['PASSWORD_ENCRYPT_PEPPER']
+        secret = (additional_pepper + pepper).encode()
+        nonce = secrets.token_bytes(self.NONCE_BYTES)
+
+        data_key = self._get_data_key(secret, iterations)
+        return pack_blob_v2(PasswordBlob(
+            algo_id=self.blob_algo_id,
+            salt=b'',
+            iterations=iterations,
+            nonce=nonce,
+            ciphertext=AESGCM(data_key).encrypt(nonce, message, None),
+        ))
+
+    def password_decrypt(self, token: bytes, password_to_decrypt: str) -> bytes:
+        pepper = os.environ['PASSWORD_ENCRYPT_PEPPER']
+        secret = (password_to_decrypt + pepper).encode()
+
+        blob = self._read_blob(token)
+        data_key = self._get_data_key(secret, blob.iterations)
+        return AESGCM(data_key).decrypt(blob.nonce, blob.ciphertext, None)
+
+
+def get_current_server_side_algo() -> str:
+    """Algo used for new writes"""
+    return os.environ.get('PASSWORD_SERVER_SIDE_ALGO', SERVER_SIDE_ALGO_FERNET).lower()
+
+
+def get_current_server_side_iterations() -> int:
+    """KDF iterations used for new writes, calibrated value takes precedence over env"""
+    if kdf_calibration.server_side_iterations:
+        return kdf_calibration.server_side_iterations
+    return int(os.environ.get('PASSWORD_SERVER_SIDE_ITERATIONS', 600_000))
+
+
+def get_server_side_cipher(algo: str) -> BaseServerSideCipher:
+    cipher_class = SERVER_SIDE_CIPHERS.get(algo.lower())
+    if not cipher_class:
+        raise PasswordAlgoNotSupportedError(f"Not supported server side algo: {algo}")
+    return cipher_class()
@@ -0,0 +1,125 @@
+import collections
+import dataclasses
+import datetime
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+
+@dataclasses.dataclass
+class DecryptedPasswordCacheStats:
+    enabled: bool
+    entries: int
+    size_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+
+
+class DecryptedPasswordCache:
+    """
+    LRU + TTL cache of passwords with the server layer removed, values are still client side encrypted.
+    Key (password_id, updated_on) changes on every password update, so a stale value is never returned.
+    Memory used by a single user is capped, the oldest entries of that user are evicted first.
+    """
+
+    def __init__(self, enabled: bool, ttl_seconds: float, max_entries: int, max_bytes_per_user: int):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes_per_user = max_bytes_per_user
+        self._entries: collections.OrderedDict[Tuple[uuid.UUID, datetime.datetime], tuple] = \
+            collections.OrderedDict()
+        self._users_bytes: Dict[uuid.UUID, int] = {}
+        self._passwords_updated_on: Dict[uuid.UUID, datetime.datetime] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _evict(self, cache_key: Tuple[uuid.UUID, datetime.datetime]):
+        _, user_id, value = self._entries.pop(cache_key)
+        self._passwords_updated_on.pop(cache_key[0], None)
+        self._users_bytes[user_id] -= len(value)
+        if not self._users_bytes[user_id]:
+            del self._users_bytes[user_id]
+        self._evictions += 1
+
+    def _evict_user_oldest(self, user_id: uuid.UUID):
+        for cache_key, (_, entry_user_id, _) in self._entries.items():
+            if entry_user_id == user_id:
+                self._evict(cache_key)
+                return
+
+    def get(self, password_id: uuid.UUID, updated_on: datetime.datetime) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+
+        cache_key = (password_id, updated_on)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry and entry[0] <= time.monotonic():
+                self._evict(cache_key)
+                entry = None
+            if not entry:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self._hits += 1
+            return entry[2]
+
+    def set(self, password_id: uuid.UUID, updated_on: datetime.datetime, user_id: uuid.UUID, value: bytes):
+        if not self.enabled or len(value) > self.max_bytes_per_user:
+            return
+
+        cache_key = (password_id, updated_on)
+        with self._lock:
+            self._invalidate(password_id)
+            while self._users_bytes.get(user_id, 0) + len(value) > self.max_bytes_per_user:
+                self._evict_user_oldest(user_id)
+
+            self._entries[cache_key] = (time.monotonic() + self.ttl_seconds, user_id, value)
+            self._passwords_updated_on[password_id] = updated_on
+            self._users_bytes[user_id] = self._users_bytes.get(user_id, 0) + len(value)
+            while len(self._entries) > self.max_entries:
+                self._evict(next(iter(self._entries)))
+
+    def _invalidate(self, password_id: uuid.UUID):
+        # only one version of a password is kept, older one is replaced or invalidated
+        if password_id in self._passwords_updated_on:
+            self._evict((password_id, self._passwords_updated_on[password_id]))
+
+    def invalidate(self, password_id: uuid.UUID):
+        with self._lock:
+            self._invalidate(password_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._users_bytes.clear()
+            self._passwords_updated_on.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> DecryptedPasswordCacheStats:
+        with self._lock:
+            return DecryptedPasswordCacheStats(
+                enabled=self.enabled,
+                entries=len(self._entries),
+                size_bytes=sum(self._users_bytes.values()),
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+            )
+
+
+password_decrypted_cache = DecryptedPasswordCache(
+    enabled=os.environ.get('PASSWORD_DECRYPTED_CACHE_ENABLED', 'true').lower() == 'true',
+    ttl_seconds=float(os.environ.get('PASSWORD_DECRYPTED_CACHE_TTL_SECONDS', 300)),
+    max_entries=int(os.environ.get('PASSWORD_DECRYPTED_CACHE_MAX_ENTRIES', 10_000)),
+    max_bytes_per_user=int(os.environ.get('PASSWORD_DECRYPTED_CACHE_MAX_BYTES_PER_USER', 1024 * 1024))
+)
@@ -8,3 +8,11 @@ class PasswordNotFoundError(PasswordError):
 
 class PasswordNotBelongsToUserError(PasswordError):
     ...
+
+
+class PasswordAlgoNotSupportedError(PasswordError):
+    ...
+
+
+class PasswordBlobFormatError(PasswordError):
+    ...
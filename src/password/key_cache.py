@@ -0,0 +1,71 @@
+import collections
+import os
+import threading
+import time
+from typing import Callable, Hashable
+
+
+class DataKeyCache:
+    """
+    Short living in-memory cache of derived data encryption keys.
+    Keys are kept in bytearrays and overwritten with zeros when evicted, callers always get a copy.
+    max_entries below 1 disables caching, every call derives the key.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: collections.OrderedDict[Hashable, tuple] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _zeroize(value: bytearray):
+        value[:] = bytes(len(value))
+
+    def _evict(self, cache_key: Hashable):
+        _, value = self._entries.pop(cache_key)
+        self._zeroize(value)
+
+    def _evict_expired(self, now: float):
+        expired_keys = [cache_key for cache_key, (expires_at, _) in self._entries.items() if expires_at <= now]
+        for cache_key in expired_keys:
+            self._evict(cache_key)
+
+    def get_or_create(self, cache_key: Hashable, factory: Callable[[], bytes]) -> bytes:
+        if self.max_entries < 1:
+            return bytes(factory())
+
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            if cache_key in self._entries:
+                self._entries.move_to_end(cache_key)
+                return bytes(self._entries[cache_key][1])
+
+        # derive outside the lock, KDF is slow and must not serialize other users
+        value = bytearray(factory())
+
+        with self._lock:
+            if cache_key in self._entries:
+                self._zeroize(value)
+                return bytes(self._entries[cache_key][1])
+
+            key = bytes(value)
+            self._entries[cache_key] = (time.monotonic() + self.ttl_seconds, value)
+            while len(self._entries) > self.max_entries:
+                self._evict(next(iter(self._entries)))
+            return key
+
+    def clear(self):
+        with self._lock:
+            for cache_key in list(self._entries.keys()):
+                self._evict(cache_key)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+data_key_cache = DataKeyCache(
+    ttl_seconds=float(os.environ.get('PASSWORD_DATA_KEY_CACHE_TTL_SECONDS', 300)),
+    max_entries=int(os.environ.get('PASSWORD_DATA_KEY_CACHE_MAX_ENTRIES', 1024))
+)
@@ -23,7 +23,7 @@ class PasswordModel(BaseModel, InsertedOnMixin, UpdatedOnMixin):
     client_side_algo = Column(String(30), nullable=False)
     client_side_iterations = Column(Integer(), nullable=False)
     note = Column(String(8192), unique=False, nullable=False)
-    user_id = Column(UUID(as_uuid=True), ForeignKey(UserModel.id), nullable=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey(UserModel.id), nullable=True, index=True)
 
     urls = relationship("PasswordUrlModel")
     history = relationship("PasswordHistoryModel", back_populates='password')
@@ -36,7 +36,7 @@ class PasswordUrlModel(BaseModel):
 
     id = Column(UUID(as_uuid=True), primary_key=True)
     url = Column(String(4089), nullable=False)
-    password_id = Column(UUID(as_uuid=True), ForeignKey(PasswordModel.id))
+    password_id = Column(UUID(as_uuid=True), ForeignKey(PasswordModel.id), index=True)
 
 
 class PasswordHistoryModel(BaseModel, InsertedOnMixin):
@@ -46,12 +46,16 @@ class PasswordHistoryModel(BaseModel, InsertedOnMixin):
     id = Column(UUID(as_uuid=True), primary_key=True)
     name = Column(String(4089), nullable=False)
     login = Column(String(2048), nullable=False)
-    client_side_password_encrypted = Column(LargeBinary(8192), unique=False, nullable=False)
+    # legacy rows keep the value without server layer, new rows keep the server side blob copied from the password
+    client_side_password_encrypted = Column(LargeBinary(8192), unique=False, nullable=True)
+    server_side_password_encrypted = Column(LargeBinary(8192), unique=False, nullable=True)
+    server_side_algo = Column(String(30), nullable=True)
+    server_side_iterations = Column(Integer(), nullable=True)
     client_side_algo = Column(String(30), nullable=False)
     client_side_iterations = Column(Integer(), nullable=False)
     note = Column(String(8192), unique=False, nullable=False)
     user_id = Column(UUID(as_uuid=True), ForeignKey(UserModel.id), nullable=True)
-    password_id = Column(UUID(as_uuid=True), ForeignKey(PasswordModel.id), nullable=True)
+    password_id = Column(UUID(as_uuid=True), ForeignKey(PasswordModel.id), nullable=True, index=True)
 
     password = relationship("PasswordModel", back_populates='history')
 
@@ -61,5 +65,5 @@ class PasswordGroupModel(BaseModel):
     __tablename__ = MODULE_PREFIX + 'password_group'
 
     group_id = Column(UUID(as_uuid=True), ForeignKey(GroupModel.id), primary_key=True)
-    password_id = Column(UUID(as_uuid=True), ForeignKey(PasswordModel.id), primary_key=True)
+    password_id = Column(UUID(as_uuid=True), ForeignKey(PasswordModel.id), primary_key=True, index=True)
 
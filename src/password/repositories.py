@@ -1,20 +1,23 @@
+import datetime
 import uuid
-from typing import List
+from typing import List, Tuple, Optional
 
-from sqlalchemy import and_
+from sqlalchemy import and_, case, delete, func, select, update
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import selectinload
 
+from src.common.AsyncBaseRepository import AsyncBaseRepository
 from src.common.BaseRepository import BaseRepository, NotFoundEntityError
+from src.password.blob import BLOB_V2_VERSION
 from src.password.models import PasswordModel, PasswordUrlModel, PasswordGroupModel, PasswordHistoryModel
 
 
-class PasswordRepository(BaseRepository):
-    def model_class(self):
-        return PasswordModel
+class PasswordMixin:
+    """Password entity create and update, shared by the sync and async password repositories"""
 
     def create(self, name: str, login: str, server_side_password_encrypted: bytes, server_side_algo: str,
                server_side_iterations: int, client_side_algo: str, client_side_iterations: int,
-               note: str, user_id: uuid.UUID) -> PasswordModel:        
+               note: str, user_id: uuid.UUID) -> PasswordModel:
         entity = PasswordModel(
             name=name,
             login=login,
@@ -28,10 +31,9 @@ class PasswordRepository(BaseRepository):
         )
         return entity
 
-    def update(self, entity_id: uuid.UUID, name: str, login: str, server_side_password_encrypted: bytes,
-               server_side_algo: str, server_side_iterations: int, client_side_algo: str, client_side_iterations: int,
-               note: str, user_id: uuid.UUID) -> PasswordModel:
-        entity: PasswordModel = self.get_by_id(entity_id)
+    def update_entity(self, entity: PasswordModel, name: str, login: str, server_side_password_encrypted: bytes,
+                      server_side_algo: str, server_side_iterations: int, client_side_algo: str,
+                      client_side_iterations: int, note: str, user_id: uuid.UUID) -> PasswordModel:
         entity.name = name
         entity.login = login
         entity.password_encrypted = server_side_password_encrypted
@@ -43,6 +45,27 @@ class PasswordRepository(BaseRepository):
         entity.user_id = user_id
         return entity
 
+
+class PasswordRepository(PasswordMixin, BaseRepository):
+    def model_class(self):
+        return PasswordModel
+
+    def update(self, entity_id: uuid.UUID, name: str, login: str, server_side_password_encrypted: bytes,
+               server_side_algo: str, server_side_iterations: int, client_side_algo: str, client_side_iterations: int,
+               note: str, user_id: uuid.UUID) -> PasswordModel:
+        return self.update_entity(
+            entity=self.get_by_id(entity_id),
+            name=name,
+            login=login,
+            server_side_password_encrypted=server_side_password_encrypted,
+            server_side_algo=server_side_algo,
+            server_side_iterations=server_side_iterations,
+            client_side_algo=client_side_algo,
+            client_side_iterations=client_side_iterations,
+            note=note,
+            user_id=user_id
+        )
+
     def find_all_by_user(self, user_id: uuid.UUID) -> List[PasswordModel]:
         try:
             entities = self.query().filter(PasswordModel.user_id == user_id).all()
@@ -51,6 +74,79 @@ class PasswordRepository(BaseRepository):
             raise e
         return entities
 
+    def find_all_by_user_with_relations(self, user_id: uuid.UUID) -> List[PasswordModel]:
+        """
+        Passwords of a user with urls, history and groups loaded by selectinload,
+        constant number of queries regardless of the number of passwords
+        """
+        try:
+            entities = self.query().filter(PasswordModel.user_id == user_id).options(
+                selectinload(PasswordModel.urls),
+                selectinload(PasswordModel.history),
+                selectinload(PasswordModel.groups)
+            ).all()
+        except SQLAlchemyError as e:
+            self.session.rollback()
+            raise e
+        return entities
+
+    def find_all_by_ids(self, password_ids: List[uuid.UUID]) -> List[PasswordModel]:
+        try:
+            entities = self.query().filter(PasswordModel.id.in_(password_ids)).all()
+        except SQLAlchemyError as e:
+            self.session.rollback()
+            raise e
+        return entities
+
+    def upgrade_server_side_encryption(self, entity_id: uuid.UUID, expected_updated_on: datetime.datetime,
+                                       server_side_password_encrypted: bytes, server_side_algo: str,
+                                       server_side_iterations: int) -> bool:
+        """
+        Replace server side ciphertext only if the row was not changed since it was read.
+        updated_on is kept, re-encryption is not a change of the password
+        :return bool: row upgraded
+        """
+        try:
+            updated_rows = self.query().filter(
+                and_(
+                    PasswordModel.id == entity_id,
+                    PasswordModel.updated_on == expected_updated_on
+                )
+            ).update({
+                PasswordModel.password_encrypted: server_side_password_encrypted,
+                PasswordModel.server_side_algo: server_side_algo,
+                PasswordModel.server_side_iterations: server_side_iterations,
+                PasswordModel.updated_on: PasswordModel.updated_on,
+            }, synchronize_session=False)
+        except SQLAlchemyError as e:
+            self.session.rollback()
+            raise e
+        return updated_rows == 1
+
+    def count_by_server_side_settings(self) -> List[Tuple[str, int, int, int]]:
+        """
+        :return: list of (server_side_algo, server_side_iterations, blob_version, count)
+        """
+        blob_version = case(
+            (func.get_byte(PasswordModel.password_encrypted, 0) == BLOB_V2_VERSION, BLOB_V2_VERSION),
+            else_=1
+        )
+        try:
+            rows = self.session.query(
+                PasswordModel.server_side_algo,
+                PasswordModel.server_side_iterations,
+                blob_version,
+                func.count(PasswordModel.id)
+            ).group_by(
+                PasswordModel.server_side_algo,
+                PasswordModel.server_side_iterations,
+                blob_version
+            ).all()
+        except SQLAlchemyError as e:
+            self.session.rollback()
+            raise e
+        return [tuple(row) for row in rows]
+
     def delete(self, password_id: uuid.UUID, user_id: uuid.UUID) -> uuid.UUID:
         query = self.query().filter(PasswordModel.id == password_id)
         entity = query.one_or_none()
@@ -68,6 +164,75 @@ class PasswordRepository(BaseRepository):
         return entity_uuid
 
 
+class AsyncPasswordRepository(PasswordMixin, AsyncBaseRepository):
+    def model_class(self):
+        return PasswordModel
+
+    async def find_by_id_with_relations(self, password_id: uuid.UUID) -> Optional[PasswordModel]:
+        try:
+            result = await self.session.execute(
+                self.select().where(PasswordModel.id == password_id).options(
+                    selectinload(PasswordModel.urls),
+                    selectinload(PasswordModel.groups)
+                ).execution_options(populate_existing=True)
+            )
+            entity = result.scalar_one_or_none()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return entity
+
+    async def find_all_by_user_with_relations(self, user_id: uuid.UUID) -> List[PasswordModel]:
+        """Relations are loaded up front, an AsyncSession can not lazy load them later"""
+        try:
+            result = await self.session.execute(
+                self.select().where(PasswordModel.user_id == user_id).options(
+                    selectinload(PasswordModel.urls),
+                    selectinload(PasswordModel.history),
+                    selectinload(PasswordModel.groups)
+                )
+            )
+            entities = list(result.scalars().all())
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return entities
+
+    async def _delete_with_relations(self, password_filter) -> List[uuid.UUID]:
+        """Passwords matching the filter with urls, groups and history, one set based delete per table"""
+        password_ids = select(PasswordModel.id).where(password_filter).scalar_subquery()
+        for model in (PasswordUrlModel, PasswordGroupModel, PasswordHistoryModel):
+            await self.session.execute(
+                delete(model).where(model.password_id.in_(password_ids)),
+                execution_options={'synchronize_session': False}
+            )
+        result = await self.session.execute(
+            delete(PasswordModel).where(password_filter).returning(PasswordModel.id),
+            execution_options={'synchronize_session': False}
+        )
+        return list(result.scalars())
+
+    async def delete_all_by_user(self, user_id: uuid.UUID) -> List[uuid.UUID]:
+        try:
+            deleted_password_ids = await self._delete_with_relations(PasswordModel.user_id == user_id)
+            await self.commit()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return deleted_password_ids
+
+    async def delete(self, password_id: uuid.UUID, user_id: uuid.UUID) -> uuid.UUID:
+        try:
+            deleted_password_ids = await self._delete_with_relations(PasswordModel.id == password_id)
+            if not deleted_password_ids:
+                raise NotFoundEntityError(f"Not found password with uuid: {password_id} for user {user_id}")
+            await self.commit()
+        except (SQLAlchemyError, NotFoundEntityError) as e:
+            await self.session.rollback()
+            raise e
+        return deleted_password_ids[0]
+
+
 class PasswordUrlRepository(BaseRepository):
     def model_class(self):
         return PasswordUrlModel
@@ -116,32 +281,51 @@ class PasswordUrlRepository(BaseRepository):
             return entity_uuid
 
     def delete_all_by_password_id(self, password_id: uuid.UUID) -> List[uuid.UUID]:
-        query = self.query().filter(PasswordUrlModel.password_id == password_id) 
-        entities: List[PasswordUrlModel] = query.all()
-        deleted_entities_ids = []
-
-        for password_url_entity in entities:
-            try:
-                deleted_url_id = self.delete(password_url_id=password_url_entity.id)
-                deleted_entities_ids.append(deleted_url_id)
-            except SQLAlchemyError as e:
-                self.session.rollback()
-                raise e
-
+        statement = delete(PasswordUrlModel).where(
+            PasswordUrlModel.password_id == password_id
+        ).returning(PasswordUrlModel.id)
+        try:
+            deleted_entities_ids = list(self.session.execute(statement).scalars())
+            self.commit()
+        except SQLAlchemyError as e:
+            self.session.rollback()
+            raise e
         return deleted_entities_ids
 
 
-class PasswordHistoryRepository(BaseRepository):
+class AsyncPasswordUrlRepository(AsyncBaseRepository):
     def model_class(self):
-        return PasswordHistoryModel
+        return PasswordUrlModel
+
+    async def replace_all_by_password_id(self, password_id: uuid.UUID, urls: List[str]):
+        """Not committed"""
+        try:
+            await self.session.execute(
+                delete(PasswordUrlModel).where(PasswordUrlModel.password_id == password_id),
+                execution_options={'synchronize_session': False}
+            )
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        for url in urls:
+            self.save(PasswordUrlModel(url=url, password_id=password_id))
+
 
-    def create(self, name: str, login: str, client_side_password_encrypted: bytes,
+class PasswordHistoryMixin:
+    """History entity, shared by the sync and async password history repositories"""
+
+    def create(self, name: str, login: str, client_side_password_encrypted: Optional[bytes],
                client_side_algo: str, client_side_iterations: int,
-               note: str, user_id: uuid.UUID, password_id: uuid.UUID) -> PasswordHistoryModel:
+               note: str, user_id: uuid.UUID, password_id: uuid.UUID,
+               server_side_password_encrypted: Optional[bytes] = None, server_side_algo: Optional[str] = None,
+               server_side_iterations: Optional[int] = None) -> PasswordHistoryModel:
         entity = PasswordHistoryModel(
             name=name,
             login=login,
             client_side_password_encrypted=client_side_password_encrypted,
+            server_side_password_encrypted=server_side_password_encrypted,
+            server_side_algo=server_side_algo,
+            server_side_iterations=server_side_iterations,
             client_side_algo=client_side_algo,
             client_side_iterations=client_side_iterations,
             note=note,
@@ -150,6 +334,11 @@ class PasswordHistoryRepository(BaseRepository):
         )
         return entity
 
+
+class PasswordHistoryRepository(PasswordHistoryMixin, BaseRepository):
+    def model_class(self):
+        return PasswordHistoryModel
+
     def find_all_by_password_id(self, password_id: uuid.UUID) -> List[PasswordHistoryModel]:
         try:
             entities = self.query().filter(PasswordHistoryModel.password_id == password_id).all()
@@ -174,19 +363,30 @@ class PasswordHistoryRepository(BaseRepository):
             return entity_id
 
     def delete_all_by_password_id(self, password_id: uuid.UUID) -> List[uuid.UUID]:
-        query = self.query().filter(PasswordHistoryModel.password_id == password_id)
-        entities: List[PasswordUrlModel] = query.all()
-        deleted_entities_ids = []
+        statement = delete(PasswordHistoryModel).where(
+            PasswordHistoryModel.password_id == password_id
+        ).returning(PasswordHistoryModel.id)
+        try:
+            deleted_entities_ids = list(self.session.execute(statement).scalars())
+            self.commit()
+        except SQLAlchemyError as e:
+            self.session.rollback()
+            raise e
+        return deleted_entities_ids
 
-        for password_history_entity in entities:
-            try:
-                deleted_entity_id = self.delete(password_history_id=password_history_entity.id)
-                deleted_entities_ids.append(deleted_entity_id)
-            except SQLAlchemyError as e:
-                self.session.rollback()
-                raise e
 
-        return deleted_entities_ids
+class AsyncPasswordHistoryRepository(PasswordHistoryMixin, AsyncBaseRepository):
+    def model_class(self):
+        return PasswordHistoryModel
+
+    async def find_all_by_password_id(self, password_id: uuid.UUID) -> List[PasswordHistoryModel]:
+        try:
+            result = await self.session.execute(self.select().where(PasswordHistoryModel.password_id == password_id))
+            entities = list(result.scalars().all())
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return entities
 
 
 class PasswordGroupRepository(BaseRepository):
@@ -211,19 +411,15 @@ class PasswordGroupRepository(BaseRepository):
         return entities
 
     def delete_password_from_all_groups(self, password_id: uuid.UUID) -> List[uuid.UUID]:
-        query = self.query().filter(PasswordGroupModel.password_id == password_id)
-        entities: List[PasswordGroupModel] = query.all()
-        deleted_password_ids = []
-
-        for password_group_entity in entities:
-            try:
-                query.delete()
-                self.commit()
-                deleted_password_ids.append(password_group_entity.password_id)
-            except SQLAlchemyError as e:
-                self.session.rollback()
-                raise e
-
+        statement = delete(PasswordGroupModel).where(
+            PasswordGroupModel.password_id == password_id
+        ).returning(PasswordGroupModel.password_id)
+        try:
+            deleted_password_ids = list(self.session.execute(statement).scalars())
+            self.commit()
+        except SQLAlchemyError as e:
+            self.session.rollback()
+            raise e
         return deleted_password_ids
 
     def move_password_from_group_to_group(self, src_group_id: uuid.UUID, dst_group_id: uuid.UUID):
@@ -231,3 +427,34 @@ class PasswordGroupRepository(BaseRepository):
         for src_password_group_entity in src_password_group_entities:
             src_password_group_entity.group_id = dst_group_id
         self.commit()
+
+
+class AsyncPasswordGroupRepository(AsyncBaseRepository):
+    def model_class(self):
+        return PasswordGroupModel
+
+    async def replace_password_groups(self, password_id: uuid.UUID, group_ids: List[uuid.UUID]):
+        """Not committed"""
+        try:
+            await self.session.execute(
+                delete(PasswordGroupModel).where(PasswordGroupModel.password_id == password_id),
+                execution_options={'synchronize_session': False}
+            )
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        for group_id in group_ids:
+            self.save(PasswordGroupModel(group_id=group_id, password_id=password_id))
+
+    async def move_password_from_group_to_group(self, src_group_id: uuid.UUID, dst_group_id: uuid.UUID):
+        """Not committed"""
+        try:
+            await self.session.execute(
+                update(PasswordGroupModel).where(PasswordGroupModel.group_id == src_group_id).values(
+                    group_id=dst_group_id
+                ),
+                execution_options={'synchronize_session': False}
+            )
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
@@ -1,21 +1,35 @@
 import logging
+import os
 import uuid
-from typing import List
+from typing import List, Optional, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
 
 from src import GroupModel
+from src.common.AsyncBaseService import AsyncBaseService
 from src.common.BaseService import BaseService
-from src.group.repositories import GroupRepository
+from src.group.repositories import AsyncGroupRepository, GroupRepository
+from src.password.cryptography import get_current_server_side_algo, get_current_server_side_iterations
+from src.password.decrypted_cache import password_decrypted_cache
 from src.password.exceptions import PasswordNotBelongsToUserError, PasswordNotFoundError
 from src.password.models import PasswordModel, PasswordHistoryModel
-from src.password.repositories import PasswordRepository, PasswordUrlRepository, PasswordGroupRepository, \
-    PasswordHistoryRepository
+from src.password.repositories import AsyncPasswordGroupRepository, AsyncPasswordHistoryRepository, \
+    AsyncPasswordRepository, AsyncPasswordUrlRepository, PasswordRepository, PasswordUrlRepository, \
+    PasswordGroupRepository, PasswordHistoryRepository
 from src.password.types import PasswordDTO, PasswordHistoryDTO
-from src.password.utils import _decrypt_password_server_side, _encrypt_password_server_side, create_password_dto
+from src.password.utils import _encrypt_password_server_side, _encrypt_password_server_side_async, \
+    create_password_dto, _decrypt_passwords_server_side, _decrypt_passwords_server_side_async, \
+    _encrypt_passwords_server_side, _decrypt_password_histories_server_side, \
+    _decrypt_password_histories_server_side_async, create_password_history_dto
+from src.password.upgrades import password_upgrade_queue
 
 logger = logging.getLogger()
 
 
 class PasswordService(BaseService):
+    # max number of server side decryptions queued at once by one password list request, 0 - crypto engine workers
+    DECRYPT_CONCURRENCY = int(os.environ.get('PASSWORD_LIST_DECRYPT_CONCURRENCY', 0))
+
     def get_password_groups(self, password_id: uuid.UUID) -> List[GroupModel]:
         repo = PasswordRepository(session=self.session)
         password_entity = repo.get_by_id(password_id)
@@ -81,7 +95,8 @@ class PasswordService(BaseService):
             session=self.session,
             password_client_side_encrypted=password_details.password_encrypted,
             iterations=password_details.server_side_iterations,
-            user_id=password_details.user_id
+            user_id=password_details.user_id,
+            server_side_algo=password_details.server_side_algo
         )
 
         password_entity = password_repo.create(
@@ -126,34 +141,18 @@ class PasswordService(BaseService):
     def get_user_password_dto(self, password_id: uuid.UUID) -> PasswordDTO:
         repo = PasswordRepository(session=self.session)
         entity: PasswordModel = repo.get_by_id(password_id)
-        password_server_side_encrypted = entity.password_encrypted
+        return self.get_passwords_dtos(password_entities=[entity])[0]
 
-        # decrypt passwords from server layer
-        password_client_side_encrypted = _decrypt_password_server_side(
-            session=self.session,
-            password_server_side_encrypted=password_server_side_encrypted,
-            user_id=entity.user_id
-        )
-        password_dto = create_password_dto(
-            password_entity=entity,
-            password_client_side_encrypted=password_client_side_encrypted
-        )
-        return password_dto
-
-    def get_user_passwords_dtos(self, user_id: uuid.UUID) -> List[PasswordDTO]:
-        repo = PasswordRepository(session=self.session)
-        entities: List[PasswordModel] = repo.find_all_by_user(user_id=user_id)
+    @staticmethod
+    def _create_passwords_dtos(password_entities: List[PasswordModel],
+                               passwords_client_side_encrypted: List[bytes]) -> List[PasswordDTO]:
         password_dto_objects = []
-
-        # decrypt passwords from server layer, create dto
-        for password_entity in entities:
-            password_server_side_encrypted = password_entity.password_encrypted
-            password_client_side_encrypted = _decrypt_password_server_side(
-                session=self.session,
-                password_server_side_encrypted=password_server_side_encrypted,
-                user_id=password_entity.user_id
+        for password_entity, password_client_side_encrypted in zip(password_entities, passwords_client_side_encrypted):
+            # plaintext of the server layer is at hand, outdated rows are re-encrypted later in a batch
+            password_upgrade_queue.add(
+                password_entity=password_entity,
+                password_client_side_encrypted=password_client_side_encrypted
             )
-
             password_dto = create_password_dto(
                 password_entity=password_entity,
                 password_client_side_encrypted=password_client_side_encrypted
@@ -161,18 +160,37 @@ class PasswordService(BaseService):
             password_dto_objects.append(password_dto)
         return password_dto_objects
 
-    def _password_update_prepare_password_history_dto(self, old_password_entity: PasswordModel,
-                                                      user_id: uuid.UUID) -> PasswordHistoryDTO:
-        client_side_password_encrypted = _decrypt_password_server_side(
+    def get_passwords_dtos(self, password_entities: List[PasswordModel],
+                           concurrency: Optional[int] = None) -> List[PasswordDTO]:
+        """History is returned without values, they are decrypted only by get_password_history"""
+        concurrency = concurrency or self.DECRYPT_CONCURRENCY
+
+        # decrypt passwords from server layer in parallel, cached values are used when present
+        passwords_client_side_encrypted = _decrypt_passwords_server_side(
             session=self.session,
-            password_server_side_encrypted=old_password_entity.password_encrypted,
-            user_id=user_id
+            password_entities=password_entities,
+            concurrency=concurrency
+        )
+        return self._create_passwords_dtos(
+            password_entities=password_entities,
+            passwords_client_side_encrypted=passwords_client_side_encrypted
         )
 
+    def get_user_passwords_dtos(self, user_id: uuid.UUID, concurrency: Optional[int] = None) -> List[PasswordDTO]:
+        repo = PasswordRepository(session=self.session)
+        entities: List[PasswordModel] = repo.find_all_by_user_with_relations(user_id=user_id)
+        return self.get_passwords_dtos(password_entities=entities, concurrency=concurrency)
+
+    @staticmethod
+    def _password_update_prepare_password_history_dto(old_password_entity: PasswordModel) -> PasswordHistoryDTO:
+        # server side blob is copied as it is, decrypted only when the history is read
         password_history_data = PasswordHistoryDTO(
             name=old_password_entity.name,
             login=old_password_entity.login,
-            client_side_password_encrypted=client_side_password_encrypted,
+            client_side_password_encrypted=None,
+            server_side_password_encrypted=old_password_entity.password_encrypted,
+            server_side_algo=old_password_entity.server_side_algo,
+            server_side_iterations=old_password_entity.server_side_iterations,
             client_side_algo=old_password_entity.client_side_algo,
             client_side_iterations=old_password_entity.client_side_iterations,
             note=old_password_entity.note,
@@ -187,20 +205,25 @@ class PasswordService(BaseService):
         if not old_password_entity:
             raise PasswordNotFoundError(f"Password with id: {entity_id} not exists")
 
-        old_password_dto = self._password_update_prepare_password_history_dto(
-            old_password_entity=old_password_entity,
-            user_id=password_new_details.user_id
-        )
-
         server_side_password_encrypted = _encrypt_password_server_side(
             session=self.session,
             password_client_side_encrypted=password_new_details.password_encrypted,
             iterations=password_new_details.server_side_iterations,
-            user_id=password_new_details.user_id
+            user_id=password_new_details.user_id,
+            server_side_algo=password_new_details.server_side_algo
+        )
+
+        old_password_dto = self._password_update_prepare_password_history_dto(old_password_entity=old_password_entity)
+        # old value moves to history, keep it cached under the history row
+        old_client_side_password_encrypted = password_decrypted_cache.get(
+            password_id=old_password_entity.id,
+            updated_on=old_password_entity.updated_on
         )
+        password_upgrade_queue.discard(old_password_entity.id)
+        password_decrypted_cache.invalidate(old_password_entity.id)
 
         password_entity = password_repo.update(
-            entity_id=entity_id,
+            entity_id=old_password_entity.id,
             name=password_new_details.name,
             login=password_new_details.login,
             server_side_password_encrypted=server_side_password_encrypted,
@@ -224,9 +247,16 @@ class PasswordService(BaseService):
             password_groups_ids=password_new_details.groups_ids
         )
 
-        self.create_password_history_entity(
+        password_history_entity = self.create_password_history_entity(
             password_history_details=old_password_dto
         )
+        if old_client_side_password_encrypted is not None:
+            password_decrypted_cache.set(
+                password_id=password_history_entity.id,
+                updated_on=password_history_entity.inserted_on,
+                user_id=password_history_entity.user_id,
+                value=old_client_side_password_encrypted
+            )
 
         return password_entity
 
@@ -238,6 +268,9 @@ class PasswordService(BaseService):
             self.delete(password_id=password_id, user_id=user_id)
 
     def delete(self, password_id: uuid.UUID, user_id: uuid.UUID) -> uuid.UUID:
+        password_upgrade_queue.discard(password_id)
+        password_decrypted_cache.invalidate(password_id)
+
         # delete urls
         password_urls_repo = PasswordUrlRepository(session=self.session)
         password_urls_repo.delete_all_by_password_id(password_id=password_id)
@@ -258,6 +291,69 @@ class PasswordService(BaseService):
         return password_id
 
 
+class PasswordUpgradeService(BaseService):
+    def upgrade_pending(self) -> int:
+        """
+        Re-encrypt one batch of outdated passwords from the upgrade queue with current server side settings
+        :return int: number of upgraded passwords
+        """
+        items = password_upgrade_queue.pop_batch()
+        if not items:
+            return 0
+
+        repo = PasswordRepository(session=self.session)
+        current_entities = {entity.id: entity for entity in repo.find_all_by_ids([item.password_id for item in items])}
+        # skip deleted rows and rows changed after they were read
+        items_to_upgrade = [
+            item for item in items
+            if item.password_id in current_entities
+            and current_entities[item.password_id].updated_on == item.updated_on
+        ]
+        skipped = len(items) - len(items_to_upgrade)
+
+        server_side_algo = get_current_server_side_algo()
+        server_side_iterations = get_current_server_side_iterations()
+        try:
+            passwords_server_side_encrypted = _encrypt_passwords_server_side(
+                session=self.session,
+                passwords=[(item.user_id, item.password_client_side_encrypted) for item in items_to_upgrade],
+                iterations=server_side_iterations,
+                server_side_algo=server_side_algo
+            )
+        except Exception as e:
+            logger.error(f"Password upgrade error: {str(e)}")
+            password_upgrade_queue.record_result(skipped=skipped, failed=len(items_to_upgrade))
+            return 0
+
+        upgraded = 0
+        for item, password_server_side_encrypted in zip(items_to_upgrade, passwords_server_side_encrypted):
+            is_upgraded = repo.upgrade_server_side_encryption(
+                entity_id=item.password_id,
+                expected_updated_on=item.updated_on,
+                server_side_password_encrypted=password_server_side_encrypted,
+                server_side_algo=server_side_algo,
+                server_side_iterations=server_side_iterations
+            )
+            if is_upgraded:
+                upgraded += 1
+            else:
+                skipped += 1
+        repo.commit()
+
+        password_upgrade_queue.record_result(upgraded=upgraded, skipped=skipped)
+        return upgraded
+
+    def upgrade_all_pending(self) -> int:
+        upgraded = 0
+        while len(password_upgrade_queue):
+            upgraded += self.upgrade_pending()
+        return upgraded
+
+    def count_by_server_side_settings(self) -> List[Tuple[str, int, int, int]]:
+        repo = PasswordRepository(session=self.session)
+        return repo.count_by_server_side_settings()
+
+
 class PasswordHistoryService(BaseService):
     def create(self, password_history_details: PasswordHistoryDTO) -> PasswordHistoryModel:
         password_history_repo = PasswordHistoryRepository(session=self.session)
@@ -266,6 +362,9 @@ class PasswordHistoryService(BaseService):
             name=password_history_details.name,
             login=password_history_details.login,
             client_side_password_encrypted=password_history_details.client_side_password_encrypted,
+            server_side_password_encrypted=password_history_details.server_side_password_encrypted,
+            server_side_algo=password_history_details.server_side_algo,
+            server_side_iterations=password_history_details.server_side_iterations,
             client_side_algo=password_history_details.client_side_algo,
             client_side_iterations=password_history_details.client_side_iterations,
             note=password_history_details.note,
@@ -301,19 +400,193 @@ class PasswordHistoryService(BaseService):
 
         repo = PasswordHistoryRepository(session=self.session)
         entities = repo.find_all_by_password_id(password_id=password_id)
-        password_history_dtos = []
-
-        for password_history_entity in entities:
-            password_history_dto = PasswordHistoryDTO(
-                id=password_history_entity.id,
-                name=password_history_entity.name,
-                login=password_history_entity.login,
-                client_side_password_encrypted=password_history_entity.client_side_password_encrypted,
-                client_side_algo=password_history_entity.client_side_algo,
-                client_side_iterations=password_history_entity.client_side_iterations,
-                note=password_history_entity.note,
+        histories_client_side_encrypted = _decrypt_password_histories_server_side(
+            session=self.session,
+            password_history_entities=entities
+        )
+        return [
+            create_password_history_dto(
+                password_history_entity=entity,
+                client_side_password_encrypted=histories_client_side_encrypted[entity.id]
+            )
+            for entity in entities
+        ]
+
+
+class AsyncPasswordService(AsyncBaseService):
+    async def _encrypt_server_side(self, password_details: PasswordDTO) -> bytes:
+        return await _encrypt_password_server_side_async(
+            session=self.session,
+            password_client_side_encrypted=password_details.password_encrypted,
+            iterations=password_details.server_side_iterations,
+            user_id=password_details.user_id,
+            server_side_algo=password_details.server_side_algo
+        )
+
+    async def create(self, password_details: PasswordDTO) -> PasswordModel:
+        """Same as PasswordService.create, the password with its groups and urls in one transaction"""
+        password_repo = AsyncPasswordRepository(session=self.session)
+        group_repo = AsyncGroupRepository(session=self.session)
+        server_side_password_encrypted = await self._encrypt_server_side(password_details=password_details)
+
+        try:
+            password_entity = password_repo.create(
+                name=password_details.name,
+                login=password_details.login,
+                server_side_password_encrypted=server_side_password_encrypted,
+                server_side_algo=password_details.server_side_algo,
+                server_side_iterations=password_details.server_side_iterations,
+                client_side_algo=password_details.client_side_algo,
+                client_side_iterations=password_details.client_side_iterations,
+                note=password_details.note,
+                user_id=password_details.user_id
+            )
+            password_repo.save(password_entity)
+            # group and url rows have no relationship ordering them after the password insert
+            await self.session.flush()
+
+            # only existing groups, user default group when none of them exists
+            groups_ids = [group.id for group in await group_repo.find_groups_by_ids(password_details.groups_ids)]
+            if not groups_ids:
+                groups_ids = [(await group_repo.find_user_default_group(user_id=password_details.user_id)).id]
+            await AsyncPasswordGroupRepository(session=self.session).replace_password_groups(
+                password_id=password_entity.id,
+                group_ids=groups_ids
+            )
+            await AsyncPasswordUrlRepository(session=self.session).replace_all_by_password_id(
+                password_id=password_entity.id,
+                urls=password_details.urls
+            )
+            await password_repo.commit()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+
+        return await password_repo.find_by_id_with_relations(password_id=password_entity.id)
+
+    async def update(self, entity_id: uuid.UUID, password_new_details: PasswordDTO) -> PasswordModel:
+        """Same as PasswordService.update, the password, its groups, urls and history row in one transaction"""
+        password_repo = AsyncPasswordRepository(session=self.session)
+        old_password_entity = await password_repo.get_by_id(entity_id)
+        if not old_password_entity:
+            raise PasswordNotFoundError(f"Password with id: {entity_id} not exists")
+
+        server_side_password_encrypted = await self._encrypt_server_side(password_details=password_new_details)
+
+        old_password_dto = PasswordService._password_update_prepare_password_history_dto(
+            old_password_entity=old_password_entity
+        )
+        # old value moves to history, keep it cached under the history row
+        old_client_side_password_encrypted = password_decrypted_cache.get(
+            password_id=old_password_entity.id,
+            updated_on=old_password_entity.updated_on
+        )
+        password_upgrade_queue.discard(old_password_entity.id)
+        password_decrypted_cache.invalidate(old_password_entity.id)
+
+        try:
+            password_entity = password_repo.update_entity(
+                entity=old_password_entity,
+                name=password_new_details.name,
+                login=password_new_details.login,
+                server_side_password_encrypted=server_side_password_encrypted,
+                server_side_algo=password_new_details.server_side_algo,
+                server_side_iterations=password_new_details.server_side_iterations,
+                client_side_algo=password_new_details.client_side_algo,
+                client_side_iterations=password_new_details.client_side_iterations,
+                note=password_new_details.note,
+                user_id=password_new_details.user_id
+            )
+            await AsyncPasswordUrlRepository(session=self.session).replace_all_by_password_id(
+                password_id=password_entity.id,
+                urls=password_new_details.urls
+            )
+            await AsyncPasswordGroupRepository(session=self.session).replace_password_groups(
+                password_id=password_entity.id,
+                group_ids=password_new_details.groups_ids
+            )
+
+            history_repo = AsyncPasswordHistoryRepository(session=self.session)
+            password_history_entity = history_repo.create(
+                name=old_password_dto.name,
+                login=old_password_dto.login,
+                client_side_password_encrypted=old_password_dto.client_side_password_encrypted,
+                server_side_password_encrypted=old_password_dto.server_side_password_encrypted,
+                server_side_algo=old_password_dto.server_side_algo,
+                server_side_iterations=old_password_dto.server_side_iterations,
+                client_side_algo=old_password_dto.client_side_algo,
+                client_side_iterations=old_password_dto.client_side_iterations,
+                note=old_password_dto.note,
+                user_id=old_password_dto.user_id,
+                password_id=old_password_dto.password_id
+            )
+            history_repo.save(password_history_entity)
+            await password_repo.commit()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+
+        if old_client_side_password_encrypted is not None:
+            password_decrypted_cache.set(
+                password_id=password_history_entity.id,
+                updated_on=password_history_entity.inserted_on,
                 user_id=password_history_entity.user_id,
-                password_id=password_history_entity.id
+                value=old_client_side_password_encrypted
+            )
+
+        return await password_repo.find_by_id_with_relations(password_id=password_entity.id)
+
+    async def delete(self, password_id: uuid.UUID, user_id: uuid.UUID) -> uuid.UUID:
+        password_upgrade_queue.discard(password_id)
+        password_decrypted_cache.invalidate(password_id)
+        return await AsyncPasswordRepository(session=self.session).delete(password_id=password_id, user_id=user_id)
+
+    async def delete_user_passwords(self, user_id: uuid.UUID) -> List[uuid.UUID]:
+        repo = AsyncPasswordRepository(session=self.session)
+        deleted_password_ids = await repo.delete_all_by_user(user_id=user_id)
+        for password_id in deleted_password_ids:
+            password_upgrade_queue.discard(password_id)
+            password_decrypted_cache.invalidate(password_id)
+        return deleted_password_ids
+
+    async def get_user_passwords_dtos(self, user_id: uuid.UUID, concurrency: Optional[int] = None) -> List[PasswordDTO]:
+        repo = AsyncPasswordRepository(session=self.session)
+        entities = await repo.find_all_by_user_with_relations(user_id=user_id)
+        passwords_client_side_encrypted = await _decrypt_passwords_server_side_async(
+            session=self.session,
+            password_entities=entities,
+            concurrency=concurrency or PasswordService.DECRYPT_CONCURRENCY
+        )
+        return PasswordService._create_passwords_dtos(
+            password_entities=entities,
+            passwords_client_side_encrypted=passwords_client_side_encrypted
+        )
+
+
+class AsyncPasswordHistoryService(AsyncBaseService):
+    async def validate_password_belong_to_user(self, password_id: uuid.UUID, user_id: uuid.UUID):
+        password_entity = await AsyncPasswordRepository(session=self.session).get_by_id(password_id)
+        if not password_entity:
+            raise PasswordNotFoundError(f"Not found password with id {password_id}")
+        if password_entity.user_id != user_id:
+            raise PasswordNotBelongsToUserError('Password not belongs to user')
+
+    async def get_password_history(self, password_id: uuid.UUID, user_id: uuid.UUID) -> List[PasswordHistoryDTO]:
+        await self.validate_password_belong_to_user(
+            password_id=password_id,
+            user_id=user_id
+        )
+
+        repo = AsyncPasswordHistoryRepository(session=self.session)
+        entities = await repo.find_all_by_password_id(password_id=password_id)
+        histories_client_side_encrypted = await _decrypt_password_histories_server_side_async(
+            session=self.session,
+            password_history_entities=entities
+        )
+        return [
+            create_password_history_dto(
+                password_history_entity=entity,
+                client_side_password_encrypted=histories_client_side_encrypted[entity.id]
             )
-            password_history_dtos.append(password_history_dto)
-        return password_history_dtos
+            for entity in entities
+        ]
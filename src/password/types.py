@@ -2,6 +2,10 @@ import dataclasses
 import uuid
 from typing import List, Optional
 
+from src.group.types import GroupDTO
+from src.password.cryptography import get_current_server_side_algo, get_current_server_side_iterations
+
+
 @dataclasses.dataclass
 class PasswordUrlDTO:
     name: str
@@ -19,13 +23,16 @@ class PasswordUrlDTO:
 class PasswordHistoryDTO:
     name: str
     login: str
-    client_side_password_encrypted: bytes
+    client_side_password_encrypted: Optional[bytes]
     client_side_algo: str
     client_side_iterations: int
     note: str
     password_id: uuid.UUID
     user_id: uuid.UUID
     id: Optional[uuid.UUID] = None
+    server_side_password_encrypted: Optional[bytes] = None
+    server_side_algo: Optional[str] = None
+    server_side_iterations: Optional[int] = None
 
 
 @dataclasses.dataclass
@@ -41,8 +48,9 @@ class PasswordDTO:
     urls: List[str] = dataclasses.field(default_factory=list)
     history: List[PasswordHistoryDTO] = dataclasses.field(default_factory=list)
     groups_ids: List[uuid.UUID] = dataclasses.field(default_factory=list)
-    server_side_algo: Optional[str] = 'fernet'
-    server_side_iterations: Optional[int] = 600_000
+    groups: List[GroupDTO] = dataclasses.field(default_factory=list)
+    server_side_algo: Optional[str] = dataclasses.field(default_factory=get_current_server_side_algo)
+    server_side_iterations: Optional[int] = dataclasses.field(default_factory=get_current_server_side_iterations)
 
 
 
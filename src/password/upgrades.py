@@ -0,0 +1,119 @@
+import dataclasses
+import datetime
+import os
+import threading
+import uuid
+from typing import Dict, List
+
+from src.password.blob import is_blob_v2
+from src.password.cryptography import get_current_server_side_algo, get_current_server_side_iterations
+from src.password.models import PasswordModel
+
+
+@dataclasses.dataclass
+class PasswordUpgradeItem:
+    password_id: uuid.UUID
+    user_id: uuid.UUID
+    updated_on: datetime.datetime
+    password_client_side_encrypted: bytes
+
+
+@dataclasses.dataclass
+class PasswordUpgradeStats:
+    pending: int
+    queued: int
+    upgraded: int
+    skipped: int
+    failed: int
+    dropped: int
+
+
+def is_password_outdated(password_entity: PasswordModel) -> bool:
+    """
+    Password row was written with other algo or blob format than the current one, or with a lower KDF cost.
+    Higher KDF cost is kept, calibrated iterations differ slightly between workers and restarts
+    and rows must not be re-encrypted back and forth between them
+    """
+    return (
+        password_entity.server_side_algo.lower() != get_current_server_side_algo()
+        or password_entity.server_side_iterations < get_current_server_side_iterations()
+        or not is_blob_v2(password_entity.password_encrypted)
+    )
+
+
+class PasswordUpgradeQueue:
+    """
+    Outdated passwords seen by read paths, together with the plaintext of the server layer
+    that is already at hand. Drained in batches outside the request by PasswordUpgradeService.
+    Holds at most max_size passwords, new ones are dropped when full and queued again on a later read.
+    """
+
+    def __init__(self, enabled: bool, batch_size: int, max_size: int):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self._items: Dict[uuid.UUID, PasswordUpgradeItem] = {}
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._upgraded = 0
+        self._skipped = 0
+        self._failed = 0
+        self._dropped = 0
+
+    def add(self, password_entity: PasswordModel, password_client_side_encrypted: bytes):
+        if not self.enabled or not is_password_outdated(password_entity):
+            return
+
+        with self._lock:
+            if password_entity.id not in self._items:
+                if len(self._items) >= self.max_size:
+                    self._dropped += 1
+                    return
+                self._queued += 1
+            self._items[password_entity.id] = PasswordUpgradeItem(
+                password_id=password_entity.id,
+                user_id=password_entity.user_id,
+                updated_on=password_entity.updated_on,
+                password_client_side_encrypted=password_client_side_encrypted
+            )
+
+    def discard(self, password_id: uuid.UUID):
+        with self._lock:
+            self._items.pop(password_id, None)
+
+    def pop_batch(self) -> List[PasswordUpgradeItem]:
+        with self._lock:
+            password_ids = list(self._items.keys())[:self.batch_size]
+            return [self._items.pop(password_id) for password_id in password_ids]
+
+    def record_result(self, upgraded: int = 0, skipped: int = 0, failed: int = 0):
+        with self._lock:
+            self._upgraded += upgraded
+            self._skipped += skipped
+            self._failed += failed
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
+
+    def stats(self) -> PasswordUpgradeStats:
+        with self._lock:
+            return PasswordUpgradeStats(
+                pending=len(self._items),
+                queued=self._queued,
+                upgraded=self._upgraded,
+                skipped=self._skipped,
+                failed=self._failed,
+                dropped=self._dropped,
+            )
+
+
+password_upgrade_queue = PasswordUpgradeQueue(
+    enabled=os.environ.get('PASSWORD_LAZY_UPGRADE_ENABLED', 'true').lower() == 'true',
+    batch_size=int(os.environ.get('PASSWORD_LAZY_UPGRADE_BATCH_SIZE', 100)),
+    max_size=int(os.environ.get('PASSWORD_LAZY_UPGRADE_MAX_QUEUE_SIZE', 10_000))
+)
@@ -1,57 +1,250 @@
+import datetime
 import uuid
+from typing import List, Tuple, Dict, Optional
 
-from src import UserModel, PasswordModel
-from src.password.cryptography import CryptographyFernet
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src import UserModel, PasswordModel, PasswordHistoryModel
+from src.group.types import GroupDTO
+from src.password.crypto_engine import crypto_engine
+from src.password.cryptography import SERVER_SIDE_ALGO_FERNET
+from src.password.decrypted_cache import password_decrypted_cache
 from src.password.types import PasswordHistoryDTO, PasswordDTO
-from src.user.repositories import UserRepository
+from src.user.repositories import AsyncUserRepository, UserRepository
 
 
-def _encrypt_password_server_side(session, password_client_side_encrypted: bytes,
-                                  iterations: int, user_id: uuid.UUID) -> bytes:
+def _get_user_entity(session, user_id: uuid.UUID) -> UserModel:
     user_repo = UserRepository(session=session)
     user_entity: UserModel = user_repo.get_by_id(user_id)
     if not user_entity:
         raise Exception(f"No user with id = {user_id}")
+    return user_entity
+
 
-    fernet_crypto = CryptographyFernet()
-    password_encrypted_by_server = fernet_crypto.password_encrypt(
+def _encrypt_password_server_side(session, password_client_side_encrypted: bytes, iterations: int,
+                                  user_id: uuid.UUID, server_side_algo: str = SERVER_SIDE_ALGO_FERNET) -> bytes:
+    user_entity = _get_user_entity(session=session, user_id=user_id)
+    password_encrypted_by_server = crypto_engine.password_encrypt(
         message=password_client_side_encrypted,
         additional_pepper=str(user_entity.password_crypto),
-        iterations=iterations
+        iterations=iterations,
+        algo=server_side_algo
     )
     return password_encrypted_by_server
 
 
-def _decrypt_password_server_side(session, password_server_side_encrypted: bytes, user_id: uuid.UUID) -> bytes:
-    user_repo = UserRepository(session=session)
-    user_entity: UserModel = user_repo.get_by_id(user_id)
-    if not user_entity:
-        raise Exception(f"No user with id = {user_id}")
-
-    fernet_crypto = CryptographyFernet()
-    password_decrypted_by_server = fernet_crypto.password_decrypt(
+def _decrypt_password_server_side(session, password_server_side_encrypted: bytes, user_id: uuid.UUID,
+                                  server_side_algo: str = SERVER_SIDE_ALGO_FERNET) -> bytes:
+    user_entity = _get_user_entity(session=session, user_id=user_id)
+    password_decrypted_by_server = crypto_engine.password_decrypt(
         token=password_server_side_encrypted,
-        password_to_decrypt=str(user_entity.password_crypto)
+        password_to_decrypt=str(user_entity.password_crypto),
+        algo=server_side_algo
     )
 
     return password_decrypted_by_server
 
 
+async def _encrypt_password_server_side_async(session: AsyncSession, password_client_side_encrypted: bytes,
+                                              iterations: int, user_id: uuid.UUID,
+                                              server_side_algo: str = SERVER_SIDE_ALGO_FERNET) -> bytes:
+    users_password_crypto = await AsyncUserRepository(session=session).find_password_crypto_by_ids(user_ids=[user_id])
+    if user_id not in users_password_crypto:
+        raise Exception(f"No user with id = {user_id}")
+    return await crypto_engine.password_encrypt_async(
+        message=password_client_side_encrypted,
+        additional_pepper=str(users_password_crypto[user_id]),
+        iterations=iterations,
+        algo=server_side_algo
+    )
+
+
+def _prepare_decrypt_items(session, encrypted_values: List[Tuple[uuid.UUID, bytes, str]]) \
+        -> List[Tuple[bytes, str, str]]:
+    """
+    :param encrypted_values: list of (user_id, server_side_encrypted, server_side_algo)
+    :return: list of (token, password_to_decrypt, algo) for the crypto engine
+    """
+    # every user is fetched once, no matter how many passwords are decrypted
+    users_secrets: Dict[uuid.UUID, str] = {}
+    items = []
+    for user_id, server_side_encrypted, server_side_algo in encrypted_values:
+        if user_id not in users_secrets:
+            user_entity = _get_user_entity(session=session, user_id=user_id)
+            users_secrets[user_id] = str(user_entity.password_crypto)
+        items.append((server_side_encrypted, users_secrets[user_id], server_side_algo))
+    return items
+
+
+async def _prepare_decrypt_items_async(session: AsyncSession, encrypted_values: List[Tuple[uuid.UUID, bytes, str]]) \
+        -> List[Tuple[bytes, str, str]]:
+    """Same as _prepare_decrypt_items, on an AsyncSession secrets of all users are fetched in one query"""
+    user_ids = list({user_id for user_id, _, _ in encrypted_values})
+    users_password_crypto = await AsyncUserRepository(session=session).find_password_crypto_by_ids(user_ids=user_ids)
+    for user_id in user_ids:
+        if user_id not in users_password_crypto:
+            raise Exception(f"No user with id = {user_id}")
+    return [
+        (server_side_encrypted, str(users_password_crypto[user_id]), server_side_algo)
+        for user_id, server_side_encrypted, server_side_algo in encrypted_values
+    ]
+
+
+def _get_cached_values(cache_keys: List[Tuple[uuid.UUID, datetime.datetime]]) -> List[Optional[bytes]]:
+    return [
+        password_decrypted_cache.get(password_id=entity_id, updated_on=version)
+        for entity_id, version in cache_keys
+    ]
+
+
+def _merge_cached_values(cached_values: List[Optional[bytes]], missing_indexes: List[int],
+                         cache_keys: List[Tuple[uuid.UUID, datetime.datetime]],
+                         encrypted_values: List[Tuple[uuid.UUID, bytes, str]],
+                         decrypted_values: List[bytes]) -> List[bytes]:
+    results = list(cached_values)
+    for index, decrypted_value in zip(missing_indexes, decrypted_values):
+        entity_id, version = cache_keys[index]
+        password_decrypted_cache.set(
+            password_id=entity_id,
+            updated_on=version,
+            user_id=encrypted_values[index][0],
+            value=decrypted_value
+        )
+        results[index] = decrypted_value
+    return results
+
+
+def _decrypt_many_server_side(session, cache_keys: List[Tuple[uuid.UUID, datetime.datetime]],
+                              encrypted_values: List[Tuple[uuid.UUID, bytes, str]],
+                              concurrency: Optional[int] = None) -> List[bytes]:
+    """
+    :param cache_keys: list of (entity id, entity version), version changes when the encrypted value changes
+    :param encrypted_values: list of (user_id, server_side_encrypted, server_side_algo)
+    :return: decrypted values in the same order as encrypted_values
+    """
+    # only values not found in the cache pay the KDF cost
+    cached_values = _get_cached_values(cache_keys)
+    missing_indexes = [index for index, cached_value in enumerate(cached_values) if cached_value is None]
+    decrypted_values = []
+    if missing_indexes:
+        items = _prepare_decrypt_items(session, [encrypted_values[index] for index in missing_indexes])
+        decrypted_values = crypto_engine.password_decrypt_many(items=items, concurrency=concurrency)
+    return _merge_cached_values(cached_values, missing_indexes, cache_keys, encrypted_values, decrypted_values)
+
+
+async def _decrypt_many_server_side_async(session, cache_keys: List[Tuple[uuid.UUID, datetime.datetime]],
+                                          encrypted_values: List[Tuple[uuid.UUID, bytes, str]],
+                                          concurrency: Optional[int] = None) -> List[bytes]:
+    cached_values = _get_cached_values(cache_keys)
+    missing_indexes = [index for index, cached_value in enumerate(cached_values) if cached_value is None]
+    decrypted_values = []
+    if missing_indexes:
+        items = await _prepare_decrypt_items_async(session, [encrypted_values[index] for index in missing_indexes])
+        decrypted_values = await crypto_engine.password_decrypt_many_async(items=items, concurrency=concurrency)
+    return _merge_cached_values(cached_values, missing_indexes, cache_keys, encrypted_values, decrypted_values)
+
+
+def _passwords_decrypt_args(password_entities: List[PasswordModel]):
+    cache_keys = [(entity.id, entity.updated_on) for entity in password_entities]
+    encrypted_values = [
+        (entity.user_id, entity.password_encrypted, entity.server_side_algo)
+        for entity in password_entities
+    ]
+    return cache_keys, encrypted_values
+
+
+def _decrypt_passwords_server_side(session, password_entities: List[PasswordModel],
+                                   concurrency: Optional[int] = None) -> List[bytes]:
+    cache_keys, encrypted_values = _passwords_decrypt_args(password_entities)
+    return _decrypt_many_server_side(session, cache_keys, encrypted_values, concurrency)
+
+
+async def _decrypt_passwords_server_side_async(session, password_entities: List[PasswordModel],
+                                               concurrency: Optional[int] = None) -> List[bytes]:
+    cache_keys, encrypted_values = _passwords_decrypt_args(password_entities)
+    return await _decrypt_many_server_side_async(session, cache_keys, encrypted_values, concurrency)
+
+
+def _histories_decrypt_args(password_history_entities: List[PasswordHistoryModel]):
+    # legacy history rows keep the value without server layer, nothing to decrypt
+    entities_to_decrypt = [entity for entity in password_history_entities if entity.server_side_password_encrypted]
+    cache_keys = [(entity.id, entity.inserted_on) for entity in entities_to_decrypt]
+    encrypted_values = [
+        (entity.user_id, entity.server_side_password_encrypted, entity.server_side_algo)
+        for entity in entities_to_decrypt
+    ]
+    return entities_to_decrypt, cache_keys, encrypted_values
+
+
+def _histories_values(password_history_entities: List[PasswordHistoryModel],
+                      entities_to_decrypt: List[PasswordHistoryModel],
+                      decrypted_values: List[bytes]) -> Dict[uuid.UUID, bytes]:
+    values = {entity.id: entity.client_side_password_encrypted for entity in password_history_entities}
+    for entity, decrypted_value in zip(entities_to_decrypt, decrypted_values):
+        values[entity.id] = decrypted_value
+    return values
+
+
+def _decrypt_password_histories_server_side(session, password_history_entities: List[PasswordHistoryModel],
+                                            concurrency: Optional[int] = None) -> Dict[uuid.UUID, bytes]:
+    """
+    :return: client side encrypted value by history entity id
+    """
+    entities_to_decrypt, cache_keys, encrypted_values = _histories_decrypt_args(password_history_entities)
+    decrypted_values = _decrypt_many_server_side(session, cache_keys, encrypted_values, concurrency)
+    return _histories_values(password_history_entities, entities_to_decrypt, decrypted_values)
+
+
+async def _decrypt_password_histories_server_side_async(session,
+                                                        password_history_entities: List[PasswordHistoryModel],
+                                                        concurrency: Optional[int] = None) -> Dict[uuid.UUID, bytes]:
+    entities_to_decrypt, cache_keys, encrypted_values = _histories_decrypt_args(password_history_entities)
+    decrypted_values = await _decrypt_many_server_side_async(session, cache_keys, encrypted_values, concurrency)
+    return _histories_values(password_history_entities, entities_to_decrypt, decrypted_values)
+
+
+def _encrypt_passwords_server_side(session, passwords: List[Tuple[uuid.UUID, bytes]], iterations: int,
+                                   server_side_algo: str, concurrency: Optional[int] = None) -> List[bytes]:
+    """
+    :param passwords: list of (user_id, password_client_side_encrypted)
+    :return: server side encrypted values in the same order as passwords
+    """
+    users_secrets: Dict[uuid.UUID, str] = {}
+    items = []
+    for user_id, password_client_side_encrypted in passwords:
+        if user_id not in users_secrets:
+            users_secrets[user_id] = str(_get_user_entity(session=session, user_id=user_id).password_crypto)
+        items.append((password_client_side_encrypted, users_secrets[user_id], iterations, server_side_algo))
+    return crypto_engine.password_encrypt_many(items=items, concurrency=concurrency)
+
+
+def create_password_history_dto(password_history_entity: PasswordHistoryModel,
+                                client_side_password_encrypted: bytes) -> PasswordHistoryDTO:
+    history_dto = PasswordHistoryDTO(
+        id=password_history_entity.id,
+        name=password_history_entity.name,
+        login=password_history_entity.login,
+        client_side_password_encrypted=client_side_password_encrypted,
+        client_side_algo=password_history_entity.client_side_algo,
+        client_side_iterations=password_history_entity.client_side_iterations,
+        note=password_history_entity.note,
+        password_id=password_history_entity.password_id,
+        user_id=password_history_entity.user_id,
+        server_side_algo=password_history_entity.server_side_algo,
+        server_side_iterations=password_history_entity.server_side_iterations,
+    )
+    return history_dto
+
+
 def create_password_dto(password_entity: PasswordModel, password_client_side_encrypted: bytes):
+    """History items carry metadata only, values are read with PasswordHistoryService.get_password_history"""
     password_urls = [url.url for url in password_entity.urls]
-    password_groups_dtos = []
+    password_groups_dtos = [GroupDTO(id=group.id, name=group.name) for group in password_entity.groups]
     password_history_dtos = []
     for password_history in password_entity.history:
-        history_dto = PasswordHistoryDTO(
-            id=password_history.id,
-            name=password_history.name,
-            login=password_history.login,
-            client_side_password_encrypted=password_history.client_side_password_encrypted,
-            client_side_algo=password_history.client_side_algo,
-            client_side_iterations=password_history.client_side_iterations,
-            note=password_history.note,
-            password_id=password_history.password_id,
-            user_id=password_history.user_id,
+        history_dto = create_password_history_dto(
+            password_history_entity=password_history,
+            client_side_password_encrypted=None
         )
         password_history_dtos.append(history_dto)
 
@@ -67,7 +260,8 @@ def create_password_dto(password_entity: PasswordModel, password_client_side_enc
         note=password_entity.note,
         user_id=password_entity.user_id,
         history=password_history_dtos,
-        groups_ids=password_groups_dtos,
+        groups_ids=[group.id for group in password_groups_dtos],
+        groups=password_groups_dtos,
         urls=password_urls
     )
     return password_dto
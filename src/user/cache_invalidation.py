@@ -0,0 +1,68 @@
+import uuid
+
+from src.common.invalidation_bus import BUS_RECONNECTED_EVENT, invalidation_bus
+from src.user.signing_key_cache import user_signing_key_cache
+from src.user.token_cache import user_token_cache
+
+USER_UPDATED_EVENT = 'user_updated'
+USER_DELETED_EVENT = 'user_deleted'
+USER_TOKENS_DELETED_EVENT = 'user_tokens_deleted'
+
+
+def _on_user_updated(payload: dict):
+    # cached tokens were validated against the old password derived signing key
+    user_token_cache.invalidate_user(user_id=uuid.UUID(payload['user_id']))
+    user_signing_key_cache.invalidate(username=payload['username'])
+
+
+def _on_user_tokens_deleted(payload: dict):
+    user_id = uuid.UUID(payload['user_id'])
+    user_token_cache.invalidate_user(user_id=user_id)
+    user_signing_key_cache.invalidate_user(user_id=user_id)
+
+
+def _on_bus_reconnected(_: dict):
+    user_token_cache.clear()
+    user_signing_key_cache.clear()
+
+
+def publish_user_updated(session, user_id: uuid.UUID, username: str):
+    invalidation_bus.publish(
+        session=session,
+        event=USER_UPDATED_EVENT,
+        payload={'user_id': str(user_id), 'username': username}
+    )
+
+
+async def publish_user_updated_async(session, user_id: uuid.UUID, username: str):
+    await invalidation_bus.publish_async(
+        session=session,
+        event=USER_UPDATED_EVENT,
+        payload={'user_id': str(user_id), 'username': username}
+    )
+
+
+def publish_user_deleted(session, user_id: uuid.UUID):
+    invalidation_bus.publish(session=session, event=USER_DELETED_EVENT, payload={'user_id': str(user_id)})
+
+
+async def publish_user_deleted_async(session, user_id: uuid.UUID):
+    await invalidation_bus.publish_async(session=session, event=USER_DELETED_EVENT, payload={'user_id': str(user_id)})
+
+
+def publish_user_tokens_deleted(session, user_id: uuid.UUID):
+    invalidation_bus.publish(session=session, event=USER_TOKENS_DELETED_EVENT, payload={'user_id': str(user_id)})
+
+
+async def publish_user_tokens_deleted_async(session, user_id: uuid.UUID):
+    await invalidation_bus.publish_async(
+        session=session,
+        event=USER_TOKENS_DELETED_EVENT,
+        payload={'user_id': str(user_id)}
+    )
+
+
+invalidation_bus.subscribe(USER_UPDATED_EVENT, _on_user_updated)
+invalidation_bus.subscribe(USER_DELETED_EVENT, _on_user_tokens_deleted)
+invalidation_bus.subscribe(USER_TOKENS_DELETED_EVENT, _on_user_tokens_deleted)
+invalidation_bus.subscribe(BUS_RECONNECTED_EVENT, _on_bus_reconnected)
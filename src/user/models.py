@@ -20,6 +20,7 @@ class UserModel(BaseModel, InsertedOnMixin, UpdatedOnMixin):
     hash_algo = Column(String(10), nullable=False)
     iterations = Column(Integer(), nullable=False)
     password_crypto = Column(LargeBinary(8192), unique=False, nullable=False)
+    token_key_version = Column(Integer(), nullable=False, default=1, server_default='1')
 
     groups = relationship('GroupModel', secondary=MODULE_PREFIX + 'user_group', back_populates='users')
 
@@ -28,13 +29,14 @@ class UserTokenModel(BaseModel, InsertedOnMixin):
     __uuid_column_name__ = 'id'
 
     id = Column(UUID(as_uuid=True), primary_key=True)
-    token = Column(String(512), unique=True, nullable=False)
-    expiration_date = Column(DateTime(timezone=True), nullable=False)
-    user_id = Column(UUID(as_uuid=True), ForeignKey(UserModel.id), nullable=True)
+    token_hash = Column(LargeBinary(32), unique=True, nullable=False)  # sha256 of the token, raw token is not stored
+    expiration_date = Column(DateTime(timezone=True), nullable=False, index=True)
+    last_used_at = Column(DateTime(timezone=True), nullable=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey(UserModel.id), nullable=True, index=True)
 
 
 class UserGroupModel(BaseModel):
     __tablename__ = MODULE_PREFIX + 'user_group'
 
     group_id = Column(UUID(as_uuid=True), ForeignKey(GroupModel.id), primary_key=True)
-    user_id = Column(UUID(as_uuid=True), ForeignKey(UserModel.id), primary_key=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey(UserModel.id), primary_key=True, index=True)
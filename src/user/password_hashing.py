@@ -0,0 +1,16 @@
+import hashlib
+import os
+
+from src.password.crypto_engine import CryptoEngine, EXECUTOR_TYPE_THREAD
+
+
+def password_hash_task(password: bytes, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac('sha256', password, salt, iterations)
+
+
+# separate pool from crypto_engine, a login burst queues here and never delays password vault decryption.
+# Pool size caps concurrent user password hash operations
+user_password_hash_engine = CryptoEngine(
+    executor_type=os.environ.get('USER_AUTH_HASH_EXECUTOR', EXECUTOR_TYPE_THREAD),
+    max_workers=int(os.environ.get('USER_AUTH_HASH_MAX_CONCURRENCY', 0)) or max((os.cpu_count() or 1) // 2, 1)
+)
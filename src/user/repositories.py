@@ -3,43 +3,54 @@ import hashlib
 import os
 import secrets
 import uuid
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
 
-from sqlalchemy import and_
+from sqlalchemy import DateTime, UUID, and_, column, delete, func, select, update, values
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import SQLAlchemyError
 
+from src.common.AsyncBaseRepository import AsyncBaseRepository
 from src.common.BaseRepository import BaseRepository, NotFoundEntityError
+from src.common.kdf_calibration import kdf_calibration
 from src.user.models import UserModel, UserTokenModel, UserGroupModel
+from src.user.password_hashing import password_hash_task, user_password_hash_engine
 
 
-class UserRepository(BaseRepository):
+class UserPasswordMixin:
+    """Password hash and user entity creation, shared by the sync and async user repositories"""
     AUTH_SALT_TOKEN_BYTES = int(os.environ['USER_AUTH_SALT_TOKEN_BYTES'])
     AUTH_HASH_N_ITERATIONS = int(os.environ['USER_AUTH_HASH_N_ITERATIONS'])
     AUTH_HASH_ALGO = 'PBKDF2'
 
-    def model_class(self):
-        return UserModel
+    @classmethod
+    def get_auth_hash_iterations(cls) -> int:
+        """Iterations for new password hashes, calibrated value takes precedence over env"""
+        return kdf_calibration.user_auth_iterations or cls.AUTH_HASH_N_ITERATIONS
 
-    def create_password_hash(self, password: str, salt: Optional[bytes] = None, iterations: Optional[int] = None):
+    def _password_hash_args(self, password: str, salt: Optional[bytes] = None,
+                            iterations: Optional[int] = None) -> Tuple[bytes, bytes, int]:
         pepper = os.environ['USER_AUTH_PASSWORD_PEPPER']
         if not iterations:
-            iterations = self.AUTH_HASH_N_ITERATIONS
+            iterations = self.get_auth_hash_iterations()
 
         if not salt:
             salt = secrets.token_bytes(self.AUTH_SALT_TOKEN_BYTES)
+        return password.encode('utf-8') + pepper.encode('utf-8'), salt, iterations
 
-        hash_value = hashlib.pbkdf2_hmac(
-            'sha256',
-            password.encode('utf-8') + pepper.encode('utf-8'),
-            salt,
-            iterations
-        )
+    def create_password_hash(self, password: str, salt: Optional[bytes] = None, iterations: Optional[int] = None):
+        password_peppered, salt, iterations = self._password_hash_args(password, salt, iterations)
+        hash_value = password_hash_task(password_peppered, salt, iterations)
         return salt, hash_value
 
-    def create(self, username: str, password_clear: str) -> UserModel:
-        salt, password_hash = self.create_password_hash(password=password_clear)
+    async def create_password_hash_async(self, password: str, salt: Optional[bytes] = None,
+                                         iterations: Optional[int] = None):
+        """Same as create_password_hash, run on the bounded user password hash pool"""
+        password_peppered, salt, iterations = self._password_hash_args(password, salt, iterations)
+        hash_value = await user_password_hash_engine.run_async(password_hash_task, password_peppered, salt, iterations)
+        return salt, hash_value
+
+    def _create_entity(self, username: str, salt: bytes, password_hash: bytes, iterations: int) -> UserModel:
         hash_algo = self.AUTH_HASH_ALGO
-        iterations = self.AUTH_HASH_N_ITERATIONS
         password_crypto_server_side = secrets.token_bytes(4096)  # token to encrypt/decrypt passwords on server side
 
         entity = UserModel(
@@ -52,17 +63,33 @@ class UserRepository(BaseRepository):
         )
         return entity
 
-    def update(self, entity: UserModel, username: str, password_clear: str) -> UserModel:
-        salt, password_hash = self.create_password_hash(password=password_clear)
-        hash_algo = self.AUTH_HASH_ALGO
-        iterations = self.AUTH_HASH_N_ITERATIONS
+    def create(self, username: str, password_clear: str) -> UserModel:
+        iterations = self.get_auth_hash_iterations()
+        salt, password_hash = self.create_password_hash(password=password_clear, iterations=iterations)
+        return self._create_entity(username=username, salt=salt, password_hash=password_hash, iterations=iterations)
+
+    async def create_async(self, username: str, password_clear: str) -> UserModel:
+        iterations = self.get_auth_hash_iterations()
+        salt, password_hash = await self.create_password_hash_async(password=password_clear, iterations=iterations)
+        return self._create_entity(username=username, salt=salt, password_hash=password_hash, iterations=iterations)
 
+    def _set_password_hash(self, entity: UserModel, username: str, salt: bytes, password_hash: bytes,
+                           iterations: int):
         entity.username = username
         entity.password_hash = password_hash
         entity.salt = salt
-        entity.hash_algo = hash_algo
+        entity.hash_algo = self.AUTH_HASH_ALGO
         entity.iterations = iterations
 
+
+class UserRepository(UserPasswordMixin, BaseRepository):
+    def model_class(self):
+        return UserModel
+
+    def _update_entity(self, entity: UserModel, username: str, salt: bytes, password_hash: bytes,
+                       iterations: int) -> UserModel:
+        self._set_password_hash(entity=entity, username=username, salt=salt, password_hash=password_hash,
+                                iterations=iterations)
         try:
             self.commit()
         except SQLAlchemyError as e:
@@ -70,6 +97,18 @@ class UserRepository(BaseRepository):
             raise e
         return entity
 
+    def update(self, entity: UserModel, username: str, password_clear: str) -> UserModel:
+        iterations = self.get_auth_hash_iterations()
+        salt, password_hash = self.create_password_hash(password=password_clear, iterations=iterations)
+        return self._update_entity(entity=entity, username=username, salt=salt, password_hash=password_hash,
+                                   iterations=iterations)
+
+    async def update_async(self, entity: UserModel, username: str, password_clear: str) -> UserModel:
+        iterations = self.get_auth_hash_iterations()
+        salt, password_hash = await self.create_password_hash_async(password=password_clear, iterations=iterations)
+        return self._update_entity(entity=entity, username=username, salt=salt, password_hash=password_hash,
+                                   iterations=iterations)
+
     def find_all(self) -> List[UserModel]:
         return self.query().all()
 
@@ -81,6 +120,19 @@ class UserRepository(BaseRepository):
             raise e
         return entity
 
+    def find_signing_key_fields_by_username(self, username: str) -> Tuple[uuid.UUID, bytes, int]:
+        """Only columns needed to derive JWT signing key, password_crypto blob is not loaded"""
+        try:
+            row = self.session.execute(
+                select(UserModel.id, UserModel.password_hash, UserModel.token_key_version).where(
+                    UserModel.username == username
+                )
+            ).one()
+        except SQLAlchemyError as e:
+            self.session.rollback()
+            raise e
+        return row.id, row.password_hash, row.token_key_version
+
     def find_by_id(self, user_id: uuid.UUID) -> UserModel:
         try:
             entity = self.query().filter(UserModel.id == user_id).one()
@@ -89,6 +141,19 @@ class UserRepository(BaseRepository):
             raise e
         return entity
 
+    def increment_token_key_version(self, user_id: uuid.UUID) -> UserModel:
+        entity = self.query().filter(UserModel.id == user_id).one_or_none()
+        if not entity:
+            raise NotFoundEntityError(f"Not found user with uuid: {user_id}")
+
+        entity.token_key_version = UserModel.token_key_version + 1
+        try:
+            self.commit()
+        except SQLAlchemyError as e:
+            self.session.rollback()
+            raise e
+        return entity
+
     def delete_by_id(self, user_id: uuid.UUID) -> uuid.UUID:
         user_token_repo = UserTokenRepository(session=self.session)
         user_group_repo = UserGroupRepository(session=self.session)
@@ -111,9 +176,12 @@ class UserRepository(BaseRepository):
         return entity_uuid
 
 
-class UserTokenRepository(BaseRepository):
-    def model_class(self):
-        return UserTokenModel
+class UserTokenMixin:
+    """Token entity and upsert statement, shared by the sync and async token repositories"""
+
+    @staticmethod
+    def hash_token(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
 
     def create(self, token: str, user_id: uuid.UUID, expiration_date: Optional[datetime.datetime] = None) -> UserModel:
         if not expiration_date:
@@ -121,12 +189,35 @@ class UserTokenRepository(BaseRepository):
             expiration_date = datetime.datetime.now() + datetime.timedelta(hours=token_expiration_date_hours)
 
         entity = UserTokenModel(
-            token=token,
+            token_hash=self.hash_token(token),
             expiration_date=expiration_date,
             user_id=user_id
         )
         return entity
 
+    def _upsert_statement(self, token: str, user_id: uuid.UUID, expiration_date: Optional[datetime.datetime] = None):
+        entity = self.create(token=token, user_id=user_id, expiration_date=expiration_date)
+        statement = postgresql.insert(UserTokenModel).values(
+            id=entity.id,
+            token_hash=entity.token_hash,
+            expiration_date=entity.expiration_date,
+            user_id=entity.user_id
+        )
+        return statement.on_conflict_do_update(
+            index_elements=[UserTokenModel.token_hash],
+            set_=dict(
+                expiration_date=statement.excluded.expiration_date,
+                user_id=statement.excluded.user_id,
+                inserted_on=statement.excluded.inserted_on
+            ),
+            where=UserTokenModel.expiration_date < datetime.datetime.now()
+        ).returning(UserTokenModel)
+
+
+class UserTokenRepository(UserTokenMixin, BaseRepository):
+    def model_class(self):
+        return UserTokenModel
+
     def delete_user_tokens(self, user_id: uuid.UUID):
         entities = self.query().filter(UserTokenModel.user_id == user_id).all()
         try:
@@ -137,28 +228,254 @@ class UserTokenRepository(BaseRepository):
             self.session.rollback()
             raise e
 
-    def delete_expired_tokens(self):
+    def delete_expired_tokens(self, batch_size: int = 1000) -> int:
+        """
+        Set based delete of expired tokens, committed in batches so a big backlog never holds long locks
+        :return int: number of deleted tokens
+        """
         date_now = datetime.datetime.now()
-        entities = self.query().filter(UserTokenModel.expiration_date < date_now).all()
+        deleted_count = 0
+        while True:
+            expired_ids = select(UserTokenModel.id).where(
+                UserTokenModel.expiration_date < date_now
+            ).limit(batch_size).scalar_subquery()
+            try:
+                result = self.session.execute(delete(UserTokenModel).where(UserTokenModel.id.in_(expired_ids)))
+                self.commit()
+            except SQLAlchemyError as e:
+                self.session.rollback()
+                raise e
+
+            deleted_count += result.rowcount
+            if result.rowcount < batch_size:
+                return deleted_count
+
+    def upsert(self, token: str, user_id: uuid.UUID,
+               expiration_date: Optional[datetime.datetime] = None) -> Optional[UserTokenModel]:
+        """
+        Single INSERT ... ON CONFLICT ... RETURNING, not committed. Row of an expired token with the same hash is
+        taken over, row of a valid one is left as it is
+        :return UserTokenModel: inserted or refreshed entity, None when a valid token is already stored
+        """
+        statement = self._upsert_statement(token=token, user_id=user_id, expiration_date=expiration_date)
         try:
-            for entity in entities:
-                self.session.delete(entity)
-            self.commit()
+            upserted_entity = self.session.scalars(
+                statement,
+                execution_options={'populate_existing': True}
+            ).one_or_none()
         except SQLAlchemyError as e:
             self.session.rollback()
             raise e
+        return upserted_entity
+
+    def update_tokens_last_used_at(self, tokens_last_used_at: Dict[uuid.UUID, datetime.datetime],
+                                   expiration_delta: datetime.timedelta, batch_size: int = 1000) -> int:
+        """
+        Batched UPDATE ... FROM (VALUES ...) of last_used_at, expiration date of a token is moved to
+        last use + expiration_delta. Token already expired at its last use is not extended
+        :return int: number of updated tokens
+        """
+        updated_count = 0
+        items = list(tokens_last_used_at.items())
+        for batch_start in range(0, len(items), batch_size):
+            tokens_usage = values(
+                column('id', UUID(as_uuid=True)),
+                column('last_used_at', DateTime(timezone=True)),
+                name='tokens_usage'
+            ).data(items[batch_start:batch_start + batch_size])
+            statement = update(UserTokenModel).where(
+                and_(
+                    UserTokenModel.id == tokens_usage.c.id,
+                    UserTokenModel.expiration_date >= tokens_usage.c.last_used_at
+                )
+            ).values(
+                last_used_at=func.greatest(UserTokenModel.last_used_at, tokens_usage.c.last_used_at),
+                expiration_date=func.greatest(
+                    UserTokenModel.expiration_date,
+                    tokens_usage.c.last_used_at + expiration_delta
+                )
+            )
+            try:
+                result = self.session.execute(statement, execution_options={'synchronize_session': False})
+                self.commit()
+            except SQLAlchemyError as e:
+                self.session.rollback()
+                raise e
+            updated_count += result.rowcount
+        return updated_count
 
     def find_by_token(self, token: str) -> Optional[UserTokenModel]:
-        entity = self.query().filter(UserTokenModel.token == token).one_or_none()
+        entity = self.query().filter(UserTokenModel.token_hash == self.hash_token(token)).one_or_none()
         if entity:
             return entity
         return None
 
+    def find_valid_by_token(self, token: str) -> Optional[UserTokenModel]:
+        date_now = datetime.datetime.now()
+        try:
+            entity = self.query().filter(
+                and_(
+                    UserTokenModel.token_hash == self.hash_token(token),
+                    UserTokenModel.expiration_date >= date_now
+                )
+            ).one_or_none()
+        except SQLAlchemyError as e:
+            self.session.rollback()
+            raise e
+        return entity
+
     def find_all(self) -> List[UserTokenModel]:
         entities = self.query().all()
         return entities
 
 
+class AsyncUserRepository(UserPasswordMixin, AsyncBaseRepository):
+    def model_class(self):
+        return UserModel
+
+    async def update(self, entity: UserModel, username: str, password_clear: str) -> UserModel:
+        iterations = self.get_auth_hash_iterations()
+        salt, password_hash = await self.create_password_hash_async(password=password_clear, iterations=iterations)
+        self._set_password_hash(entity=entity, username=username, salt=salt, password_hash=password_hash,
+                                iterations=iterations)
+        try:
+            await self.commit()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return entity
+
+    async def find_all(self) -> List[UserModel]:
+        result = await self.session.execute(self.select())
+        return list(result.scalars().all())
+
+    async def find_by_username(self, username: str) -> UserModel:
+        try:
+            result = await self.session.execute(self.select().where(UserModel.username == username))
+            entity = result.scalar_one()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return entity
+
+    async def find_by_id(self, user_id: uuid.UUID) -> UserModel:
+        try:
+            result = await self.session.execute(self.select().where(UserModel.id == user_id))
+            entity = result.scalar_one()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return entity
+
+    async def delete_by_id(self, user_id: uuid.UUID) -> uuid.UUID:
+        """User with its tokens and group memberships, one set based delete per table"""
+        try:
+            for model in (UserTokenModel, UserGroupModel):
+                await self.session.execute(
+                    delete(model).where(model.user_id == user_id),
+                    execution_options={'synchronize_session': False}
+                )
+            result = await self.session.execute(
+                delete(UserModel).where(UserModel.id == user_id).returning(UserModel.id),
+                execution_options={'synchronize_session': False}
+            )
+            entity_uuid = result.scalar_one_or_none()
+            if not entity_uuid:
+                raise NotFoundEntityError(f"Not found user with uuid: {user_id}")
+            await self.commit()
+        except (SQLAlchemyError, NotFoundEntityError) as e:
+            await self.session.rollback()
+            raise e
+        return entity_uuid
+
+    async def increment_token_key_version(self, user_id: uuid.UUID) -> uuid.UUID:
+        """Not committed"""
+        try:
+            result = await self.session.execute(
+                update(UserModel).where(UserModel.id == user_id).values(
+                    token_key_version=UserModel.token_key_version + 1
+                ).returning(UserModel.id),
+                execution_options={'synchronize_session': False}
+            )
+            entity_uuid = result.scalar_one_or_none()
+            if not entity_uuid:
+                raise NotFoundEntityError(f"Not found user with uuid: {user_id}")
+        except (SQLAlchemyError, NotFoundEntityError) as e:
+            await self.session.rollback()
+            raise e
+        return entity_uuid
+
+    async def find_signing_key_fields_by_username(self, username: str) -> Tuple[uuid.UUID, bytes, int]:
+        try:
+            result = await self.session.execute(
+                select(UserModel.id, UserModel.password_hash, UserModel.token_key_version).where(
+                    UserModel.username == username
+                )
+            )
+            row = result.one()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return row.id, row.password_hash, row.token_key_version
+
+    async def find_password_crypto_by_ids(self, user_ids: List[uuid.UUID]) -> Dict[uuid.UUID, bytes]:
+        """Server side password secret of many users in one query"""
+        try:
+            result = await self.session.execute(
+                select(UserModel.id, UserModel.password_crypto).where(UserModel.id.in_(user_ids))
+            )
+            rows = result.all()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return {row.id: row.password_crypto for row in rows}
+
+
+class AsyncUserTokenRepository(UserTokenMixin, AsyncBaseRepository):
+    def model_class(self):
+        return UserTokenModel
+
+    async def upsert(self, token: str, user_id: uuid.UUID,
+                     expiration_date: Optional[datetime.datetime] = None) -> Optional[UserTokenModel]:
+        """Same as UserTokenRepository.upsert, not committed"""
+        statement = self._upsert_statement(token=token, user_id=user_id, expiration_date=expiration_date)
+        try:
+            result = await self.session.scalars(statement, execution_options={'populate_existing': True})
+            upserted_entity = result.one_or_none()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return upserted_entity
+
+    async def delete_user_tokens(self, user_id: uuid.UUID):
+        """Not committed"""
+        try:
+            await self.session.execute(
+                delete(UserTokenModel).where(UserTokenModel.user_id == user_id),
+                execution_options={'synchronize_session': False}
+            )
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+
+    async def find_valid_by_token(self, token: str) -> Optional[UserTokenModel]:
+        date_now = datetime.datetime.now()
+        try:
+            result = await self.session.execute(
+                self.select().where(
+                    and_(
+                        UserTokenModel.token_hash == self.hash_token(token),
+                        UserTokenModel.expiration_date >= date_now
+                    )
+                )
+            )
+            entity = result.scalar_one_or_none()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        return entity
+
+
 class UserGroupRepository(BaseRepository):
     def model_class(self):
         return UserGroupModel
@@ -178,3 +495,19 @@ class UserGroupRepository(BaseRepository):
                 raise e
 
         return deleted_password_ids
+
+
+class AsyncUserGroupRepository(AsyncBaseRepository):
+    def model_class(self):
+        return UserGroupModel
+
+    async def delete_user_from_all_groups(self, user_id: uuid.UUID):
+        """Not committed"""
+        try:
+            await self.session.execute(
+                delete(UserGroupModel).where(UserGroupModel.user_id == user_id),
+                execution_options={'synchronize_session': False}
+            )
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
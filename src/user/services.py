@@ -4,44 +4,121 @@ import datetime
 import logging
 import os
 import uuid
-from typing import Optional, List
+from typing import Dict, Optional, List
 
 import jwt
 import sqlalchemy
-from jwt import DecodeError
+from jwt import DecodeError, InvalidTokenError
 from sqlalchemy.exc import SQLAlchemyError
 
+from src.common.AsyncBaseService import AsyncBaseService
 from src.common.BaseService import BaseService
-from src.group.repositories import GroupRepository
-from src.password.services import PasswordService
+from src.group.repositories import AsyncGroupRepository, GroupRepository
+from src.password.services import AsyncPasswordService, PasswordService
 from src.user.models import UserModel
 from src.common.BaseRepository import NotFoundEntityError
+from src.user.cache_invalidation import publish_user_deleted, publish_user_deleted_async, \
+    publish_user_tokens_deleted, publish_user_tokens_deleted_async, publish_user_updated, publish_user_updated_async
 from src.user.exceptions import UserLoginPasswordInvalidError, MasterTokenInvalidUseError
 from src.user.models import UserTokenModel
-from src.user.repositories import UserRepository, UserTokenRepository, UserGroupRepository
-from src.user.types import UserJwtTokenPayload
+from src.user.repositories import AsyncUserRepository, AsyncUserTokenRepository, UserRepository, \
+    UserTokenRepository
+from src.user.signing_key_cache import UserSigningKey, user_signing_key_cache
+from src.user.types import UserJwtTokenPayload, UserStatelessJwtTokenPayload
 
 logger = logging.getLogger()
 
 
+def _create_signing_key(username: str, user_id: uuid.UUID, user_password_hash: bytes,
+                        token_key_version: int) -> UserSigningKey:
+    signing_key = UserSigningKey(
+        user_id=user_id,
+        key=os.environ['JTW_TOKEN_PEPPER'] + "-" + str(base64.b64encode(user_password_hash)),
+        key_version=token_key_version
+    )
+    user_signing_key_cache.set(username=username, signing_key=signing_key)
+    return signing_key
+
+
+def _encode_stateless_token(username: str, signing_key: UserSigningKey) -> str:
+    issued_at = datetime.datetime.now(datetime.timezone.utc)
+    token_expiration_date_hours = int(os.environ['JWT_TOKEN_EXPIRATION_DATE_HOURS'])
+    payload = dataclasses.asdict(UserStatelessJwtTokenPayload(
+        sub=str(signing_key.user_id),
+        username=username,
+        iat=int(issued_at.timestamp()),
+        exp=int((issued_at + datetime.timedelta(hours=token_expiration_date_hours)).timestamp()),
+        key_version=signing_key.key_version
+    ))
+    return jwt.encode(payload=payload, key=signing_key.stateless_key, algorithm="HS256")
+
+
+def _encode_token(username: str, signing_key: UserSigningKey) -> str:
+    if UserJwtTokenService.STATELESS_ENABLED:
+        return _encode_stateless_token(username=username, signing_key=signing_key)
+
+    payload = dataclasses.asdict(UserJwtTokenPayload(username=username))
+    return jwt.encode(payload=payload, key=signing_key.key, algorithm="HS256")
+
+
+def _get_unverified_username(jwt_token: str) -> Optional[str]:
+    try:
+        unverified_payload = jwt.decode(jwt=jwt_token, options={'verify_signature': False})
+        return unverified_payload['username']
+    except (InvalidTokenError, KeyError, TypeError):
+        return None
+
+
+def _verify_stateless_token(jwt_token: str, signing_key: UserSigningKey) -> Optional[UserStatelessJwtTokenPayload]:
+    try:
+        decoded_payload = jwt.decode(
+            jwt=jwt_token,
+            key=signing_key.stateless_key,
+            algorithms=["HS256"],
+            options={'require': ['sub', 'iat', 'exp']}
+        )
+    except InvalidTokenError:
+        return None
+
+    if decoded_payload.get('key_version') != signing_key.key_version or \
+            decoded_payload['sub'] != str(signing_key.user_id):
+        return None
+
+    return UserStatelessJwtTokenPayload(
+        sub=decoded_payload['sub'],
+        username=decoded_payload['username'],
+        iat=decoded_payload['iat'],
+        exp=decoded_payload['exp'],
+        key_version=decoded_payload['key_version']
+    )
+
+
 class UserJwtTokenService(BaseService):
-    def create(self, username: str) -> Optional[str]:
+    STATELESS_ENABLED = os.environ.get('JWT_STATELESS_ENABLED', 'false').lower() == 'true'
+
+    def _get_signing_key(self, username: str, user_entity: Optional[UserModel] = None) -> UserSigningKey:
+        """Signing key derived from user password hash, cached per username after the first use"""
+        signing_key = user_signing_key_cache.get(username=username)
+        if signing_key:
+            return signing_key
+
+        if user_entity:
+            # user row already loaded by the caller, no need to fetch it again
+            return _create_signing_key(username, user_entity.id, user_entity.password_hash,
+                                       user_entity.token_key_version)
+        return _create_signing_key(username, *UserRepository(self.session).find_signing_key_fields_by_username(username))
+
+    def create(self, username: str, user_entity: Optional[UserModel] = None) -> Optional[str]:
         if not username:
             return None
-
-        payload = dataclasses.asdict(UserJwtTokenPayload(username=username))
-        user_password_hash = UserRepository(self.session).find_by_username(username).password_hash
-        key = os.environ['JTW_TOKEN_PEPPER'] + "-" + str(base64.b64encode(user_password_hash))
-        encoded_jwt = jwt.encode(payload=payload, key=key, algorithm="HS256")
-        return encoded_jwt
+        return _encode_token(username=username, signing_key=self._get_signing_key(username, user_entity))
 
     def is_valid(self, jwt_token: str, username: str) -> bool:
         if not username:
             return False
 
         valid_payload = dataclasses.asdict(UserJwtTokenPayload(username=username))
-        user_password_hash = UserRepository(self.session).find_by_username(username).password_hash
-        key = os.environ['JTW_TOKEN_PEPPER'] + "-" + str(base64.b64encode(user_password_hash))
+        key = self._get_signing_key(username=username).key
 
         try:
             payload = jwt.decode(jwt=jwt_token, key=key, algorithms=["HS256"])
@@ -57,8 +134,7 @@ class UserJwtTokenService(BaseService):
             return None
 
         valid_payload = dataclasses.asdict(UserJwtTokenPayload(username=username))
-        user_password_hash = UserRepository(self.session).find_by_username(username).password_hash
-        key = os.environ['JTW_TOKEN_PEPPER'] + "-" + str(base64.b64encode(user_password_hash))
+        key = self._get_signing_key(username=username).key
         decoded_payload = jwt.decode(jwt=jwt_token, key=key, algorithms=["HS256"])
 
         if decoded_payload != valid_payload:
@@ -69,15 +145,87 @@ class UserJwtTokenService(BaseService):
         )
         return token_decode
 
+    def decode_stateless(self, jwt_token: str) -> Optional[UserStatelessJwtTokenPayload]:
+        """
+        Verify signature, expiration and key version of a stateless token
+        :param jwt_token:
+        :return UserStatelessJwtTokenPayload: payload of a valid token or None
+        """
+        username = _get_unverified_username(jwt_token)
+        if not username:
+            return None
+
+        try:
+            signing_key = self._get_signing_key(username=username)
+        except SQLAlchemyError:
+            return None
+        return _verify_stateless_token(jwt_token=jwt_token, signing_key=signing_key)
+
+
+class AsyncUserJwtTokenService(AsyncBaseService):
+    async def _get_signing_key(self, username: str) -> UserSigningKey:
+        signing_key = user_signing_key_cache.get(username=username)
+        if signing_key:
+            return signing_key
+        signing_key_fields = await AsyncUserRepository(self.session).find_signing_key_fields_by_username(username)
+        return _create_signing_key(username, *signing_key_fields)
+
+    async def decode_stateless(self, jwt_token: str) -> Optional[UserStatelessJwtTokenPayload]:
+        username = _get_unverified_username(jwt_token)
+        if not username:
+            return None
+
+        try:
+            signing_key = await self._get_signing_key(username=username)
+        except SQLAlchemyError:
+            return None
+        return _verify_stateless_token(jwt_token=jwt_token, signing_key=signing_key)
+
 
 class UserService(BaseService):
     def login_user(self, username: str, password_clear: str) -> str:
-        repo = UserRepository(session=self.session)
+        entity = self._authenticate_user(username=username, password_clear=password_clear)
+        user_logged_jwt_token = UserJwtTokenService(session=self.session).create(username=username, user_entity=entity)
+        return user_logged_jwt_token
+
+    def login_user_and_create_token(self, username: str, password_clear: str) -> str:
+        """
+        Login flow of the API: one user fetch, then a single token upsert committed in one transaction.
+        Stateless tokens are not stored
+        :return str: user token
+        """
+        entity = self._authenticate_user(username=username, password_clear=password_clear)
+        return self._create_login_token(entity=entity, username=username)
+
+    async def login_user_and_create_token_async(self, username: str, password_clear: str) -> str:
+        entity = await self._authenticate_user_async(username=username, password_clear=password_clear)
+        return self._create_login_token(entity=entity, username=username)
+
+    def _create_login_token(self, entity: UserModel, username: str) -> str:
+        user_logged_jwt_token = UserJwtTokenService(session=self.session).create(username=username, user_entity=entity)
+
+        if not UserJwtTokenService.STATELESS_ENABLED:
+            UserTokenService(session=self.session).create_token(token=user_logged_jwt_token, user_id=entity.id)
+        return user_logged_jwt_token
+
+    def _find_login_user(self, repo: UserRepository, username: str) -> UserModel:
         try:
             entity = repo.find_by_username(username=username)
         except (SQLAlchemyError, NotFoundEntityError):
             repo.session.close()
-            raise UserLoginPasswordInvalidError(f"Invalid username or password")
+            raise UserLoginPasswordInvalidError("Invalid username or password")
+        return entity
+
+    @staticmethod
+    def _validate_login_password_hash(repo: UserRepository, entity: UserModel, password_hash_from_user_input: bytes):
+        password_hash_from_db = entity.password_hash
+        if not password_hash_from_db == password_hash_from_user_input:
+            repo.session.close()
+            raise UserLoginPasswordInvalidError()
+
+    def _authenticate_user(self, username: str, password_clear: str) -> UserModel:
+        repo = UserRepository(session=self.session)
+        entity = self._find_login_user(repo=repo, username=username)
 
         # recreate user hash with salt and iterations from user entity
         password_salt_from_user_input, password_hash_from_user_input = repo.create_password_hash(
@@ -85,13 +233,22 @@ class UserService(BaseService):
             salt=entity.salt,
             iterations=entity.iterations
         )
-        password_hash_from_db = entity.password_hash
-        if not password_hash_from_db == password_hash_from_user_input:
-            repo.session.close()
-            raise UserLoginPasswordInvalidError()
+        self._validate_login_password_hash(repo=repo, entity=entity,
+                                           password_hash_from_user_input=password_hash_from_user_input)
+        return entity
 
-        user_logged_jwt_token = UserJwtTokenService(session=self.session).create(username=username)
-        return user_logged_jwt_token
+    async def _authenticate_user_async(self, username: str, password_clear: str) -> UserModel:
+        repo = UserRepository(session=self.session)
+        entity = self._find_login_user(repo=repo, username=username)
+
+        password_salt_from_user_input, password_hash_from_user_input = await repo.create_password_hash_async(
+            password=password_clear,
+            salt=entity.salt,
+            iterations=entity.iterations
+        )
+        self._validate_login_password_hash(repo=repo, entity=entity,
+                                           password_hash_from_user_input=password_hash_from_user_input)
+        return entity
 
     def create_user(self, username: str, password_clear: str) -> UserModel:
         repo = UserRepository(session=self.session)
@@ -99,6 +256,17 @@ class UserService(BaseService):
             username=username,
             password_clear=password_clear,
         )
+        return self._save_new_user(repo=repo, entity=entity)
+
+    async def create_user_async(self, username: str, password_clear: str) -> UserModel:
+        repo = UserRepository(session=self.session)
+        entity = await repo.create_async(
+            username=username,
+            password_clear=password_clear,
+        )
+        return self._save_new_user(repo=repo, entity=entity)
+
+    def _save_new_user(self, repo: UserRepository, entity: UserModel) -> UserModel:
         try:
             repo.save(entity)
             repo.commit()
@@ -113,20 +281,36 @@ class UserService(BaseService):
         group_repo.commit()
         return entity
 
-    def update_user(self, user_id: uuid.UUID, password_clear: str) -> Optional[UserModel]:
-        repo = UserRepository(session=self.session)
-
+    def _find_user_to_update(self, repo: UserRepository, user_id: uuid.UUID) -> UserModel:
         try:
             entity = repo.find_by_id(user_id)
         except sqlalchemy.exc.NoResultFound as e:
             logger.error(str(e))
             raise NotFoundEntityError(f"Not found user with user_id {user_id}")
+        return entity
+
+    def update_user(self, user_id: uuid.UUID, password_clear: str) -> Optional[UserModel]:
+        repo = UserRepository(session=self.session)
+        entity = self._find_user_to_update(repo=repo, user_id=user_id)
 
         entity = repo.update(
             entity=entity,
             username=entity.username,
             password_clear=password_clear
         )
+        publish_user_updated(session=self.session, user_id=entity.id, username=entity.username)
+        return entity
+
+    async def update_user_async(self, user_id: uuid.UUID, password_clear: str) -> Optional[UserModel]:
+        repo = UserRepository(session=self.session)
+        entity = self._find_user_to_update(repo=repo, user_id=user_id)
+
+        entity = await repo.update_async(
+            entity=entity,
+            username=entity.username,
+            password_clear=password_clear
+        )
+        publish_user_updated(session=self.session, user_id=entity.id, username=entity.username)
         return entity
 
     def delete_user(self, user_id: uuid.UUID) -> uuid.UUID:
@@ -143,9 +327,23 @@ class UserService(BaseService):
         except NotFoundEntityError as e:
             repo.session.rollback()
             raise e
+        publish_user_deleted(session=self.session, user_id=user_id)
 
         return entity_uuid
 
+    def revoke_user_tokens(self, user_id: uuid.UUID) -> uuid.UUID:
+        """
+        Bump user token key version, stateless tokens signed with the previous version stop verifying.
+        Stored tokens of the user are deleted too
+        """
+        repo = UserRepository(session=self.session)
+        user_token_repo = UserTokenRepository(session=self.session)
+
+        entity_uuid = repo.increment_token_key_version(user_id=user_id).id
+        user_token_repo.delete_user_tokens(user_id=user_id)
+        publish_user_tokens_deleted(session=self.session, user_id=user_id)
+        return entity_uuid
+
     def find_all(self) -> List[UserModel]:
         repo = UserRepository(session=self.session)
         entities = repo.find_all()
@@ -160,53 +358,182 @@ class UserService(BaseService):
             raise e
         return entity
 
-    def find_id_by_token(self, token: str) -> Optional[uuid.UUID]:
-        repo = UserTokenRepository(session=self.session)
-        try:
-            entity = repo.find_by_token(token=token)
-        except (SQLAlchemyError, NotFoundEntityError) as e:
-            repo.session.close()
-            raise e
-        return entity.user_id
-
 
 class UserTokenService(BaseService):
     def create_token(self, token, user_id: uuid.UUID, expiration_date: Optional[datetime.datetime] = None) -> UserTokenModel:
         repo = UserTokenRepository(session=self.session)
 
-        repo.delete_expired_tokens()
-        old_token_entity = repo.find_by_token(token=token)
-
-        if not old_token_entity:
-            new_entity = repo.create(
+        try:
+            entity = repo.upsert(
                 token=token,
                 user_id=user_id,
                 expiration_date=expiration_date
             )
-            repo.save(new_entity)
+            if not entity:
+                # valid token with the same hash is already stored, concurrent login or a repeated one
+                entity = repo.find_valid_by_token(token=token)
             repo.commit()
-            return new_entity
-        return old_token_entity
+        except SQLAlchemyError as e:
+            repo.session.rollback()
+            raise e
+        return entity
 
-    def is_token_valid(self, token: str) -> bool:
+    def find_valid_token(self, token: str) -> Optional[UserTokenModel]:
         """
-        Token has expired date, first delete expired token. If token still exists in db then is valid
+        Token is valid until its expiration date, expired rows are removed by the background reaper
         :param token:
-        :return bool:
+        :return UserTokenModel: valid token entity or None
         """
         repo = UserTokenRepository(session=self.session)
-        repo.delete_expired_tokens()
-        token_entity = repo.find_by_token(token=token)
+        token_entity = repo.find_valid_by_token(token=token)
+        return token_entity
+
+    def is_token_valid(self, token: str) -> bool:
+        token_entity = self.find_valid_token(token=token)
 
         if not token_entity:
             return False
         return True
 
-    def delete_expired_tokens(self):
+    def update_tokens_last_used_at(self, tokens_last_used_at: Dict[uuid.UUID, datetime.datetime],
+                                   batch_size: int = 1000) -> int:
+        """Sliding expiration, used token stays valid for JWT_TOKEN_EXPIRATION_DATE_HOURS after its last use"""
+        repo = UserTokenRepository(session=self.session)
+        expiration_delta = datetime.timedelta(hours=int(os.environ['JWT_TOKEN_EXPIRATION_DATE_HOURS']))
+        return repo.update_tokens_last_used_at(
+            tokens_last_used_at=tokens_last_used_at,
+            expiration_delta=expiration_delta,
+            batch_size=batch_size
+        )
+
+    def delete_expired_tokens(self, batch_size: int = 1000) -> int:
         repo = UserTokenRepository(session=self.session)
-        repo.delete_expired_tokens()
+        return repo.delete_expired_tokens(batch_size=batch_size)
 
     def get_all(self) -> List[UserTokenModel]:
         repo = UserTokenRepository(session=self.session)
         entities = repo.find_all()
         return entities
+
+
+class AsyncUserService(AsyncBaseService):
+    async def login_user_and_create_token(self, username: str, password_clear: str) -> str:
+        """Same flow as UserService.login_user_and_create_token on the async session"""
+        entity = await self._authenticate_user(username=username, password_clear=password_clear)
+        signing_key = user_signing_key_cache.get(username=username) or _create_signing_key(
+            username, entity.id, entity.password_hash, entity.token_key_version
+        )
+        user_logged_jwt_token = _encode_token(username=username, signing_key=signing_key)
+
+        if not UserJwtTokenService.STATELESS_ENABLED:
+            await AsyncUserTokenService(session=self.session).create_token(token=user_logged_jwt_token,
+                                                                           user_id=entity.id)
+        return user_logged_jwt_token
+
+    async def _authenticate_user(self, username: str, password_clear: str) -> UserModel:
+        repo = AsyncUserRepository(session=self.session)
+        try:
+            entity = await repo.find_by_username(username=username)
+        except SQLAlchemyError:
+            raise UserLoginPasswordInvalidError("Invalid username or password")
+
+        # recreate user hash with salt and iterations from user entity
+        _, password_hash_from_user_input = await repo.create_password_hash_async(
+            password=password_clear,
+            salt=entity.salt,
+            iterations=entity.iterations
+        )
+        if not entity.password_hash == password_hash_from_user_input:
+            raise UserLoginPasswordInvalidError()
+        return entity
+
+    async def create_user(self, username: str, password_clear: str) -> UserModel:
+        repo = AsyncUserRepository(session=self.session)
+        entity = await repo.create_async(
+            username=username,
+            password_clear=password_clear,
+        )
+
+        # user and its default group in one transaction
+        try:
+            repo.save(entity)
+            await AsyncGroupRepository(session=self.session).add_group_with_user(
+                name=os.environ['USER_DEFAULT_GROUP_NAME'],
+                user_id=entity.id
+            )
+            await repo.commit()
+        except SQLAlchemyError as e:
+            await repo.session.rollback()
+            raise e
+        return entity
+
+    async def update_user(self, user_id: uuid.UUID, password_clear: str) -> Optional[UserModel]:
+        repo = AsyncUserRepository(session=self.session)
+        try:
+            entity = await repo.find_by_id(user_id)
+        except sqlalchemy.exc.NoResultFound as e:
+            logger.error(str(e))
+            raise NotFoundEntityError(f"Not found user with user_id {user_id}")
+
+        entity = await repo.update(
+            entity=entity,
+            username=entity.username,
+            password_clear=password_clear
+        )
+        await publish_user_updated_async(session=self.session, user_id=entity.id, username=entity.username)
+        return entity
+
+    async def delete_user(self, user_id: uuid.UUID) -> uuid.UUID:
+        await AsyncPasswordService(session=self.session).delete_user_passwords(user_id=user_id)
+        entity_uuid = await AsyncUserRepository(session=self.session).delete_by_id(user_id=user_id)
+        await publish_user_deleted_async(session=self.session, user_id=user_id)
+        return entity_uuid
+
+    async def revoke_user_tokens(self, user_id: uuid.UUID) -> uuid.UUID:
+        """Same as UserService.revoke_user_tokens, version bump and token delete in one transaction"""
+        repo = AsyncUserRepository(session=self.session)
+        entity_uuid = await repo.increment_token_key_version(user_id=user_id)
+        await AsyncUserTokenRepository(session=self.session).delete_user_tokens(user_id=user_id)
+        try:
+            await repo.commit()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            raise e
+        await publish_user_tokens_deleted_async(session=self.session, user_id=user_id)
+        return entity_uuid
+
+    async def find_all(self) -> List[UserModel]:
+        repo = AsyncUserRepository(session=self.session)
+        entities = await repo.find_all()
+        return entities
+
+    async def find_by_username(self, username: str) -> Optional[UserModel]:
+        repo = AsyncUserRepository(session=self.session)
+        entity = await repo.find_by_username(username=username)
+        return entity
+
+
+class AsyncUserTokenService(AsyncBaseService):
+    async def create_token(self, token, user_id: uuid.UUID,
+                           expiration_date: Optional[datetime.datetime] = None) -> UserTokenModel:
+        repo = AsyncUserTokenRepository(session=self.session)
+
+        try:
+            entity = await repo.upsert(
+                token=token,
+                user_id=user_id,
+                expiration_date=expiration_date
+            )
+            if not entity:
+                # valid token with the same hash is already stored, concurrent login or a repeated one
+                entity = await repo.find_valid_by_token(token=token)
+            await repo.commit()
+        except SQLAlchemyError as e:
+            await repo.session.rollback()
+            raise e
+        return entity
+
+    async def find_valid_token(self, token: str) -> Optional[UserTokenModel]:
+        repo = AsyncUserTokenRepository(session=self.session)
+        token_entity = await repo.find_valid_by_token(token=token)
+        return token_entity
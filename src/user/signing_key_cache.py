@@ -0,0 +1,85 @@
+import collections
+import dataclasses
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+
+@dataclasses.dataclass
+class UserSigningKey:
+    user_id: uuid.UUID
+    key: str
+    key_version: int
+
+    @property
+    def stateless_key(self) -> str:
+        return self.key + "-" + str(self.key_version)
+
+
+class UserSigningKeyCache:
+    """
+    Bounded cache of JWT signing keys derived per user, keyed by username.
+    Entry has to be invalidated when user password hash or token key version changes
+    """
+
+    def __init__(self, enabled: bool, ttl_seconds: float, max_entries: int):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: collections.OrderedDict[str, tuple] = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username: str) -> Optional[UserSigningKey]:
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry and entry[0] <= time.monotonic():
+                del self._entries[username]
+                entry = None
+            if not entry:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, username: str, signing_key: UserSigningKey):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries[username] = (time.monotonic() + self.ttl_seconds, signing_key)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username: str):
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def invalidate_user(self, user_id: uuid.UUID):
+        with self._lock:
+            usernames = [username for username, (_, entry) in self._entries.items() if entry.user_id == user_id]
+            for username in usernames:
+                del self._entries[username]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+user_signing_key_cache = UserSigningKeyCache(
+    enabled=os.environ.get('USER_SIGNING_KEY_CACHE_ENABLED', 'true').lower() == 'true',
+    ttl_seconds=float(os.environ.get('USER_SIGNING_KEY_CACHE_TTL_SECONDS', 300)),
+    max_entries=int(os.environ.get('USER_SIGNING_KEY_CACHE_MAX_ENTRIES', 10_000))
+)
@@ -0,0 +1,100 @@
+import collections
+import dataclasses
+import datetime
+import hashlib
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+
+@dataclasses.dataclass
+class CachedUserToken:
+    user_id: uuid.UUID
+    token_id: Optional[uuid.UUID]
+    expiration_date: datetime.datetime
+
+
+class UserTokenCache:
+    """
+    Bounded TTL cache of valid user tokens, lets auth skip the database for tokens seen recently.
+    Entry never outlives the token expiration date. Tokens are kept as sha256 digests only.
+    """
+
+    def __init__(self, enabled: bool, ttl_seconds: float, max_entries: int):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: collections.OrderedDict[bytes, tuple] = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _cache_key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    @staticmethod
+    def _seconds_to_expiration(expiration_date: datetime.datetime) -> float:
+        now = datetime.datetime.now(expiration_date.tzinfo)
+        return (expiration_date - now).total_seconds()
+
+    def get(self, token: str) -> Optional[CachedUserToken]:
+        if not self.enabled:
+            return None
+
+        cache_key = self._cache_key(token)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry and entry[0] <= time.monotonic():
+                del self._entries[cache_key]
+                entry = None
+            if not entry:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, token: str, user_id: uuid.UUID, token_id: Optional[uuid.UUID], expiration_date: datetime.datetime):
+        if not self.enabled:
+            return
+
+        ttl_seconds = min(self.ttl_seconds, self._seconds_to_expiration(expiration_date))
+        if ttl_seconds <= 0:
+            return
+
+        with self._lock:
+            self._entries[self._cache_key(token)] = (
+                time.monotonic() + ttl_seconds,
+                CachedUserToken(user_id=user_id, token_id=token_id, expiration_date=expiration_date)
+            )
+            self._entries.move_to_end(self._cache_key(token))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token: str):
+        with self._lock:
+            self._entries.pop(self._cache_key(token), None)
+
+    def invalidate_user(self, user_id: uuid.UUID):
+        with self._lock:
+            cache_keys = [cache_key for cache_key, (_, entry) in self._entries.items() if entry.user_id == user_id]
+            for cache_key in cache_keys:
+                del self._entries[cache_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+user_token_cache = UserTokenCache(
+    enabled=os.environ.get('USER_TOKEN_CACHE_ENABLED', 'true').lower() == 'true',
+    ttl_seconds=float(os.environ.get('USER_TOKEN_CACHE_TTL_SECONDS', 60)),
+    max_entries=int(os.environ.get('USER_TOKEN_CACHE_MAX_ENTRIES', 10_000))
+)
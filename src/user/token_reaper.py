@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from src.common.db_session import Session
+from src.user.services import UserTokenService
+
+logger = logging.getLogger()
+
+
+class ExpiredTokenReaper:
+    """
+    Periodically deletes expired user tokens outside the request path
+    """
+
+    def __init__(self, enabled: bool, interval_seconds: float, batch_size: int):
+        self.enabled = enabled
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    def reap(self) -> int:
+        session = Session()
+        user_token_service = UserTokenService(session=session)
+        try:
+            deleted_count = user_token_service.delete_expired_tokens(batch_size=self.batch_size)
+        finally:
+            session.close()
+        return deleted_count
+
+    async def _run(self):
+        while True:
+            try:
+                deleted_count = await asyncio.to_thread(self.reap)
+                if deleted_count:
+                    logger.info(f"Deleted {deleted_count} expired user tokens")
+            except Exception as e:
+                logger.error(f"Expired user tokens delete error: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+expired_token_reaper = ExpiredTokenReaper(
+    enabled=os.environ.get('USER_TOKEN_REAPER_ENABLED', 'true').lower() == 'true',
+    interval_seconds=float(os.environ.get('USER_TOKEN_REAPER_INTERVAL_SECONDS', 300)),
+    batch_size=int(os.environ.get('USER_TOKEN_REAPER_BATCH_SIZE', 1000))
+)
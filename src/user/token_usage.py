@@ -0,0 +1,101 @@
+import asyncio
+import datetime
+import logging
+import os
+import threading
+import uuid
+from typing import Dict, Optional
+
+from src.common.db_session import Session
+from src.user.services import UserTokenService
+
+logger = logging.getLogger()
+
+
+class TokenUsageRecorder:
+    """
+    Collects last use of user tokens in memory and flushes them to us_user_token in periodic batched updates,
+    so a request never writes to the token table. Token used only within the last flush interval before
+    its expiration date may still expire
+    """
+
+    def __init__(self, enabled: bool, flush_interval_seconds: float, batch_size: int):
+        self.enabled = enabled
+        self.flush_interval_seconds = flush_interval_seconds
+        self.batch_size = batch_size
+        self._tokens_last_used_at: Dict[uuid.UUID, datetime.datetime] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, token_id: uuid.UUID, used_at: Optional[datetime.datetime] = None):
+        if not self.enabled:
+            return
+
+        used_at = used_at or datetime.datetime.now(datetime.timezone.utc)
+        with self._lock:
+            last_used_at = self._tokens_last_used_at.get(token_id)
+            if not last_used_at or last_used_at < used_at:
+                self._tokens_last_used_at[token_id] = used_at
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._tokens_last_used_at)
+
+    def flush(self) -> int:
+        with self._lock:
+            tokens_last_used_at, self._tokens_last_used_at = self._tokens_last_used_at, {}
+        if not tokens_last_used_at:
+            return 0
+
+        session = Session()
+        user_token_service = UserTokenService(session=session)
+        try:
+            updated_count = user_token_service.update_tokens_last_used_at(
+                tokens_last_used_at=tokens_last_used_at,
+                batch_size=self.batch_size
+            )
+        except Exception:
+            # keep usage for the next flush, newer usage recorded meanwhile wins
+            with self._lock:
+                for token_id, used_at in tokens_last_used_at.items():
+                    if token_id not in self._tokens_last_used_at:
+                        self._tokens_last_used_at[token_id] = used_at
+            raise
+        finally:
+            if session.is_active:
+                session.close()
+        return updated_count
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"User tokens usage flush error: {str(e)}")
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        try:
+            await asyncio.to_thread(self.flush)
+        except Exception as e:
+            logger.error(f"User tokens usage flush error: {str(e)}")
+
+
+token_usage_recorder = TokenUsageRecorder(
+    enabled=os.environ.get('USER_TOKEN_SLIDING_EXPIRATION_ENABLED', 'true').lower() == 'true',
+    flush_interval_seconds=float(os.environ.get('USER_TOKEN_USAGE_FLUSH_INTERVAL_SECONDS', 30)),
+    batch_size=int(os.environ.get('USER_TOKEN_USAGE_FLUSH_BATCH_SIZE', 1000))
+)
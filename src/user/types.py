@@ -4,3 +4,12 @@ import dataclasses
 @dataclasses.dataclass
 class UserJwtTokenPayload:
     username: str
+
+
+@dataclasses.dataclass
+class UserStatelessJwtTokenPayload:
+    sub: str
+    username: str
+    iat: int
+    exp: int
+    key_version: int
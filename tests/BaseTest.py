@@ -5,6 +5,8 @@ from sqlalchemy import inspect, text
 
 from src import engine
 from src.common.db_session import Session
+from src.user.signing_key_cache import user_signing_key_cache
+from src.user.token_cache import user_token_cache
 
 
 class BaseTest(TestCase):
@@ -20,6 +22,8 @@ class BaseTest(TestCase):
     @pytest.fixture(scope="function", autouse=True)
     def setup_test(self):
         self.cleanup_db()
+        user_token_cache.clear()
+        user_signing_key_cache.clear()
 
     @staticmethod
     def cleanup_db():
@@ -203,3 +203,37 @@ class ApiGroupTests(ApiBaseTest):
         assert 'Delete error' in response_json['detail']
 
 
+
+    def test_list_groups_when_master_key_used(self):
+        # given
+        headers = {
+            "X-API-KEY": os.environ['API_AUTH_MASTER_TOKEN'],
+            'Accept': 'application/json'
+        }
+
+        # when
+        response = self.test_api.get(
+            url="/group/list",
+            headers=headers
+        )
+        response_json = response.json()
+
+        # then
+        assert response.status_code == 400
+        assert 'MASTER_API_KEY usage not allowed here' in response_json['detail']
+
+    def test_list_groups_when_token_invalid(self):
+        # given
+        headers = {
+            "X-API-KEY": 'invalid-token',
+            'Accept': 'application/json'
+        }
+
+        # when
+        response = self.test_api.get(
+            url="/group/list",
+            headers=headers
+        )
+
+        # then
+        assert response.status_code == 401
@@ -56,3 +56,122 @@ class ApiToolsTests(ApiBaseTest):
         # then
         assert response.status_code == 401
         assert 'Invalid or missing API Key' == response.json()['detail']
+
+    def test_crypto_engine_diagnostics(self):
+        # given
+        API_AUTH_TOKEN = os.environ['API_AUTH_MASTER_TOKEN']
+        headers = {
+            "X-API-KEY": API_AUTH_TOKEN,
+            'Accept': 'application/json'
+        }
+
+        # when
+        response = self.test_api.get(
+            url="/diagnostics/crypto-engine",
+            headers=headers
+        )
+        response_json = response.json()
+
+        # then
+        assert response.status_code == 200
+        assert 'queue_depth' in response_json
+        assert 'avg_latency_ms' in response_json
+
+    def test_crypto_engine_diagnostics_with_user_token(self):
+        # given
+        headers = {
+            "X-API-KEY": 'abcd',
+            'Accept': 'application/json'
+        }
+
+        # when
+        response = self.test_api.get(
+            url="/diagnostics/crypto-engine",
+            headers=headers
+        )
+
+        # then
+        assert response.status_code == 401
+
+    def test_password_encryption_diagnostics(self):
+        # given
+        API_AUTH_TOKEN = os.environ['API_AUTH_MASTER_TOKEN']
+        headers = {
+            "X-API-KEY": API_AUTH_TOKEN,
+            'Accept': 'application/json'
+        }
+
+        # when
+        response = self.test_api.get(
+            url="/diagnostics/password-encryption",
+            headers=headers
+        )
+        response_json = response.json()
+
+        # then
+        assert response.status_code == 200
+        assert response_json['current_server_side_algo'] == 'fernet'
+        assert response_json['passwords'] == []
+        assert 'pending' in response_json['upgrade']
+
+    def test_kdf_diagnostics(self):
+        # given
+        API_AUTH_TOKEN = os.environ['API_AUTH_MASTER_TOKEN']
+        headers = {
+            "X-API-KEY": API_AUTH_TOKEN,
+            'Accept': 'application/json'
+        }
+
+        # when
+        response = self.test_api.get(
+            url="/diagnostics/kdf",
+            headers=headers
+        )
+        response_json = response.json()
+
+        # then
+        assert response.status_code == 200
+        assert response_json['source'] == 'env'
+        assert response_json['user_auth_iterations'] == int(os.environ['USER_AUTH_HASH_N_ITERATIONS'])
+
+    def test_db_pool_diagnostics(self):
+        # given
+        API_AUTH_TOKEN = os.environ['API_AUTH_MASTER_TOKEN']
+        headers = {
+            "X-API-KEY": API_AUTH_TOKEN,
+            'Accept': 'application/json'
+        }
+
+        # when
+        response = self.test_api.get(
+            url="/diagnostics/db-pool",
+            headers=headers
+        )
+        response_json = response.json()
+
+        # then
+        assert response.status_code == 200
+        assert response_json['pool_size'] == int(os.environ.get('DB_POOL_SIZE', 5))
+        assert 'avg_checkout_time_ms' in response_json
+        assert response_json['checked_out'] >= 0
+
+    def test_async_db_pool_diagnostics(self):
+        # given
+        API_AUTH_TOKEN = os.environ['API_AUTH_MASTER_TOKEN']
+        headers = {
+            "X-API-KEY": API_AUTH_TOKEN,
+            'Accept': 'application/json'
+        }
+
+        # when
+        response = self.test_api.get(
+            url="/diagnostics/db-pool-async",
+            headers=headers
+        )
+        response_json = response.json()
+
+        # then
+        assert response.status_code == 200
+        assert response_json['pool_size'] == int(os.environ.get('DB_POOL_SIZE', 5))
+        assert 'avg_checkout_time_ms' in response_json
+        assert response_json['checked_out'] >= 0
@@ -1,7 +1,8 @@
 import os
 import uuid
+from unittest import mock
 
-from src.user.services import UserService
+from src.user.services import UserJwtTokenService, UserService, UserTokenService
 from tests.api.ApiBaseTests import ApiBaseTest
 
 
@@ -413,4 +414,48 @@ class ApiUsersTest(ApiBaseTest):
         # then
         assert len(user_entities) == 0
         assert response.status_code == 400
-        assert 'user delete error' in response_json['detail'].lower()
\ No newline at end of file
+        assert 'user delete error' in response_json['detail'].lower()
+
+    def test_stateless_login_and_revoke_tokens(self):
+        # given - create user
+        username = 'test'
+        password = 'test'
+        service = UserService(session=self.session)
+        user_entity = service.create_user(
+            username=username,
+            password_clear=password
+        )
+        master_headers = {
+            "X-API-KEY": os.environ['API_AUTH_MASTER_TOKEN'],
+            'Accept': 'application/json'
+        }
+
+        with mock.patch.object(UserJwtTokenService, 'STATELESS_ENABLED', True):
+            # when - login, token is not stored
+            login_response = self.test_api.post(
+                url="/user/login",
+                headers=master_headers,
+                json=dict(username=username, password=password)
+            )
+            user_headers = {
+                "X-API-KEY": login_response.json()['token'],
+                'Accept': 'application/json'
+            }
+            list_response = self.test_api.get(url="/group/list", headers=user_headers)
+
+            # then
+            assert login_response.status_code == 200
+            assert list_response.status_code == 200
+            assert UserTokenService(session=self.session).get_all() == []
+
+            # when - revoke user tokens
+            revoke_response = self.test_api.post(
+                url="/user/revoke_tokens",
+                headers=master_headers,
+                params=dict(user_id=str(user_entity.id))
+            )
+            list_after_revoke_response = self.test_api.get(url="/group/list", headers=user_headers)
+
+            # then
+            assert revoke_response.json()['id'] == str(user_entity.id)
+            assert list_after_revoke_response.status_code == 401
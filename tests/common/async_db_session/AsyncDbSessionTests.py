@@ -0,0 +1,54 @@
+import os
+from unittest import mock
+
+from src.api.auth import _get_user_principal_async
+from src.common.async_db_session import ASYNC_DB_DRIVER, get_async_db_uri, get_async_session_factory
+from src.group.services import AsyncGroupService
+from src.user.services import AsyncUserTokenService, UserJwtTokenService, UserService
+from src.user.signing_key_cache import user_signing_key_cache
+from tests.BaseTest import BaseTest
+from tests.test_utils.async_db import run_async
+from tests.test_utils.create_db_resources import create_test_user_and_get_token
+
+
+class AsyncDbSessionTests(BaseTest):
+    def test_async_db_uri_uses_psycopg3_driver(self):
+        # when
+        async_db_uri = get_async_db_uri()
+
+        # then
+        assert async_db_uri.startswith(ASYNC_DB_DRIVER + '://')
+        assert async_db_uri.split('://', 1)[1] == os.environ['DB_URI'].split('://', 1)[1]
+
+    def test_async_token_and_groups_lookup(self):
+        # given
+        user_id, user_token = create_test_user_and_get_token(session=self.session)
+
+        async def find_token_and_groups():
+            async with get_async_session_factory()() as session:
+                token_entity = await AsyncUserTokenService(session=session).find_valid_token(token=user_token)
+                groups = await AsyncGroupService(session=session).find_user_groups(user_id=user_id)
+            return token_entity, groups
+
+        # when
+        token_entity, groups = run_async(find_token_and_groups())
+
+        # then
+        assert token_entity.user_id == user_id
+        assert [group.name for group in groups] == [os.environ['USER_DEFAULT_GROUP_NAME']]
+
+    def test_async_stateless_token_principal(self):
+        # given
+        with mock.patch.object(UserJwtTokenService, 'STATELESS_ENABLED', True):
+            user_id = UserService(session=self.session).create_user(username='test', password_clear='test').id
+            user_token = UserJwtTokenService(session=self.session).create(username='test')
+            user_signing_key_cache.clear()
+
+            # when - signing key fetched on the async session
+            principal = run_async(_get_user_principal_async(api_key=user_token))
+            invalid_principal = run_async(_get_user_principal_async(api_key=user_token + 'x'))
+
+        # then
+        assert principal.user_id == user_id
+        assert principal.token_id is None
+        assert invalid_principal is None
@@ -0,0 +1,98 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.common.async_db_session import get_async_db_uri
+from src.common.db_pool import DbPoolSettings, InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool, \
+    async_db_pool_metrics, db_pool_metrics, listen_pool_events
+from tests.BaseTest import BaseTest
+from tests.test_utils.async_db import run_async
+
+
+class DbPoolTests(BaseTest):
+    def test_checkout_time_overflow_and_timeout_recorded(self):
+        # given
+        settings = DbPoolSettings(pool_size=1, max_overflow=1, pool_timeout=0.1, pool_recycle=1800,
+                                  pool_pre_ping=True, connect_timeout=10)
+        engine = create_engine(os.environ['DB_URI'], poolclass=InstrumentedQueuePool, **settings.engine_kwargs())
+        listen_pool_events(engine, metrics=db_pool_metrics)
+        db_pool_metrics.reset()
+
+        # when - pool connection, overflow connection, then no connection left
+        connection1 = engine.connect()
+        connection2 = engine.connect()
+        connection2.execute(text('SELECT 1'))
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+        stats = db_pool_metrics.stats(pool=engine.pool, settings=settings)
+        connection1.close()
+        connection2.close()
+        idle_stats = db_pool_metrics.stats(pool=engine.pool, settings=settings)
+        engine.dispose()
+
+        # then
+        assert stats.checkouts == 2
+        assert stats.overflow_connects == 1
+        assert stats.timeouts == 1
+        assert stats.checked_out == 2
+        assert stats.overflow == 1
+        assert stats.max_checkout_time_ms >= 100
+        assert stats.connects == 2
+        assert idle_stats.checked_out == 0
+        assert idle_stats.idle == 1
+
+    def test_overflow_counted_once_per_overflow_connection(self):
+        # given
+        settings = DbPoolSettings(pool_size=1, max_overflow=1, pool_timeout=0.1, pool_recycle=1800,
+                                  pool_pre_ping=True, connect_timeout=10)
+        engine = create_engine(os.environ['DB_URI'], poolclass=InstrumentedQueuePool, **settings.engine_kwargs())
+        listen_pool_events(engine, metrics=db_pool_metrics)
+        db_pool_metrics.reset()
+
+        # when - the pooled connection is checked out again while the overflow connection is held
+        overflow_connection = engine.connect()
+        for _ in range(3):
+            with engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+        stats = db_pool_metrics.stats(pool=engine.pool, settings=settings)
+        overflow_connection.close()
+        engine.dispose()
+
+        # then
+        assert stats.checkouts == 4
+        assert stats.connects == 2
+        assert stats.overflow_connects == 1
+
+    def test_async_pool_recorded(self):
+        # given
+        settings = DbPoolSettings(pool_size=1, max_overflow=1, pool_timeout=0.1, pool_recycle=1800,
+                                  pool_pre_ping=True, connect_timeout=10)
+        engine_kwargs = settings.engine_kwargs()
+        engine_kwargs['connect_args'] = dict(engine_kwargs['connect_args'], client_encoding='utf8')
+        engine = create_async_engine(get_async_db_uri(), poolclass=InstrumentedAsyncAdaptedQueuePool, **engine_kwargs)
+        listen_pool_events(engine.sync_engine, metrics=async_db_pool_metrics)
+        async_db_pool_metrics.reset()
+
+        async def checkout_until_timeout():
+            connection1 = await engine.connect()
+            connection2 = await engine.connect()
+            await connection2.execute(text('SELECT 1'))
+            with pytest.raises(exc.TimeoutError):
+                await engine.connect()
+            stats = async_db_pool_metrics.stats(pool=engine.sync_engine.pool, settings=settings)
+            await connection1.close()
+            await connection2.close()
+            await engine.dispose()
+            return stats
+
+        # when
+        stats = run_async(checkout_until_timeout())
+
+        # then
+        assert stats.checkouts == 2
+        assert stats.connects == 2
+        assert stats.overflow_connects == 1
+        assert stats.timeouts == 1
+        assert stats.max_checkout_time_ms >= 100
@@ -0,0 +1,52 @@
+import json
+import os
+import threading
+import uuid
+
+from src.common.invalidation_bus import CacheInvalidationBus
+from tests.BaseTest import BaseTest
+
+
+def create_bus(channel: str) -> CacheInvalidationBus:
+    return CacheInvalidationBus(enabled=True, channel=channel, db_uri=os.environ['DB_URI'], poll_timeout_seconds=0.1)
+
+
+class CacheInvalidationBusTests(BaseTest):
+    def test_event_delivered_to_other_worker(self):
+        # given
+        channel = f'test_invalidation_{uuid.uuid4().hex}'
+        publisher_bus = create_bus(channel=channel)
+        subscriber_bus = create_bus(channel=channel)
+        published_payloads = []
+        received_payloads = []
+        received_event = threading.Event()
+        publisher_bus.subscribe('user_deleted', published_payloads.append)
+        subscriber_bus.subscribe('user_deleted', lambda payload: (received_payloads.append(payload),
+                                                                  received_event.set()))
+        subscriber_bus.start()
+        assert subscriber_bus.listening.wait(timeout=5)
+
+        # when
+        try:
+            publisher_bus.publish(session=self.session, event='user_deleted', payload={'user_id': 'user'})
+            is_received = received_event.wait(timeout=5)
+        finally:
+            subscriber_bus.stop()
+
+        # then
+        assert is_received
+        assert published_payloads == [{'user_id': 'user'}]
+        assert received_payloads == [{'user_id': 'user'}]
+
+    def test_own_event_not_applied_twice(self):
+        # given
+        bus = create_bus(channel='test_invalidation')
+        payloads = []
+        bus.subscribe('user_deleted', payloads.append)
+        message = json.dumps({'event': 'user_deleted', 'origin_id': bus.origin_id, 'payload': {'user_id': 'user'}})
+
+        # when
+        bus._handle_notification(message)
+
+        # then
+        assert payloads == []
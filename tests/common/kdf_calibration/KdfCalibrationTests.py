@@ -0,0 +1,66 @@
+from src.common.kdf_calibration import calculate_iterations, kdf_calibration
+from src.password.cryptography import get_current_server_side_iterations
+from src.user.repositories import UserRepository
+from tests.BaseTest import BaseTest
+
+
+class KdfCalibrationTests(BaseTest):
+    def tearDown(self):
+        kdf_calibration.reset()
+        super().tearDown()
+
+    def test_calculate_iterations_for_target_latency(self):
+        # when
+        iterations = calculate_iterations(
+            iterations_per_sec=3_000_000,
+            target_ms=250,
+            min_iterations=600_000,
+            max_iterations=5_000_000
+        )
+
+        # then
+        assert iterations == 750_000
+
+    def test_calculate_iterations_not_below_security_floor(self):
+        # when - slow host
+        iterations = calculate_iterations(
+            iterations_per_sec=100_000,
+            target_ms=250,
+            min_iterations=600_000,
+            max_iterations=5_000_000
+        )
+
+        # then
+        assert iterations == 600_000
+
+    def test_calculate_iterations_not_above_max(self):
+        # when - fast host
+        iterations = calculate_iterations(
+            iterations_per_sec=100_000_000,
+            target_ms=250,
+            min_iterations=600_000,
+            max_iterations=5_000_000
+        )
+
+        # then
+        assert iterations == 5_000_000
+
+    def test_calibrated_iterations_used_for_new_writes(self):
+        # given
+        env_server_side_iterations = get_current_server_side_iterations()
+        env_user_auth_iterations = UserRepository.get_auth_hash_iterations()
+
+        # when
+        result = kdf_calibration.calibrate()
+
+        # then
+        assert result.server_side_iterations >= kdf_calibration.min_iterations
+        assert get_current_server_side_iterations() == result.server_side_iterations
+        assert UserRepository.get_auth_hash_iterations() == result.user_auth_iterations
+
+        # when - back to env values
+        kdf_calibration.reset()
+
+        # then
+        assert get_current_server_side_iterations() == env_server_side_iterations
+        assert UserRepository.get_auth_hash_iterations() == env_user_auth_iterations
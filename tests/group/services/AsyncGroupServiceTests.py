@@ -0,0 +1,58 @@
+import pytest
+
+from src.common.async_db_session import get_async_session_factory
+from src.group.exceptions import GroupDeleteNotAllowedError, GroupUpdateNotAllowedError
+from src.group.repositories import GroupRepository
+from src.group.services import AsyncGroupService
+from src.password.repositories import PasswordRepository
+from tests.BaseTest import BaseTest
+from tests.test_utils.async_db import run_async
+from tests.test_utils.create_db_resources import create_user, create_group_with_user, create_password
+
+
+async def _call_group_service(method_name: str, **kwargs):
+    async with get_async_session_factory()() as session:
+        return await getattr(AsyncGroupService(session=session), method_name)(**kwargs)
+
+
+class AsyncGroupServiceTests(BaseTest):
+    def test_create_and_update_group(self):
+        # given
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+        other_user_id = create_user(db_session=self.session, username='other', password_clear='test').id
+
+        # when
+        group_entity = run_async(_call_group_service('create_group_with_user', name='old_name', user_id=user_id))
+        updated_group_entity = run_async(_call_group_service('update', group_id=group_entity.id,
+                                                             new_name='new_name', user_id=user_id))
+
+        # then
+        assert updated_group_entity.name == 'new_name'
+        assert 'new_name' in [group.name for group in GroupRepository(session=self.session).find_groups_by_user_id(
+            user_id=user_id
+        )]
+        with pytest.raises(GroupUpdateNotAllowedError):
+            run_async(_call_group_service('update', group_id=group_entity.id, new_name='other',
+                                          user_id=other_user_id))
+
+    def test_delete_group_moves_passwords_to_default_group(self):
+        # given
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+        other_user_id = create_user(db_session=self.session, username='other', password_clear='test').id
+        group_id = create_group_with_user(session=self.session, user_id=user_id, group_name='new').id
+        password_id = create_password(session=self.session, user_id=user_id, group_ids=[group_id]).id
+        user_default_group = GroupRepository(session=self.session).find_user_default_group(user_id=user_id)
+
+        # when
+        with pytest.raises(GroupDeleteNotAllowedError):
+            run_async(_call_group_service('delete', group_id=group_id, user_id=other_user_id))
+        with pytest.raises(GroupDeleteNotAllowedError):
+            run_async(_call_group_service('delete', group_id=user_default_group.id, user_id=user_id))
+        deleted_group_id = run_async(_call_group_service('delete', group_id=group_id, user_id=user_id))
+        self.session.expire_all()
+
+        # then
+        assert deleted_group_id == group_id
+        assert GroupRepository(session=self.session).get_by_id(group_id) is None
+        password_entity = PasswordRepository(session=self.session).get_by_id(password_id)
+        assert [group.id for group in password_entity.groups] == [user_default_group.id]
@@ -0,0 +1,46 @@
+import pytest
+
+from src.password.blob import PasswordBlob, pack_blob_v2, unpack_blob_v2, is_blob_v2
+from src.password.exceptions import PasswordBlobFormatError
+from tests.BaseTest import BaseTest
+
+
+class PasswordBlobTests(BaseTest):
+    def test_pack_and_unpack(self):
+        # given
+        blob = PasswordBlob(algo_id=2, salt=b's' * 32, iterations=600_000, nonce=b'n' * 12, ciphertext=b'c' * 40)
+
+        # when
+        packed = pack_blob_v2(blob)
+        unpacked = unpack_blob_v2(packed)
+
+        # then
+        assert is_blob_v2(packed)
+        assert len(packed) == 1 + 1 + 1 + 32 + 4 + 1 + 12 + 40
+        assert unpacked == blob
+
+    def test_pack_and_unpack_without_salt_and_nonce(self):
+        # given
+        blob = PasswordBlob(algo_id=1, salt=b'', iterations=1_000, nonce=b'', ciphertext=b'c' * 10)
+
+        # when
+        unpacked = unpack_blob_v2(pack_blob_v2(blob))
+
+        # then
+        assert unpacked == blob
+
+    def test_legacy_blob_is_not_v2(self):
+        # given
+        legacy_blob = b'c2FsdHNhbHRzYWx0'
+
+        # then
+        assert not is_blob_v2(legacy_blob)
+
+    def test_unpack_truncated_blob(self):
+        # given
+        packed = pack_blob_v2(PasswordBlob(algo_id=2, salt=b's' * 32, iterations=1_000, nonce=b'n' * 12,
+                                           ciphertext=b''))
+
+        # when
+        with pytest.raises(PasswordBlobFormatError):
+            unpack_blob_v2(packed[:20])
@@ -0,0 +1,190 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from src.password.crypto_engine import CryptoEngine, EXECUTOR_TYPE_PROCESS
+from tests.BaseTest import BaseTest
+
+
+class CryptoEngineTests(BaseTest):
+    def test_encrypt_and_decrypt(self):
+        # given
+        engine = CryptoEngine(max_workers=2)
+        password = 'test'
+        master_password = 'secret_master_password'
+
+        # when
+        password_encrypt = engine.password_encrypt(message=password.encode(), additional_pepper=master_password,
+                                                   iterations=1_000)
+        password_decrypt = engine.password_decrypt(token=password_encrypt, password_to_decrypt=master_password)
+        engine.shutdown()
+
+        # then
+        assert password_encrypt != password.encode()
+        assert password_decrypt.decode() == password
+
+    def test_encrypt_and_decrypt_async(self):
+        # given
+        engine = CryptoEngine(max_workers=2)
+        password = 'test'
+        master_password = 'secret_master_password'
+
+        async def encrypt_and_decrypt():
+            token = await engine.password_encrypt_async(message=password.encode(),
+                                                        additional_pepper=master_password, iterations=1_000)
+            return await engine.password_decrypt_async(token=token, password_to_decrypt=master_password)
+
+        # when
+        password_decrypt = asyncio.run(encrypt_and_decrypt())
+        engine.shutdown()
+
+        # then
+        assert password_decrypt.decode() == password
+
+    def test_encrypt_async_does_not_stall_event_loop(self):
+        # given
+        engine = CryptoEngine(max_workers=1)
+        tick_gaps = []
+
+        async def ticker(done: asyncio.Event):
+            last_tick = time.perf_counter()
+            while not done.is_set():
+                await asyncio.sleep(0.005)
+                now = time.perf_counter()
+                tick_gaps.append(now - last_tick)
+                last_tick = now
+
+        async def encrypt_next_to_ticker():
+            done = asyncio.Event()
+            ticker_task = asyncio.create_task(ticker(done))
+            started_at = time.perf_counter()
+            await engine.password_encrypt_async(message=b'test', additional_pepper='secret_master_password',
+                                                iterations=600_000)
+            encrypt_time = time.perf_counter() - started_at
+            done.set()
+            await ticker_task
+            return encrypt_time
+
+        # when
+        encrypt_time = asyncio.run(encrypt_next_to_ticker())
+        engine.shutdown()
+
+        # then - the loop keeps ticking while the key is derived
+        assert len(tick_gaps) > 1
+        assert max(tick_gaps) < encrypt_time / 2
+
+    def test_encrypt_and_decrypt_with_process_pool(self):
+        # given
+        engine = CryptoEngine(executor_type=EXECUTOR_TYPE_PROCESS, max_workers=1)
+        password = 'test'
+        master_password = 'secret_master_password'
+
+        # when
+        password_encrypt = engine.password_encrypt(message=password.encode(), additional_pepper=master_password,
+                                                   iterations=1_000)
+        password_decrypt = engine.password_decrypt(token=password_encrypt, password_to_decrypt=master_password)
+        engine.shutdown()
+
+        # then
+        assert password_decrypt.decode() == password
+
+    def test_decrypt_many_keeps_input_order(self):
+        # given
+        engine = CryptoEngine(max_workers=2)
+        master_password = 'secret_master_password'
+        passwords = [f'password{i}' for i in range(5)]
+        tokens = [
+            engine.password_encrypt(message=password.encode(), additional_pepper=master_password, iterations=1_000)
+            for password in passwords
+        ]
+
+        # when
+        passwords_decrypted = engine.password_decrypt_many(
+            items=[(token, master_password, 'fernet') for token in tokens],
+            concurrency=2
+        )
+        engine.shutdown()
+
+        # then
+        assert [password.decode() for password in passwords_decrypted] == passwords
+
+    def test_decrypt_many_async_keeps_input_order(self):
+        # given
+        engine = CryptoEngine(max_workers=2)
+        master_password = 'secret_master_password'
+        passwords = [f'password{i}' for i in range(5)]
+        tokens = [
+            engine.password_encrypt(message=password.encode(), additional_pepper=master_password, iterations=1_000)
+            for password in passwords
+        ]
+
+        # when
+        passwords_decrypted = asyncio.run(engine.password_decrypt_many_async(
+            items=[(token, master_password, 'fernet') for token in tokens],
+            concurrency=2
+        ))
+        engine.shutdown()
+
+        # then
+        assert [password.decode() for password in passwords_decrypted] == passwords
+
+    @pytest.mark.skipif((os.cpu_count() or 1) < 2, reason='parallel speedup needs at least 2 CPUs')
+    def test_decrypt_many_runs_in_parallel(self):
+        # given
+        workers = min(os.cpu_count(), 4)
+        engine = CryptoEngine(max_workers=workers)
+        master_password = 'secret_master_password'
+        token = engine.password_encrypt(message=b'test', additional_pepper=master_password, iterations=300_000)
+        started_at = time.perf_counter()
+        engine.password_decrypt(token=token, password_to_decrypt=master_password)
+        single_decrypt_time = time.perf_counter() - started_at
+
+        # when
+        started_at = time.perf_counter()
+        passwords_decrypted = engine.password_decrypt_many(items=[(token, master_password, 'fernet')] * workers)
+        decrypt_many_time = time.perf_counter() - started_at
+        engine.shutdown()
+
+        # then - the thread pool uses more than one core
+        assert passwords_decrypted == [b'test'] * workers
+        assert decrypt_many_time < workers * single_decrypt_time * 0.75
+
+    def test_decrypt_many_when_empty(self):
+        # given
+        engine = CryptoEngine(max_workers=2)
+
+        # when
+        passwords_decrypted = engine.password_decrypt_many(items=[])
+
+        # then
+        assert passwords_decrypted == []
+
+    def test_stats(self):
+        # given
+        engine = CryptoEngine(max_workers=1)
+        master_password = 'secret_master_password'
+
+        # when
+        token = engine.password_encrypt(message=b'test', additional_pepper=master_password, iterations=1_000)
+        try:
+            engine.password_decrypt(token=token, password_to_decrypt='wrong_master_password')
+        except Exception:
+            pass
+        stats = engine.stats()
+        engine.shutdown()
+
+        # then
+        assert stats.submitted == 2
+        assert stats.completed == 1
+        assert stats.failed == 1
+        assert stats.in_flight == 0
+        assert stats.queue_depth == 0
+        assert stats.avg_latency_ms > 0
+        assert stats.max_latency_ms >= stats.avg_latency_ms
+
+    def test_unknown_executor_type(self):
+        # when
+        with self.assertRaises(ValueError):
+            CryptoEngine(executor_type='gpu')
@@ -0,0 +1,70 @@
+import os
+import secrets
+from base64 import urlsafe_b64encode as b64e
+
+import pytest
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from src.password.cryptography import CryptographyAesGcm, CryptographyChaCha20Poly1305, CryptographyFernet, \
+    SERVER_SIDE_CIPHERS, get_server_side_cipher
+from tests.BaseTest import BaseTest
+
+
+class CryptographyAeadTests(BaseTest):
+    def test_encrypt_and_decrypt(self):
+        # given
+        iterations = 480_000
+        password = 'test'
+        master_password = 'secret_master_password'
+
+        for cipher in [CryptographyAesGcm(), CryptographyChaCha20Poly1305()]:
+            # when
+            password_encrypt = cipher.password_encrypt(message=password.encode(), additional_pepper=master_password,
+                                                       iterations=iterations)
+            password_decrypt = cipher.password_decrypt(token=password_encrypt, password_to_decrypt=master_password)
+
+            # then
+            assert password_encrypt != password.encode()
+            assert password_decrypt.decode() == password
+
+    def test_decrypt_with_wrong_master_password(self):
+        # given
+        cipher = CryptographyChaCha20Poly1305()
+        password_encrypt = cipher.password_encrypt(message=b'test', additional_pepper='secret', iterations=1_000)
+
+        # when
+        with pytest.raises(InvalidTag):
+            cipher.password_decrypt(token=password_encrypt, password_to_decrypt='wrong_secret')
+
+    def test_aead_blob_smaller_than_fernet(self):
+        # given
+        message = b'x' * 256
+
+        # when
+        fernet_blob = CryptographyFernet().password_encrypt(message=message, additional_pepper='secret',
+                                                            iterations=1_000)
+        aesgcm_blob = CryptographyAesGcm().password_encrypt(message=message, additional_pepper='secret',
+                                                            iterations=1_000)
+
+        # then
+        assert len(aesgcm_blob) < len(fernet_blob)
+
+    def test_registered_server_side_ciphers(self):
+        # then
+        assert set(SERVER_SIDE_CIPHERS.keys()) == {'fernet', 'aes-256-gcm', 'chacha20-poly1305', 'envelope-aesgcm'}
+        assert isinstance(get_server_side_cipher('AES-256-GCM'), CryptographyAesGcm)
+
+    def test_decrypt_legacy_blob(self):
+        # given - base64 blob in the format written before v2
+        cipher = CryptographyAesGcm()
+        iterations = 1_000
+        salt, nonce = secrets.token_bytes(32), secrets.token_bytes(12)
+        key = cipher._derive_key(('secret' + os.environ['PASSWORD_ENCRYPT_PEPPER']).encode(), salt, iterations)
+        legacy_blob = b64e(salt + iterations.to_bytes(4, 'big') + nonce + AESGCM(key).encrypt(nonce, b'test', None))
+
+        # when
+        password_decrypt = cipher.password_decrypt(token=legacy_blob, password_to_decrypt='secret')
+
+        # then
+        assert password_decrypt == b'test'
@@ -0,0 +1,73 @@
+import pytest
+from cryptography.exceptions import InvalidTag
+
+from src.password.cryptography import CryptographyEnvelopeAesGcm, get_server_side_cipher, CryptographyFernet
+from src.password.exceptions import PasswordAlgoNotSupportedError
+from src.password.key_cache import data_key_cache
+from tests.BaseTest import BaseTest
+
+
+class CryptographyEnvelopeAesGcmTests(BaseTest):
+    def setUp(self):
+        super().setUp()
+        data_key_cache.clear()
+
+    def test_encrypt_and_decrypt(self):
+        # given
+        crypt_envelope = CryptographyEnvelopeAesGcm()
+        iterations = 480_000
+        password = 'test'
+        master_password = 'secret_master_password'
+
+        # when - encrypt
+        password_encrypt = crypt_envelope.password_encrypt(message=password.encode(),
+                                                           additional_pepper=master_password, iterations=iterations)
+
+        # then
+        assert isinstance(password_encrypt, bytes)
+        assert password_encrypt != password.encode()
+
+        # when - decrypt
+        password_decrypt = crypt_envelope.password_decrypt(token=password_encrypt, password_to_decrypt=master_password)
+
+        # then
+        assert password_decrypt.decode() == password
+
+    def test_data_key_derived_once_per_user_secret(self):
+        # given
+        crypt_envelope = CryptographyEnvelopeAesGcm()
+        iterations = 480_000
+
+        # when
+        token1 = crypt_envelope.password_encrypt(message=b'password1', additional_pepper='user1', iterations=iterations)
+        token2 = crypt_envelope.password_encrypt(message=b'password2', additional_pepper='user1', iterations=iterations)
+        crypt_envelope.password_encrypt(message=b'password3', additional_pepper='user2', iterations=iterations)
+
+        # then - one cached key per user secret, records still have own nonce
+        assert len(data_key_cache) == 2
+        assert token1 != token2
+        assert crypt_envelope.password_decrypt(token=token2, password_to_decrypt='user1') == b'password2'
+
+    def test_decrypt_with_wrong_secret(self):
+        # given
+        crypt_envelope = CryptographyEnvelopeAesGcm()
+        password_encrypt = crypt_envelope.password_encrypt(message=b'test', additional_pepper='user1',
+                                                           iterations=1_000)
+
+        # when
+        with pytest.raises(InvalidTag):
+            crypt_envelope.password_decrypt(token=password_encrypt, password_to_decrypt='user2')
+
+    def test_get_server_side_cipher(self):
+        # when
+        fernet_cipher = get_server_side_cipher('Fernet')
+        envelope_cipher = get_server_side_cipher('envelope-aesgcm')
+
+        # then
+        assert isinstance(fernet_cipher, CryptographyFernet)
+        assert isinstance(envelope_cipher, CryptographyEnvelopeAesGcm)
+
+    def test_get_server_side_cipher_not_supported(self):
+        # when
+        with pytest.raises(PasswordAlgoNotSupportedError):
+            get_server_side_cipher('rot13')
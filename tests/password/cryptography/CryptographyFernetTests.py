@@ -1,6 +1,13 @@
 import os
+import secrets
+from base64 import urlsafe_b64encode as b64e, urlsafe_b64decode as b64d
 
-from src.password.cryptography import CryptographyFernet
+import pytest
+from cryptography.fernet import Fernet
+
+from src.password.blob import is_blob_v2
+from src.password.cryptography import CryptographyFernet, CryptographyAesGcm
+from src.password.exceptions import PasswordBlobFormatError
 from tests.api.ApiBaseTests import ApiBaseTest
 
 
@@ -83,3 +90,38 @@ class CryptographyFernetTests(ApiBaseTest):
         assert password_decrypt
         assert isinstance(password_decrypt, bytes)
         assert password_decrypt.decode() == password
+
+    def test_encrypt_writes_v2_blob(self):
+        # given
+        crypt_fernet = CryptographyFernet()
+
+        # when
+        password_encrypt = crypt_fernet.password_encrypt(message=b'test', additional_pepper='secret', iterations=1_000)
+
+        # then
+        assert is_blob_v2(password_encrypt)
+
+    def test_decrypt_legacy_blob(self):
+        # given - blob in the format written before v2
+        crypt_fernet = CryptographyFernet()
+        master_password = 'secret_master_password'
+        iterations = 1_000
+        salt = secrets.token_bytes(32)
+        key = crypt_fernet._derive_key((master_password + os.environ['PASSWORD_ENCRYPT_PEPPER']).encode(), salt,
+                                       iterations)
+        legacy_blob = b64e(salt + iterations.to_bytes(4, 'big') + b64d(Fernet(key).encrypt(b'test')))
+
+        # when
+        password_decrypt = crypt_fernet.password_decrypt(token=legacy_blob, password_to_decrypt=master_password)
+
+        # then
+        assert password_decrypt == b'test'
+
+    def test_decrypt_blob_of_other_algo(self):
+        # given
+        password_encrypt = CryptographyAesGcm().password_encrypt(message=b'test', additional_pepper='secret',
+                                                                 iterations=1_000)
+
+        # when
+        with pytest.raises(PasswordBlobFormatError):
+            CryptographyFernet().password_decrypt(token=password_encrypt, password_to_decrypt='secret')
@@ -0,0 +1,105 @@
+import datetime
+import time
+import uuid
+
+from src.password.crypto_engine import crypto_engine
+from src.password.decrypted_cache import DecryptedPasswordCache, password_decrypted_cache
+from src.password.services import PasswordService
+from src.password.types import PasswordDTO
+from tests.BaseTest import BaseTest
+from tests.test_utils.create_db_resources import create_user, create_password
+
+
+class DecryptedPasswordCacheTests(BaseTest):
+    def setUp(self):
+        super().setUp()
+        password_decrypted_cache.clear()
+
+    def test_cache_hit_only_for_same_updated_on(self):
+        # given
+        cache = DecryptedPasswordCache(enabled=True, ttl_seconds=60, max_entries=10, max_bytes_per_user=1024)
+        password_id = uuid.uuid4()
+        updated_on = datetime.datetime.now()
+        cache.set(password_id=password_id, updated_on=updated_on, user_id=uuid.uuid4(), value=b'value')
+
+        # when
+        value = cache.get(password_id=password_id, updated_on=updated_on)
+        value_after_update = cache.get(password_id=password_id, updated_on=updated_on + datetime.timedelta(seconds=1))
+
+        # then
+        assert value == b'value'
+        assert value_after_update is None
+        assert cache.stats().hits == 1
+        assert cache.stats().misses == 1
+
+    def test_cache_entry_expires(self):
+        # given
+        cache = DecryptedPasswordCache(enabled=True, ttl_seconds=0.01, max_entries=10, max_bytes_per_user=1024)
+        password_id = uuid.uuid4()
+        updated_on = datetime.datetime.now()
+        cache.set(password_id=password_id, updated_on=updated_on, user_id=uuid.uuid4(), value=b'value')
+
+        # when
+        time.sleep(0.02)
+
+        # then
+        assert cache.get(password_id=password_id, updated_on=updated_on) is None
+        assert len(cache) == 0
+
+    def test_cache_per_user_memory_cap(self):
+        # given
+        cache = DecryptedPasswordCache(enabled=True, ttl_seconds=60, max_entries=10, max_bytes_per_user=10)
+        user_id = uuid.uuid4()
+        other_user_id = uuid.uuid4()
+        updated_on = datetime.datetime.now()
+        first_password_id, second_password_id, other_password_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        cache.set(password_id=other_password_id, updated_on=updated_on, user_id=other_user_id, value=b'x' * 10)
+        cache.set(password_id=first_password_id, updated_on=updated_on, user_id=user_id, value=b'x' * 6)
+
+        # when
+        cache.set(password_id=second_password_id, updated_on=updated_on, user_id=user_id, value=b'x' * 6)
+
+        # then - oldest entry of the same user evicted, other user untouched
+        assert cache.get(password_id=first_password_id, updated_on=updated_on) is None
+        assert cache.get(password_id=second_password_id, updated_on=updated_on) is not None
+        assert cache.get(password_id=other_password_id, updated_on=updated_on) is not None
+
+    def test_repeated_password_list_not_decrypted_again(self):
+        # given
+        password_service = PasswordService(session=self.session)
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+        for password_clear in ['password1', 'password2']:
+            create_password(session=self.session, user_id=user_id, name=password_clear, password=password_clear)
+        password_service.get_user_passwords_dtos(user_id=user_id)
+        submitted_before = crypto_engine.stats().submitted
+
+        # when
+        user_passwords_dtos = password_service.get_user_passwords_dtos(user_id=user_id)
+
+        # then - no crypto work, values from cache
+        assert crypto_engine.stats().submitted == submitted_before
+        assert sorted(dto.password_encrypted for dto in user_passwords_dtos) == [b'password1', b'password2']
+
+    def test_cache_invalidated_on_password_update(self):
+        # given
+        password_service = PasswordService(session=self.session)
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+        password_entity = create_password(session=self.session, user_id=user_id, password='old_password')
+        password_service.get_user_password_dto(password_id=password_entity.id)
+
+        # when
+        password_service.update(entity_id=password_entity.id, password_new_details=PasswordDTO(
+            name='test',
+            login='test@test.pl',
+            server_side_algo='fernet',
+            server_side_iterations=600_000,
+            password_encrypted=b'new_password',
+            client_side_algo='Fernet',
+            client_side_iterations=600_000,
+            note='',
+            user_id=user_id
+        ))
+        password_dto = password_service.get_user_password_dto(password_id=password_entity.id)
+
+        # then
+        assert password_dto.password_encrypted == b'new_password'
@@ -0,0 +1,80 @@
+import time
+
+from src.password.key_cache import DataKeyCache
+from tests.BaseTest import BaseTest
+
+
+class DataKeyCacheTests(BaseTest):
+    def test_get_or_create_derives_once(self):
+        # given
+        cache = DataKeyCache(ttl_seconds=60, max_entries=10)
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return b'k' * 32
+
+        # when
+        key1 = cache.get_or_create(cache_key='user1', factory=factory)
+        key2 = cache.get_or_create(cache_key='user1', factory=factory)
+
+        # then
+        assert key1 == key2 == b'k' * 32
+        assert len(calls) == 1
+
+    def test_expired_key_is_zeroized(self):
+        # given
+        cache = DataKeyCache(ttl_seconds=0.01, max_entries=10)
+        cache.get_or_create(cache_key='user1', factory=lambda: b'k' * 32)
+        _, cached_value = cache._entries['user1']
+
+        # when
+        time.sleep(0.02)
+        key = cache.get_or_create(cache_key='user1', factory=lambda: b'n' * 32)
+
+        # then
+        assert cached_value == bytearray(32)
+        assert key == b'n' * 32
+
+    def test_max_entries(self):
+        # given
+        cache = DataKeyCache(ttl_seconds=60, max_entries=2)
+
+        # when
+        for user in ['user1', 'user2', 'user3']:
+            cache.get_or_create(cache_key=user, factory=lambda: b'k' * 32)
+
+        # then - least recently used key evicted
+        assert len(cache) == 2
+        assert 'user1' not in cache._entries
+
+    def test_clear(self):
+        # given
+        cache = DataKeyCache(ttl_seconds=60, max_entries=2)
+        cache.get_or_create(cache_key='user1', factory=lambda: b'k' * 32)
+        _, cached_value = cache._entries['user1']
+
+        # when
+        cache.clear()
+
+        # then
+        assert len(cache) == 0
+        assert cached_value == bytearray(32)
+
+    def test_max_entries_zero_disables_caching(self):
+        # given
+        cache = DataKeyCache(ttl_seconds=60, max_entries=0)
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return b'k' * 32
+
+        # when
+        key1 = cache.get_or_create(cache_key='user1', factory=factory)
+        key2 = cache.get_or_create(cache_key='user1', factory=factory)
+
+        # then
+        assert key1 == key2 == b'k' * 32
+        assert len(calls) == 2
+        assert len(cache) == 0
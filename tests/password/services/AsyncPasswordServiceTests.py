@@ -0,0 +1,133 @@
+import os
+
+import pytest
+
+from src.common.BaseRepository import NotFoundEntityError
+from src.common.async_db_session import get_async_session_factory
+from src.password.decrypted_cache import password_decrypted_cache
+from src.password.exceptions import PasswordNotBelongsToUserError
+from src.password.repositories import PasswordRepository
+from src.password.services import AsyncPasswordService, AsyncPasswordHistoryService, PasswordService, \
+    PasswordHistoryService
+from src.password.types import PasswordDTO
+from tests.BaseTest import BaseTest
+from tests.test_utils.async_db import run_async
+from tests.test_utils.create_db_resources import create_user, create_group_with_user, create_password
+
+
+async def _call_password_service(method_name: str, **kwargs):
+    async with get_async_session_factory()() as session:
+        return await getattr(AsyncPasswordService(session=session), method_name)(**kwargs)
+
+
+def _password_dto(user_id, password: str, groups_ids=None) -> PasswordDTO:
+    return PasswordDTO(
+        name='test',
+        login='test@test.pl',
+        password_encrypted=password.encode(),
+        client_side_algo='Fernet',
+        client_side_iterations=600_000,
+        note='',
+        urls=['https://test.pl'],
+        groups_ids=groups_ids or [],
+        user_id=user_id
+    )
+
+
+class AsyncPasswordServiceTests(BaseTest):
+    def test_get_user_passwords_dtos(self):
+        # given
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+        group_id = create_group_with_user(session=self.session, user_id=user_id).id
+        for password_clear in ['password1', 'password2']:
+            create_password(session=self.session, user_id=user_id, name=password_clear, password=password_clear,
+                            group_ids=[group_id])
+        password_decrypted_cache.clear()
+
+        async def get_user_passwords_dtos():
+            async with get_async_session_factory()() as session:
+                return await AsyncPasswordService(session=session).get_user_passwords_dtos(user_id=user_id)
+
+        # when
+        user_passwords_dtos = run_async(get_user_passwords_dtos())
+
+        # then - decrypted on the async session, relations loaded
+        passwords_by_name = {dto.name: dto.password_encrypted for dto in user_passwords_dtos}
+        assert passwords_by_name == {'password1': b'password1', 'password2': b'password2'}
+        for password_dto in user_passwords_dtos:
+            assert password_dto.groups_ids == [group_id]
+
+    def test_get_password_history(self):
+        # given
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+        other_user_id = create_user(db_session=self.session, username='other', password_clear='test').id
+        password_entity = create_password(session=self.session, user_id=user_id, password='old_password')
+        PasswordService(session=self.session).update(entity_id=password_entity.id, password_new_details=PasswordDTO(
+            name='test',
+            login='test@test.pl',
+            password_encrypted=b'new_password',
+            client_side_algo='Fernet',
+            client_side_iterations=600_000,
+            note='',
+            user_id=user_id
+        ))
+        password_decrypted_cache.clear()
+
+        async def get_password_history(history_user_id):
+            async with get_async_session_factory()() as session:
+                return await AsyncPasswordHistoryService(session=session).get_password_history(
+                    password_id=password_entity.id,
+                    user_id=history_user_id
+                )
+
+        # when
+        password_history_dtos = run_async(get_password_history(user_id))
+
+        # then
+        assert [dto.client_side_password_encrypted for dto in password_history_dtos] == [b'old_password']
+        with pytest.raises(PasswordNotBelongsToUserError):
+            run_async(get_password_history(other_user_id))
+
+    def test_create_update_and_delete(self):
+        # given
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+        group_id = create_group_with_user(session=self.session, user_id=user_id).id
+
+        # when - created without groups, user default group is used
+        password_entity = run_async(_call_password_service(
+            'create', password_details=_password_dto(user_id=user_id, password='old_password')
+        ))
+
+        # then
+        assert password_entity.user_id == user_id
+        assert [url.url for url in password_entity.urls] == ['https://test.pl']
+        assert [group.name for group in password_entity.groups] == [os.environ['USER_DEFAULT_GROUP_NAME']]
+
+        # when - updated, old value moves to history
+        password_entity = run_async(_call_password_service(
+            'update',
+            entity_id=password_entity.id,
+            password_new_details=_password_dto(user_id=user_id, password='new_password', groups_ids=[group_id])
+        ))
+        password_decrypted_cache.clear()
+
+        # then
+        assert [group.id for group in password_entity.groups] == [group_id]
+        assert PasswordService(session=self.session).get_user_passwords_dtos(user_id=user_id)[0] \
+            .password_encrypted == b'new_password'
+        password_history_dtos = PasswordHistoryService(session=self.session).get_password_history(
+            password_id=password_entity.id,
+            user_id=user_id
+        )
+        assert [dto.client_side_password_encrypted for dto in password_history_dtos] == [b'old_password']
+
+        # when - deleted
+        deleted_password_id = run_async(_call_password_service('delete', password_id=password_entity.id,
+                                                               user_id=user_id))
+        self.session.expire_all()
+
+        # then
+        assert deleted_password_id == password_entity.id
+        assert PasswordRepository(session=self.session).find_all_by_user(user_id=user_id) == []
+        with pytest.raises(NotFoundEntityError):
+            run_async(_call_password_service('delete', password_id=password_entity.id, user_id=user_id))
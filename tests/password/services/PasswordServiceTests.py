@@ -1,12 +1,17 @@
+from sqlalchemy import event
+
+from src import engine
 from src.group.repositories import GroupRepository
+from src.password.crypto_engine import crypto_engine
+from src.password.decrypted_cache import password_decrypted_cache
 from src.password.repositories import PasswordUrlRepository, PasswordHistoryRepository, \
-    PasswordRepository
-from src.password.services import PasswordService
+    PasswordRepository, PasswordGroupRepository
+from src.password.services import PasswordService, PasswordHistoryService
 from src.password.types import PasswordDTO
 from src.user.services import UserService
 from tests.BaseTest import BaseTest
 from tests.test_utils.create_db_resources import create_user, create_password_history, create_group_with_user, \
-    create_client_side_password_encrypted
+    create_client_side_password_encrypted, create_password
 
 
 class PasswordServiceTests(BaseTest):
@@ -307,3 +312,196 @@ class PasswordServiceTests(BaseTest):
         # then - check password decrypt
         assert len(user_passwords_entities) != 0
         assert user_passwords_entities[0].password_encrypted == client_side_password_encrypted
+
+    def test_password_decrypt_from_server_layer_many_passwords(self):
+        # given
+        password_service = PasswordService(session=self.session)
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+        passwords_clear = ['password1', 'password2', 'password3']
+
+        # given - create passwords
+        for password_clear in passwords_clear:
+            create_password(session=self.session, user_id=user_id, name=password_clear, password=password_clear)
+
+        # when - decrypt all user passwords, one at a time
+        user_passwords_dtos = password_service.get_user_passwords_dtos(user_id=user_id, concurrency=1)
+
+        # then - values same as stored
+        passwords_by_name = {dto.name: dto.password_encrypted.decode() for dto in user_passwords_dtos}
+        assert len(user_passwords_dtos) == len(passwords_clear)
+        for password_clear in passwords_clear:
+            assert passwords_by_name[password_clear] == password_clear
+
+    def test_password_decrypt_from_server_layer_mixed_server_side_algo(self):
+        # given
+        password_service = PasswordService(session=self.session)
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+
+        # given - one password per server side algo
+        for server_side_algo in ['fernet', 'aes-256-gcm', 'chacha20-poly1305', 'envelope-aesgcm']:
+            password_details: PasswordDTO = PasswordDTO(
+                name=server_side_algo,
+                login='test@test.pl',
+                server_side_algo=server_side_algo,
+                server_side_iterations=600_000,
+                password_encrypted=server_side_algo.encode(),
+                client_side_algo='Fernet',
+                client_side_iterations=600_000,
+                note='',
+                user_id=user_id
+            )
+            password_service.create(password_details=password_details)
+
+        # when
+        user_passwords_dtos = password_service.get_user_passwords_dtos(user_id=user_id)
+
+        # then - every row decrypted with own algo
+        assert len(user_passwords_dtos) == 4
+        for password_dto in user_passwords_dtos:
+            assert password_dto.server_side_algo == password_dto.name
+            assert password_dto.password_encrypted == password_dto.name.encode()
+
+    def test_update_password_keeps_server_side_blob_in_history(self):
+        # given
+        password_service = PasswordService(session=self.session)
+        password_history_service = PasswordHistoryService(session=self.session)
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+        password_entity = create_password(session=self.session, user_id=user_id, password='old_password')
+        old_password_encrypted = password_entity.password_encrypted
+        password_decrypted_cache.clear()
+        submitted_before = crypto_engine.stats().submitted
+
+        # when
+        password_service.update(entity_id=password_entity.id, password_new_details=PasswordDTO(
+            name='test',
+            login='test@test.pl',
+            password_encrypted=b'new_password',
+            client_side_algo='Fernet',
+            client_side_iterations=600_000,
+            note='',
+            user_id=user_id
+        ))
+
+        # then - only the new value encrypted, old blob copied to history
+        assert crypto_engine.stats().submitted == submitted_before + 1
+        password_history_entity = PasswordHistoryRepository(session=self.session).find_all_by_password_id(
+            password_id=password_entity.id
+        )[0]
+        assert password_history_entity.server_side_password_encrypted == old_password_encrypted
+        assert password_history_entity.client_side_password_encrypted is None
+
+        # when - read history
+        password_history_dtos = password_history_service.get_password_history(
+            password_id=password_entity.id,
+            user_id=user_id
+        )
+
+        # then - decrypted on read
+        assert password_history_dtos[0].client_side_password_encrypted == b'old_password'
+
+    def test_get_user_passwords_dtos_constant_number_of_queries(self):
+        # given
+        password_service = PasswordService(session=self.session)
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+        group_id = create_group_with_user(session=self.session, user_id=user_id).id
+
+        def count_queries() -> int:
+            statements = []
+
+            def before_cursor_execute(conn, cursor, statement, *args):
+                statements.append(statement)
+
+            self.session.expunge_all()
+            event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+            try:
+                password_service.get_user_passwords_dtos(user_id=user_id)
+            finally:
+                event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+            return len(statements)
+
+        # given - one password
+        create_password(session=self.session, user_id=user_id, name='password0', group_ids=[group_id])
+        queries_one_password = count_queries()
+
+        # when - more passwords, with history and groups
+        for i in range(1, 5):
+            password_entity = create_password(session=self.session, user_id=user_id, name=f'password{i}',
+                                              group_ids=[group_id])
+            create_password_history(db_session=self.session, password_id=password_entity.id,
+                                    password_details=PasswordDTO(name=f'password{i}', login='old@test.pl',
+                                                                 password_encrypted=b'old', client_side_algo='Fernet',
+                                                                 client_side_iterations=600_000, note='',
+                                                                 user_id=user_id))
+        queries_many_passwords = count_queries()
+
+        # then - relations loaded in the same number of queries
+        assert queries_many_passwords == queries_one_password
+        user_passwords_dtos = password_service.get_user_passwords_dtos(user_id=user_id)
+        assert len(user_passwords_dtos) == 5
+        for password_dto in user_passwords_dtos:
+            assert password_dto.groups_ids == [group_id]
+            assert [group.name for group in password_dto.groups] == ['test']
+
+    def test_delete_password_deletes_children_in_single_statements(self):
+        # given
+        password_service = PasswordService(session=self.session)
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+        group_id = create_group_with_user(session=self.session, user_id=user_id).id
+        password_entity = create_password(session=self.session, user_id=user_id, group_ids=[group_id])
+        password_id = password_entity.id
+        password_url_repo = PasswordUrlRepository(session=self.session)
+        password_url_repo.save(password_url_repo.create(url='https://test.pl', password_id=password_id))
+        history_count = 20
+        for i in range(history_count):
+            create_password_history(db_session=self.session, password_id=password_id,
+                                    password_details=PasswordDTO(name=f'old{i}', login='old@test.pl',
+                                                                 password_encrypted=b'old', client_side_algo='Fernet',
+                                                                 client_side_iterations=600_000, note='',
+                                                                 user_id=user_id))
+        self.session.commit()
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        # when
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            password_service.delete(password_id=password_id, user_id=user_id)
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+        # then - one delete per child table, regardless of history size
+        delete_statements = [statement for statement in statements if statement.lstrip().upper().startswith('DELETE')]
+        assert len(delete_statements) == 4
+        assert len(statements) < history_count
+        assert PasswordHistoryRepository(session=self.session).find_all_by_password_id(password_id=password_id) == []
+        assert PasswordGroupRepository(session=self.session).get_password_group_entities_by_password_id(
+            password_id=password_id
+        ) == []
+
+    def test_get_user_passwords_dtos_not_decrypt_history(self):
+        # given
+        password_service = PasswordService(session=self.session)
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+        password_entity = create_password(session=self.session, user_id=user_id, password='old_password')
+        password_service.update(entity_id=password_entity.id, password_new_details=PasswordDTO(
+            name='test',
+            login='test@test.pl',
+            password_encrypted=b'new_password',
+            client_side_algo='Fernet',
+            client_side_iterations=600_000,
+            note='',
+            user_id=user_id
+        ))
+        password_decrypted_cache.clear()
+        submitted_before = crypto_engine.stats().submitted
+
+        # when
+        user_passwords_dtos = password_service.get_user_passwords_dtos(user_id=user_id)
+
+        # then - only the current value decrypted, history returned without values
+        assert crypto_engine.stats().submitted == submitted_before + 1
+        assert user_passwords_dtos[0].password_encrypted == b'new_password'
+        assert len(user_passwords_dtos[0].history) == 1
+        assert user_passwords_dtos[0].history[0].client_side_password_encrypted is None
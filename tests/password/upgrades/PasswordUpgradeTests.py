@@ -0,0 +1,136 @@
+from src.password.repositories import PasswordRepository
+from src.password.services import PasswordService, PasswordUpgradeService
+from src.password.types import PasswordDTO
+from src.password.upgrades import password_upgrade_queue, is_password_outdated, PasswordUpgradeQueue
+from tests.BaseTest import BaseTest
+from tests.test_utils.create_db_resources import create_user, create_password
+
+
+class PasswordUpgradeTests(BaseTest):
+    def setUp(self):
+        super().setUp()
+        password_upgrade_queue.clear()
+
+    def _create_password(self, user_id, server_side_algo: str, server_side_iterations: int, password: str):
+        password_service = PasswordService(session=self.session)
+        password_details: PasswordDTO = PasswordDTO(
+            name=password,
+            login='test@test.pl',
+            server_side_algo=server_side_algo,
+            server_side_iterations=server_side_iterations,
+            password_encrypted=password.encode(),
+            client_side_algo='Fernet',
+            client_side_iterations=600_000,
+            note='',
+            user_id=user_id
+        )
+        return password_service.create(password_details=password_details)
+
+    def test_password_with_current_settings_not_outdated(self):
+        # given
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+        password_entity = create_password(session=self.session, user_id=user_id)
+
+        # when
+        is_outdated = is_password_outdated(password_entity)
+
+        # then
+        assert not is_outdated
+
+    def test_password_with_higher_iterations_not_outdated(self):
+        # given - written by a worker calibrated to more iterations
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+        password_entity = self._create_password(user_id=user_id, server_side_algo='fernet',
+                                                server_side_iterations=610_000, password='higher_iterations')
+
+        # when
+        is_outdated = is_password_outdated(password_entity)
+
+        # then
+        assert not is_outdated
+
+    def test_outdated_password_queued_on_read(self):
+        # given
+        password_service = PasswordService(session=self.session)
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+        create_password(session=self.session, user_id=user_id, name='current')
+        self._create_password(user_id=user_id, server_side_algo='aes-256-gcm',
+                              server_side_iterations=600_000, password='old_algo')
+        self._create_password(user_id=user_id, server_side_algo='fernet',
+                              server_side_iterations=1_000, password='old_iterations')
+
+        # when
+        password_service.get_user_passwords_dtos(user_id=user_id)
+
+        # then - only outdated rows are queued
+        assert len(password_upgrade_queue) == 2
+
+    def test_upgrade_outdated_passwords(self):
+        # given
+        password_service = PasswordService(session=self.session)
+        upgrade_service = PasswordUpgradeService(session=self.session)
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+        old_algo_id = self._create_password(user_id=user_id, server_side_algo='aes-256-gcm',
+                                            server_side_iterations=600_000, password='old_algo').id
+        old_iterations_id = self._create_password(user_id=user_id, server_side_algo='fernet',
+                                                  server_side_iterations=1_000, password='old_iterations').id
+        password_service.get_user_passwords_dtos(user_id=user_id)
+
+        # when
+        upgraded = upgrade_service.upgrade_all_pending()
+        self.session.expire_all()
+
+        # then - rows written with current settings and still readable
+        assert upgraded == 2
+        assert len(password_upgrade_queue) == 0
+        repo = PasswordRepository(session=self.session)
+        for password_id in [old_algo_id, old_iterations_id]:
+            entity = repo.get_by_id(password_id)
+            assert entity.server_side_algo == 'fernet'
+            assert entity.server_side_iterations == 600_000
+            assert not is_password_outdated(entity)
+
+        passwords_by_name = {dto.name: dto.password_encrypted for dto in password_service.get_user_passwords_dtos(user_id)}
+        assert passwords_by_name == {'old_algo': b'old_algo', 'old_iterations': b'old_iterations'}
+
+    def test_upgrade_skips_password_changed_after_read(self):
+        # given
+        password_service = PasswordService(session=self.session)
+        upgrade_service = PasswordUpgradeService(session=self.session)
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+        password_entity = self._create_password(user_id=user_id, server_side_algo='fernet',
+                                                server_side_iterations=1_000, password='old_iterations')
+        password_service.get_user_passwords_dtos(user_id=user_id)
+
+        # given - row changed after it was queued
+        repo = PasswordRepository(session=self.session)
+        password_entity.name = 'changed'
+        repo.save(password_entity)
+        repo.commit()
+
+        # when
+        upgraded = upgrade_service.upgrade_all_pending()
+        self.session.expire_all()
+
+        # then - row left untouched
+        assert upgraded == 0
+        assert repo.get_by_id(password_entity.id).server_side_iterations == 1_000
+
+    def test_upgrade_queue_drops_passwords_when_full(self):
+        # given
+        upgrade_queue = PasswordUpgradeQueue(enabled=True, batch_size=100, max_size=1)
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+        first_entity = self._create_password(user_id=user_id, server_side_algo='fernet',
+                                             server_side_iterations=1_000, password='first')
+        second_entity = self._create_password(user_id=user_id, server_side_algo='fernet',
+                                              server_side_iterations=1_000, password='second')
+
+        # when
+        upgrade_queue.add(first_entity, password_client_side_encrypted=b'first')
+        upgrade_queue.add(second_entity, password_client_side_encrypted=b'second')
+        upgrade_queue.add(first_entity, password_client_side_encrypted=b'first')
+
+        # then - queued password refreshed, new one dropped
+        assert len(upgrade_queue) == 1
+        assert upgrade_queue.stats().dropped == 1
+        assert [item.password_id for item in upgrade_queue.pop_batch()] == [first_entity.id]
@@ -0,0 +1,13 @@
+import asyncio
+
+from src.common.async_db_session import dispose_async_engine
+
+
+def run_async(coroutine):
+    """Run coroutine in a new event loop, async engine is bound to that loop and disposed after"""
+    async def run_and_dispose():
+        try:
+            return await coroutine
+        finally:
+            await dispose_async_engine()
+    return asyncio.run(run_and_dispose())
@@ -39,7 +39,7 @@ class UserRepositoryTest(BaseTest):
 
         # then
         assert token_entity.user_id == user_entity.id
-        assert token_entity.token == token_value
+        assert token_entity.token_hash == UserTokenRepository.hash_token(token_value)
         assert token_entity.inserted_on
         assert token_entity.expiration_date > token_entity.inserted_on
 
@@ -92,3 +92,22 @@ class UserRepositoryTest(BaseTest):
 
         # then
         assert len(tokens_after_delete) == 0
+
+    def test_raw_token_not_stored(self):
+        # given
+        repo = UserTokenRepository(session=self.session)
+        user_entity = create_user(session=self.session)
+        token_value = 'token'
+
+        # when
+        entity = repo.create(
+            token=token_value,
+            user_id=user_entity.id
+        )
+        repo.save(entity)
+        repo.commit()
+
+        # then
+        assert len(entity.token_hash) == 32
+        assert token_value.encode() not in entity.token_hash
+        assert repo.find_by_token(token='other_token') is None
@@ -0,0 +1,95 @@
+import os
+import uuid
+
+import pytest
+
+from src.common.BaseRepository import NotFoundEntityError
+from src.common.async_db_session import get_async_session_factory
+from src.group.repositories import GroupRepository
+from src.password.repositories import PasswordRepository
+from src.user.exceptions import UserLoginPasswordInvalidError
+from src.user.repositories import UserRepository, UserTokenRepository
+from src.user.services import AsyncUserService, UserService, UserTokenService
+from tests.BaseTest import BaseTest
+from tests.test_utils.async_db import run_async
+from tests.test_utils.create_db_resources import create_user, create_password
+
+
+async def _call_user_service(method_name: str, **kwargs):
+    async with get_async_session_factory()() as session:
+        return await getattr(AsyncUserService(session=session), method_name)(**kwargs)
+
+
+class AsyncUserServiceTests(BaseTest):
+    def test_create_user_with_default_group(self):
+        # when
+        user_entity = run_async(_call_user_service('create_user', username='test', password_clear='test'))
+
+        # then
+        default_group = GroupRepository(session=self.session).find_user_default_group(user_id=user_entity.id)
+        assert default_group.name == os.environ['USER_DEFAULT_GROUP_NAME']
+        assert UserService(session=self.session).login_user(username='test', password_clear='test')
+
+    def test_login_user_and_create_token(self):
+        # given
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+
+        # when
+        user_token = run_async(_call_user_service('login_user_and_create_token', username='test',
+                                                  password_clear='test'))
+
+        # then
+        token_entity = UserTokenService(session=self.session).find_valid_token(token=user_token)
+        assert token_entity.user_id == user_id
+        with pytest.raises(UserLoginPasswordInvalidError):
+            run_async(_call_user_service('login_user_and_create_token', username='test', password_clear='wrong'))
+        with pytest.raises(UserLoginPasswordInvalidError):
+            run_async(_call_user_service('login_user_and_create_token', username='other', password_clear='test'))
+
+    def test_update_user(self):
+        # given
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+
+        # when
+        run_async(_call_user_service('update_user', user_id=user_id, password_clear='new_password'))
+        self.session.expire_all()
+
+        # then
+        assert UserService(session=self.session).login_user(username='test', password_clear='new_password')
+        with pytest.raises(NotFoundEntityError):
+            run_async(_call_user_service('update_user', user_id=uuid.uuid4(), password_clear='test'))
+
+    def test_delete_user_with_passwords_and_tokens(self):
+        # given
+        user_id = create_user(db_session=self.session, username='test', password_clear='test').id
+        create_password(session=self.session, user_id=user_id)
+        run_async(_call_user_service('login_user_and_create_token', username='test', password_clear='test'))
+
+        # when
+        deleted_user_id = run_async(_call_user_service('delete_user', user_id=user_id))
+        self.session.expire_all()
+
+        # then
+        assert deleted_user_id == user_id
+        assert UserRepository(session=self.session).get_by_id(user_id) is None
+        assert PasswordRepository(session=self.session).find_all_by_user(user_id=user_id) == []
+        assert UserTokenRepository(session=self.session).find_all() == []
+        with pytest.raises(NotFoundEntityError):
+            run_async(_call_user_service('delete_user', user_id=user_id))
+
+    def test_revoke_user_tokens(self):
+        # given
+        user_entity = create_user(db_session=self.session, username='test', password_clear='test')
+        user_id, token_key_version = user_entity.id, user_entity.token_key_version
+        run_async(_call_user_service('login_user_and_create_token', username='test', password_clear='test'))
+
+        # when
+        revoked_user_id = run_async(_call_user_service('revoke_user_tokens', user_id=user_id))
+        self.session.expire_all()
+
+        # then
+        assert revoked_user_id == user_id
+        assert UserRepository(session=self.session).get_by_id(user_id).token_key_version == token_key_version + 1
+        assert UserTokenRepository(session=self.session).find_all() == []
+        with pytest.raises(NotFoundEntityError):
+            run_async(_call_user_service('revoke_user_tokens', user_id=uuid.uuid4()))
@@ -1,3 +1,6 @@
+import os
+from unittest import mock
+
 import pytest
 
 from sqlalchemy.exc import NoResultFound
@@ -19,6 +22,11 @@ def create_user(session) -> UserModel:
     return user_entity
 
 
+def create_stateless_token(token_service: UserJwtTokenService, username: str) -> str:
+    with mock.patch.object(UserJwtTokenService, 'STATELESS_ENABLED', True):
+        return token_service.create(username=username)
+
+
 class UserJwtTokenServiceTests(BaseTest):
     def test_create_token(self):
         # given
@@ -132,3 +140,65 @@ class UserJwtTokenServiceTests(BaseTest):
 
         # then
         assert token_decoded.username == username
+
+    def test_stateless_token_decode(self):
+        # given
+        user_entity = create_user(self.session)
+        token_service = UserJwtTokenService(session=self.session)
+        token_str = create_stateless_token(token_service, username=user_entity.username)
+
+        # when
+        token_decoded = token_service.decode_stateless(jwt_token=token_str)
+
+        # then
+        assert token_decoded.sub == str(user_entity.id)
+        assert token_decoded.username == user_entity.username
+        assert token_decoded.key_version == user_entity.token_key_version
+        assert token_decoded.exp > token_decoded.iat
+
+    def test_stateless_token_invalid_after_key_version_bump(self):
+        # given
+        user_entity = create_user(self.session)
+        token_service = UserJwtTokenService(session=self.session)
+        token_str = create_stateless_token(token_service, username=user_entity.username)
+
+        # when
+        UserService(session=self.session).revoke_user_tokens(user_id=user_entity.id)
+        token_decoded = token_service.decode_stateless(jwt_token=token_str)
+
+        # then
+        assert token_decoded is None
+        assert token_service.decode_stateless(
+            jwt_token=create_stateless_token(token_service, username=user_entity.username)
+        )
+
+    def test_stateless_token_invalid_when_expired(self):
+        # given
+        user_entity = create_user(self.session)
+        token_service = UserJwtTokenService(session=self.session)
+        expiration_date_hours = os.environ['JWT_TOKEN_EXPIRATION_DATE_HOURS']
+        os.environ['JWT_TOKEN_EXPIRATION_DATE_HOURS'] = '-1'
+        try:
+            token_str = create_stateless_token(token_service, username=user_entity.username)
+        finally:
+            os.environ['JWT_TOKEN_EXPIRATION_DATE_HOURS'] = expiration_date_hours
+
+        # when
+        token_decoded = token_service.decode_stateless(jwt_token=token_str)
+
+        # then
+        assert token_decoded is None
+
+    def test_stateless_token_invalid_when_tampered(self):
+        # given
+        user_entity = create_user(self.session)
+        token_service = UserJwtTokenService(session=self.session)
+        legacy_token_str = token_service.create(username=user_entity.username)
+
+        # when
+        token_decoded = token_service.decode_stateless(jwt_token=legacy_token_str)
+        invalid_token_decoded = token_service.decode_stateless(jwt_token='abcd')
+
+        # then
+        assert token_decoded is None
+        assert invalid_token_decoded is None
@@ -1,12 +1,16 @@
+import asyncio
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 from sqlalchemy.exc import IntegrityError, NoResultFound
 
 from src.common.BaseRepository import NotFoundEntityError
 from src.user.exceptions import UserLoginPasswordInvalidError
-from src.user.repositories import UserRepository
-from src.user.services import UserService
+from src.common.db_session import Session
+from src.user.password_hashing import user_password_hash_engine
+from src.user.repositories import UserRepository, UserTokenRepository
+from src.user.services import UserService, UserTokenService
 from tests.BaseTest import BaseTest
 
 
@@ -218,3 +222,48 @@ class UserServiceTest(BaseTest):
 
         # then
         assert isinstance(exc_info.value, NotFoundEntityError)
+
+    def test_login_user_and_create_token_concurrently(self):
+        # given
+        service = UserService(session=self.session)
+        user_entity = service.create_user(username='admin', password_clear='password')
+
+        def login():
+            session = Session()
+            try:
+                return UserService(session=session).login_user_and_create_token(
+                    username='admin',
+                    password_clear='password'
+                )
+            finally:
+                session.close()
+
+        # when - same deterministic token inserted by concurrent logins
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            tokens = list(executor.map(lambda _: login(), range(4)))
+
+        # then
+        token_entities = UserTokenService(session=self.session).get_all()
+        assert len(set(tokens)) == 1
+        assert len(token_entities) == 1
+        assert token_entities[0].user_id == user_entity.id
+        assert token_entities[0].token_hash == UserTokenRepository.hash_token(tokens[0])
+
+    def test_async_user_flow_hashes_on_user_password_hash_engine(self):
+        # given
+        service = UserService(session=self.session)
+        submitted_before = user_password_hash_engine.stats().submitted
+
+        async def create_update_and_login():
+            user_entity = await service.create_user_async(username='admin', password_clear='password')
+            await service.update_user_async(user_id=user_entity.id, password_clear='new_password')
+            return await service.login_user_and_create_token_async(username='admin', password_clear='new_password')
+
+        # when
+        user_token = asyncio.run(create_update_and_login())
+
+        # then
+        assert user_token
+        assert user_password_hash_engine.stats().submitted == submitted_before + 3
+        with pytest.raises(UserLoginPasswordInvalidError):
+            asyncio.run(service.login_user_and_create_token_async(username='admin', password_clear='password'))
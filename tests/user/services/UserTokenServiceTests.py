@@ -3,6 +3,7 @@ import datetime
 from sqlalchemy.orm import Session
 
 from src import UserModel
+from src.user.repositories import UserTokenRepository
 from src.user.services import UserService, UserTokenService
 from tests.BaseTest import BaseTest
 
@@ -34,7 +35,7 @@ class UserTokenServiceTest(BaseTest):
 
         # then
         assert token_entity.user_id == user_entity.id
-        assert token_entity.token == token
+        assert token_entity.token_hash == UserTokenRepository.hash_token(token)
         assert token_entity.expiration_date > token_entity.inserted_on
 
     def test_is_token_valid(self):
@@ -107,4 +108,60 @@ class UserTokenServiceTest(BaseTest):
         tokens_after_delete = service.get_all()
 
         # then
-        assert len(tokens_after_delete) == 0
\ No newline at end of file
+        assert len(tokens_after_delete) == 0
+
+    def test_is_token_valid_when_token_expired(self):
+        # given
+        service = UserTokenService(session=self.session)
+        user_entity = create_user(session=self.session)
+        token = 'test_token'
+        service.create_token(
+            token=token,
+            user_id=user_entity.id,
+            expiration_date=datetime.datetime.now() - datetime.timedelta(days=1)
+        )
+
+        # when
+        is_token_valid = service.is_token_valid(token)
+
+        # then - invalid, row is left for the reaper
+        assert not is_token_valid
+        assert len(service.get_all()) == 1
+
+    def test_create_token_replaces_expired_token(self):
+        # given
+        service = UserTokenService(session=self.session)
+        user_entity = create_user(session=self.session)
+        token = 'test_token'
+        service.create_token(
+            token=token,
+            user_id=user_entity.id,
+            expiration_date=datetime.datetime.now() - datetime.timedelta(days=1)
+        )
+
+        # when
+        service.create_token(token=token, user_id=user_entity.id)
+
+        # then
+        assert service.is_token_valid(token)
+        assert len(service.get_all()) == 1
+
+    def test_delete_expired_tokens_in_batches(self):
+        # given
+        service = UserTokenService(session=self.session)
+        user_entity = create_user(session=self.session)
+        expiration_date_from_the_past = datetime.datetime.now() - datetime.timedelta(days=1)
+        for token_number in range(5):
+            service.create_token(
+                token=f'expired_token_{token_number}',
+                user_id=user_entity.id,
+                expiration_date=expiration_date_from_the_past
+            )
+        service.create_token(token='valid_token', user_id=user_entity.id)
+
+        # when
+        deleted_count = service.delete_expired_tokens(batch_size=2)
+
+        # then
+        assert deleted_count == 5
+        assert [entity.token_hash for entity in service.get_all()] == [UserTokenRepository.hash_token('valid_token')]
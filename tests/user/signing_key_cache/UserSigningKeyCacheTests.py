@@ -0,0 +1,63 @@
+import uuid
+
+from src.user.services import UserJwtTokenService, UserService
+from src.user.signing_key_cache import UserSigningKey, UserSigningKeyCache, user_signing_key_cache
+from tests.BaseTest import BaseTest
+
+
+class UserSigningKeyCacheTests(BaseTest):
+    def test_cache_bounded(self):
+        # given
+        cache = UserSigningKeyCache(enabled=True, ttl_seconds=60, max_entries=2)
+
+        # when
+        for username in ['user1', 'user2', 'user3']:
+            cache.set(username=username, signing_key=UserSigningKey(user_id=uuid.uuid4(), key='key', key_version=1))
+
+        # then - oldest key evicted
+        assert len(cache) == 2
+        assert cache.get(username='user1') is None
+        assert cache.get(username='user3') is not None
+
+    def test_signing_key_cached_after_first_use(self):
+        # given
+        user_entity = UserService(session=self.session).create_user(username='admin', password_clear='password')
+        token_service = UserJwtTokenService(session=self.session)
+        token_str = token_service.create(username=user_entity.username)
+        hits_before = user_signing_key_cache.hits
+
+        # when
+        is_token_valid = token_service.is_valid(jwt_token=token_str, username=user_entity.username)
+        token_decoded = token_service.decode(jwt_token=token_str, username=user_entity.username)
+
+        # then
+        assert is_token_valid is True
+        assert token_decoded.username == user_entity.username
+        assert len(user_signing_key_cache) == 1
+        assert user_signing_key_cache.hits == hits_before + 2
+
+    def test_signing_key_invalidated_on_user_update(self):
+        # given
+        service = UserService(session=self.session)
+        user_entity = service.create_user(username='admin', password_clear='password')
+        token_service = UserJwtTokenService(session=self.session)
+        token_str = token_service.create(username=user_entity.username)
+
+        # when
+        service.update_user(user_id=user_entity.id, password_clear='new_password')
+
+        # then - key derived from the new password hash
+        assert user_signing_key_cache.get(username=user_entity.username) is None
+        assert token_service.is_valid(jwt_token=token_str, username=user_entity.username) is False
+
+    def test_signing_key_invalidated_on_user_delete(self):
+        # given
+        service = UserService(session=self.session)
+        user_entity = service.create_user(username='admin', password_clear='password')
+        UserJwtTokenService(session=self.session).create(username=user_entity.username)
+
+        # when
+        service.delete_user(user_id=user_entity.id)
+
+        # then
+        assert len(user_signing_key_cache) == 0
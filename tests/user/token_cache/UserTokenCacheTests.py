@@ -0,0 +1,79 @@
+import datetime
+import uuid
+
+from src.api.auth import _get_user_principal
+from src.user.services import UserService
+from src.user.token_cache import UserTokenCache, user_token_cache
+from tests.BaseTest import BaseTest
+from tests.test_utils.create_db_resources import create_test_user_and_get_token
+
+
+class UserTokenCacheTests(BaseTest):
+    def test_cached_token_not_returned_after_expiration(self):
+        # given
+        cache = UserTokenCache(enabled=True, ttl_seconds=60, max_entries=10)
+        expired_date = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=1)
+
+        # when
+        cache.set(token='token', user_id=uuid.uuid4(), token_id=uuid.uuid4(), expiration_date=expired_date)
+
+        # then
+        assert cache.get(token='token') is None
+        assert len(cache) == 0
+
+    def test_cache_bounded(self):
+        # given
+        cache = UserTokenCache(enabled=True, ttl_seconds=60, max_entries=2)
+        expiration_date = datetime.datetime.now() + datetime.timedelta(hours=1)
+
+        # when
+        for token in ['token1', 'token2', 'token3']:
+            cache.set(token=token, user_id=uuid.uuid4(), token_id=uuid.uuid4(), expiration_date=expiration_date)
+
+        # then - oldest token evicted
+        assert len(cache) == 2
+        assert cache.get(token='token1') is None
+        assert cache.get(token='token3') is not None
+
+    def test_valid_token_cached_by_auth(self):
+        # given
+        user_id, user_token = create_test_user_and_get_token(session=self.session)
+
+        # when
+        principal = _get_user_principal(api_key=user_token)
+
+        # then
+        assert principal.user_id == user_id
+        assert user_token_cache.get(token=user_token).user_id == user_id
+        assert user_token_cache.get(token=user_token).token_id == principal.token_id
+
+    def test_invalid_token_not_cached(self):
+        # when
+        principal = _get_user_principal(api_key='not_existing_token')
+
+        # then
+        assert principal is None
+        assert len(user_token_cache) == 0
+
+    def test_user_update_evicts_cached_tokens(self):
+        # given
+        user_id, user_token = create_test_user_and_get_token(session=self.session)
+        _get_user_principal(api_key=user_token)
+
+        # when
+        UserService(session=self.session).update_user(user_id=user_id, password_clear='new_password')
+
+        # then
+        assert user_token_cache.get(token=user_token) is None
+
+    def test_user_delete_evicts_cached_tokens(self):
+        # given
+        user_id, user_token = create_test_user_and_get_token(session=self.session)
+        _get_user_principal(api_key=user_token)
+
+        # when
+        UserService(session=self.session).delete_user(user_id=user_id)
+
+        # then
+        assert user_token_cache.get(token=user_token) is None
+        assert _get_user_principal(api_key=user_token) is None
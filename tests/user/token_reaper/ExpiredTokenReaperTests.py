@@ -0,0 +1,45 @@
+import datetime
+from unittest import mock
+
+import pytest
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.user.repositories import UserTokenRepository
+from src.user.services import UserService, UserTokenService
+from src.user import token_reaper
+from src.user.token_reaper import ExpiredTokenReaper
+from tests.BaseTest import BaseTest
+
+
+class ExpiredTokenReaperTests(BaseTest):
+    def test_reap_expired_tokens(self):
+        # given
+        reaper = ExpiredTokenReaper(enabled=True, interval_seconds=60, batch_size=10)
+        service = UserTokenService(session=self.session)
+        user_entity = UserService(session=self.session).create_user(username='test', password_clear='test')
+        service.create_token(
+            token='expired_token',
+            user_id=user_entity.id,
+            expiration_date=datetime.datetime.now() - datetime.timedelta(days=1)
+        )
+        service.create_token(token='valid_token', user_id=user_entity.id)
+
+        # when
+        deleted_count = reaper.reap()
+
+        # then
+        assert deleted_count == 1
+        assert [entity.token_hash for entity in service.get_all()] == [UserTokenRepository.hash_token('valid_token')]
+
+    def test_reap_closes_session_on_error(self):
+        # given
+        reaper = ExpiredTokenReaper(enabled=True, interval_seconds=60, batch_size=10)
+
+        # when
+        with mock.patch.object(token_reaper, 'Session') as session_factory, \
+                mock.patch.object(UserTokenService, 'delete_expired_tokens', side_effect=SQLAlchemyError('db error')):
+            with pytest.raises(SQLAlchemyError):
+                reaper.reap()
+
+        # then
+        session_factory.return_value.close.assert_called_once()
@@ -0,0 +1,61 @@
+import datetime
+
+from src.user.services import UserService, UserTokenService
+from src.user.token_usage import TokenUsageRecorder
+from tests.BaseTest import BaseTest
+
+
+class TokenUsageRecorderTests(BaseTest):
+    def test_flush_extends_used_token_only(self):
+        # given
+        recorder = TokenUsageRecorder(enabled=True, flush_interval_seconds=60, batch_size=1)
+        service = UserTokenService(session=self.session)
+        user_entity = UserService(session=self.session).create_user(username='test', password_clear='test')
+        expiration_date = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=5)
+        used_token = service.create_token(token='used_token', user_id=user_entity.id, expiration_date=expiration_date)
+        unused_token = service.create_token(token='unused_token', user_id=user_entity.id,
+                                            expiration_date=expiration_date)
+        used_token_id, unused_token_id = used_token.id, unused_token.id
+
+        # when
+        for _ in range(3):
+            recorder.record(token_id=used_token_id)
+        updated_count = recorder.flush()
+        self.session.expire_all()
+
+        # then
+        assert updated_count == 1
+        assert len(recorder) == 0
+        assert service.find_valid_token(token='used_token').last_used_at is not None
+        assert service.find_valid_token(token='used_token').expiration_date > expiration_date
+        assert self.session.get(type(unused_token), unused_token_id).expiration_date == expiration_date
+
+    def test_flush_does_not_extend_expired_token(self):
+        # given
+        recorder = TokenUsageRecorder(enabled=True, flush_interval_seconds=60, batch_size=10)
+        service = UserTokenService(session=self.session)
+        user_entity = UserService(session=self.session).create_user(username='test', password_clear='test')
+        expired_token = service.create_token(
+            token='expired_token',
+            user_id=user_entity.id,
+            expiration_date=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=1)
+        )
+
+        # when
+        recorder.record(token_id=expired_token.id)
+        updated_count = recorder.flush()
+
+        # then
+        assert updated_count == 0
+        assert service.find_valid_token(token='expired_token') is None
+
+    def test_record_disabled(self):
+        # given
+        recorder = TokenUsageRecorder(enabled=False, flush_interval_seconds=60, batch_size=10)
+
+        # when
+        recorder.record(token_id=None)
+
+        # then
+        assert len(recorder) == 0
+        assert recorder.flush() == 0